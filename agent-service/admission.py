@@ -0,0 +1,280 @@
+"""
+Admission control for chat rounds: per-buyer and per-listing rate limits,
+and a priority lane that keeps deal-closing traffic ahead of LLM-bound chat.
+
+Every /agent/chat request (HTTP or /agent/ws) is admitted to one of two lanes
+before it is handed to the IO executor:
+
+    commit — a buyer confirming the last counter-offer (see
+             buyer_chat.chat_lane). The reply is a template and, with the
+             local extractor, no LLM is called. Never rate-limited or queued;
+             lastCounterPrice is set by the backend, not the buyer.
+    chat   — everything else: rounds that wait on Ollama. Limited by a token
+             bucket per buyerId and one per listingId (429 with Retry-After
+             when either is empty; an id the caller did not send is not
+             limited), then by CHAT_MAX_INFLIGHT. Rounds beyond
+             that wait, first come first served, in a queue of at most
+             CHAT_MAX_QUEUE for up to CHAT_QUEUE_TIMEOUT_MS (503 when full or
+             timed out).
+
+CHAT_MAX_INFLIGHT defaults to three quarters of AGENT_IO_WORKERS, so a burst of
+chat rounds leaves IO workers free for commit rounds instead of queueing
+them behind Ollama calls; commit rounds also run their stages in their own
+thread rather than on the shared chat-stage pool. A chat slot is held until
+the round's worker thread is done, even if the request was cancelled first.
+/agent/negotiate is not gated: it runs inline in well under a millisecond.
+
+Everything here runs on the event loop, so the state needs no locks.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+from executors import AGENT_IO_WORKERS, IO, submit
+
+COMMIT = "commit"
+CHAT = "chat"
+LANES = (COMMIT, CHAT)
+
+# Admission outcomes, counted per lane
+OUTCOMES = ("admitted", "queued", "rate_limited", "queue_full", "queue_timeout")
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+# Chat rounds per second (sustained) and burst per buyer / per listing; 0 disables
+CHAT_RATE_PER_BUYER = float(os.environ.get("CHAT_RATE_PER_BUYER", "2"))
+CHAT_BURST_PER_BUYER = float(os.environ.get("CHAT_BURST_PER_BUYER", "20"))
+CHAT_RATE_PER_LISTING = float(os.environ.get("CHAT_RATE_PER_LISTING", "10"))
+CHAT_BURST_PER_LISTING = float(os.environ.get("CHAT_BURST_PER_LISTING", "50"))
+CHAT_MAX_INFLIGHT = int(os.environ.get("CHAT_MAX_INFLIGHT", str(max(1, AGENT_IO_WORKERS * 3 // 4))))
+CHAT_MAX_QUEUE = int(os.environ.get("CHAT_MAX_QUEUE", "256"))
+CHAT_QUEUE_TIMEOUT_MS = float(os.environ.get("CHAT_QUEUE_TIMEOUT_MS", "10000"))
+# Buckets kept per key type; the least recently used (i.e. long refilled) go first
+ADMISSION_MAX_KEYS = int(os.environ.get("ADMISSION_MAX_KEYS", "100000"))
+
+
+class AdmissionRejected(Exception):
+    """A chat round turned away: 429 (rate limit) or 503 (queue), with a Retry-After."""
+
+    def __init__(self, status: int, detail: str, retry_after_s: float):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.retry_after_s = retry_after_s
+
+    @property
+    def headers(self) -> dict:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after_s)))}
+
+
+class TokenBuckets:
+    """
+    One token bucket per key, refilled at `rate` per second up to `burst`.
+    A rate of 0 admits everything.
+    """
+
+    def __init__(self, rate: float, burst: float, maxsize: int = ADMISSION_MAX_KEYS):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()  # key → [tokens, updated]
+
+    def _bucket(self, key: str, now: float) -> list[float]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        return bucket
+
+    def wait_s(self, key: str, now: float | None = None) -> float:
+        """Seconds until `key` has a token; 0 if it has one now."""
+        if not self.rate:
+            return 0.0
+        tokens = self._bucket(key, time.monotonic() if now is None else now)[0]
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, key: str) -> None:
+        if self.rate:
+            self._bucket(key, time.monotonic())[0] -= 1
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        rate_per_buyer: float = CHAT_RATE_PER_BUYER,
+        burst_per_buyer: float = CHAT_BURST_PER_BUYER,
+        rate_per_listing: float = CHAT_RATE_PER_LISTING,
+        burst_per_listing: float = CHAT_BURST_PER_LISTING,
+        max_inflight: int = CHAT_MAX_INFLIGHT,
+        max_queue: int = CHAT_MAX_QUEUE,
+        queue_timeout_ms: float = CHAT_QUEUE_TIMEOUT_MS,
+    ):
+        self.buyers = TokenBuckets(rate_per_buyer, burst_per_buyer)
+        self.listings = TokenBuckets(rate_per_listing, burst_per_listing)
+        self.max_inflight = max(1, max_inflight)
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_ms / 1000
+        self._queue: list[asyncio.Future] = []
+        self.inflight = {lane: 0 for lane in LANES}
+        self.peak_inflight = {lane: 0 for lane in LANES}
+        self.outcomes = {(lane, outcome): 0 for lane in LANES for outcome in OUTCOMES}
+        self.wait_seconds = 0.0
+        self.peak_queued = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(not fut.done() for fut in self._queue)
+
+    def _count(self, lane: str, outcome: str) -> None:
+        self.outcomes[(lane, outcome)] += 1
+
+    def _check_rate(self, buyer_id: str | None, listing_id: str | None) -> None:
+        # A missing id is skipped rather than pooled into one shared bucket
+        limits = [
+            (bucket, key)
+            for bucket, key in ((self.buyers, buyer_id), (self.listings, listing_id))
+            if key is not None
+        ]
+        now = time.monotonic()
+        # Both buckets must have a token before either is charged
+        wait_s = max((bucket.wait_s(key, now) for bucket, key in limits), default=0.0)
+        if wait_s:
+            self._count(CHAT, "rate_limited")
+            raise AdmissionRejected(
+                429, f"Too many chat rounds for buyer '{buyer_id}' or listing '{listing_id}'.", wait_s,
+            )
+        for bucket, key in limits:
+            bucket.take(key)
+
+    def _must_queue(self) -> bool:
+        return self.inflight[CHAT] >= self.max_inflight or self.queued > 0
+
+    async def _acquire_chat_slot(self) -> None:
+        if not self._must_queue():
+            return
+        self._count(CHAT, "queued")
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.append(fut)
+        self.peak_queued = max(self.peak_queued, self.queued)
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.queue_timeout_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                # Handed a slot just as we gave up: pass it on
+                self.inflight[CHAT] -= 1
+                self._release_chat_slot()
+            else:
+                fut.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._count(CHAT, "queue_timeout")
+            raise AdmissionRejected(503, "Timed out waiting for a chat slot.", self.queue_timeout_s) from None
+        finally:
+            self.wait_seconds += time.perf_counter() - t0
+            if fut in self._queue:
+                self._queue.remove(fut)
+        # The slot was handed over by _release_chat_slot, which did not free it
+        self.inflight[CHAT] -= 1
+
+    def _release_chat_slot(self) -> None:
+        while self._queue:
+            fut = self._queue.pop(0)
+            if not fut.done():
+                # Keep the slot counted as taken; the waiter takes it over
+                self.inflight[CHAT] += 1
+                fut.set_result(None)
+                return
+
+    async def _enter(self, lane: str, buyer_id: str | None, listing_id: str | None) -> None:
+        if lane == CHAT:
+            # A full queue turns the round away before its tokens are charged
+            if self._must_queue() and self.queued >= self.max_queue:
+                self._count(CHAT, "queue_full")
+                raise AdmissionRejected(503, "Chat queue is full; retry shortly.", self.queue_timeout_s)
+            self._check_rate(buyer_id, listing_id)
+            await self._acquire_chat_slot()
+        self._count(lane, "admitted")
+        self.inflight[lane] += 1
+        self.peak_inflight[lane] = max(self.peak_inflight[lane], self.inflight[lane])
+
+    def _leave(self, lane: str) -> None:
+        self.inflight[lane] -= 1
+        if lane == CHAT:
+            self._release_chat_slot()
+
+    @asynccontextmanager
+    async def admit(self, lane: str, buyer_id: str | None, listing_id: str | None) -> AsyncIterator[None]:
+        """
+        Hold a place in `lane` for the body of the `async with`; raises
+        AdmissionRejected when the round is turned away.
+        """
+        await self._enter(lane, buyer_id, listing_id)
+        try:
+            yield
+        finally:
+            self._leave(lane)
+
+    async def run(
+        self, lane: str, buyer_id: str | None, listing_id: str | None, fn: Callable, /, *args, **kwargs,
+    ) -> Any:
+        """
+        Admit a round to `lane`, then run fn(*args, **kwargs) on the IO
+        executor. The place is held until fn returns, not until the caller
+        stops waiting: a cancelled request (e.g. a WS cancel frame) cannot
+        stop a thread that is already waiting on Ollama, so its slot stays
+        taken until that call is over.
+        """
+        await self._enter(lane, buyer_id, listing_id)
+        try:
+            future = submit(IO, fn, *args, **kwargs)
+        except BaseException:
+            self._leave(lane)
+            raise
+        loop = asyncio.get_running_loop()
+
+        def done(_future) -> None:
+            try:
+                loop.call_soon_threadsafe(self._leave, lane)
+            except RuntimeError:
+                pass  # loop closed at shutdown
+
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    def snapshot(self) -> dict:
+        """Limits, lane occupancy and outcome counts, for /health."""
+        return {
+            "chat": {
+                "ratePerBuyer": self.buyers.rate,
+                "ratePerListing": self.listings.rate,
+                "maxInflight": self.max_inflight,
+                "maxQueue": self.max_queue,
+                "inflight": self.inflight[CHAT],
+                "queued": self.queued,
+                "peakQueued": self.peak_queued,
+                "queueWaitSeconds": round(self.wait_seconds, 3),
+            },
+            "commit": {"inflight": self.inflight[COMMIT]},
+            "outcomes": {
+                lane: {outcome: self.outcomes[(lane, outcome)] for outcome in OUTCOMES if self.outcomes[(lane, outcome)]}
+                for lane in LANES
+            },
+            "trackedBuyers": len(self.buyers),
+            "trackedListings": len(self.listings),
+        }
+
+
+ADMISSION = AdmissionController()
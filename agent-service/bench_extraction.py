@@ -0,0 +1,86 @@
+"""
+Benchmark: local offer extractor vs regex fallback vs Ollama extraction.
+
+Scores each backend on a held-out labelled set (seed examples plus synthetic
+messages generated with a different seed than training) for accuracy and
+per-call latency:
+    python bench_extraction.py                 # local + regex
+    python bench_extraction.py --ollama        # also the live Ollama at OLLAMA_URL
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import llm_message_generator as llm
+from intent_model import load_default
+from train_intent_model import _seed_examples, synthesize
+
+
+def _score(name: str, extract, examples: list[dict]) -> dict:
+    latencies = []
+    correct = {"intent": 0, "price": 0, "quantity": 0}
+    for ex in examples:
+        t0 = time.perf_counter()
+        out = extract(ex["text"])
+        latencies.append((time.perf_counter() - t0) * 1e6)
+        correct["intent"] += out.get("intent") == ex["intent"]
+        correct["price"] += out.get("offerPricePerKg") == ex["offerPricePerKg"]
+        correct["quantity"] += out.get("quantity") == ex["quantity"]
+
+    latencies.sort()
+    n = len(examples)
+    return {
+        "backend": name,
+        "intent": correct["intent"] / n,
+        "price": correct["price"] / n,
+        "quantity": correct["quantity"] / n,
+        "meanUs": statistics.mean(latencies),
+        "p99Us": latencies[int(0.99 * (n - 1))],
+    }
+
+
+def _ollama_extract(text: str) -> dict:
+    raw = llm._ollama_generate(
+        prompt=f"Buyer message: {text}",
+        system=llm.EXTRACTION_SYSTEM_PROMPT,
+        temperature=0.0,
+    )
+    try:
+        return json.loads(raw.strip("`").removeprefix("json").strip())
+    except ValueError:
+        return {}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--per-intent", type=int, default=250)
+    parser.add_argument("--seed", type=int, default=2024, help="must differ from the training seed")
+    parser.add_argument("--ollama", action="store_true", help="also benchmark Ollama at OLLAMA_URL")
+    args = parser.parse_args()
+
+    examples = _seed_examples() + synthesize(args.per_intent, args.seed)
+    model = load_default()
+    if model is None:
+        raise SystemExit("intent_model.json missing — run train_intent_model.py first")
+
+    results = [
+        _score("local model", model.extract, examples),
+        _score("regex fallback", llm._regex_fallback, examples),
+    ]
+    if args.ollama:
+        subset = examples[:: max(len(examples) // 100, 1)]
+        results.append(_score(f"ollama ({len(subset)} msgs)", _ollama_extract, subset))
+
+    print(f"{len(examples)} held-out messages")
+    print(f"{'backend':<22} {'intent':>7} {'price':>7} {'qty':>7} {'mean µs':>10} {'p99 µs':>10}")
+    for r in results:
+        print(
+            f"{r['backend']:<22} {r['intent']:>7.1%} {r['price']:>7.1%} {r['quantity']:>7.1%} "
+            f"{r['meanUs']:>10.1f} {r['p99Us']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
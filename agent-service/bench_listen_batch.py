@@ -0,0 +1,125 @@
+"""
+Benchmark: Listener throughput — one extract_intent call per message vs the
+chunked batch path (listen_batch.py), in process and over HTTP.
+
+    python bench_listen_batch.py --messages 20000 --workers 1 4
+    python bench_listen_batch.py --url http://localhost:8000   # also a running server
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import requests
+
+import listen_batch
+from listener import extract_intent
+from schemas import ListenRequest
+
+TEMPLATES = [
+    "I want to sell {q} kg of tomato in {d}",
+    "selling {q} quintals tomatoes from {d}",
+    "what is the current price of tomato in {d}",
+    "ok I accept the offer",
+    "can you do {p} for my tomatoes",
+    "list my stock of {q} kilograms tomato {d}",
+    "price {p} rs, {q}kg, {d}",
+]
+DISTRICTS = ["Palakkad", "Thrissur", "Kozhikode", "Kannur", "Idukki", "Kollam", "Wayanad"]
+
+
+def make_messages(n: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {"rawText": rng.choice(TEMPLATES).format(
+            q=rng.randint(1, 900), p=rng.randint(10, 60), d=rng.choice(DISTRICTS),
+        )}
+        for _ in range(n)
+    ]
+
+
+def _rate(n: int, seconds: float) -> str:
+    return f"{n / seconds:>10.0f} msg/s"
+
+
+def bench_sequential(messages: list[dict]) -> float:
+    t0 = time.perf_counter()
+    for m in messages:
+        extract_intent(ListenRequest(**m)).model_dump_json()
+    return time.perf_counter() - t0
+
+
+def bench_batch(messages: list[dict], workers: int, chunk: int) -> float:
+    listen_batch.shutdown_pool()
+    listen_batch.LISTEN_BATCH_WORKERS = workers
+
+    async def run() -> int:
+        lines = 0
+        async for out in listen_batch.stream_results(listen_batch.chunked(messages, chunk)):
+            lines += out.count("\n")
+        return lines
+
+    # Start the pool outside the timing
+    asyncio.run(_drain(listen_batch.stream_results([messages[:1]])))
+    t0 = time.perf_counter()
+    lines = asyncio.run(run())
+    elapsed = time.perf_counter() - t0
+    assert lines == len(messages), (lines, len(messages))
+    listen_batch.shutdown_pool()
+    return elapsed
+
+
+async def _drain(stream) -> None:
+    async for _ in stream:
+        pass
+
+
+def bench_http(url: str, messages: list[dict], single: int) -> None:
+    session = requests.Session()
+    subset = messages[:single]
+    t0 = time.perf_counter()
+    for m in subset:
+        session.post(f"{url}/agent/listen", json=m).raise_for_status()
+    print(f"{'HTTP /agent/listen, one per call':<36} {_rate(len(subset), time.perf_counter() - t0)}")
+
+    t0 = time.perf_counter()
+    r = session.post(f"{url}/agent/listen/batch", json=messages)
+    r.raise_for_status()
+    assert r.text.count("\n") == len(messages)
+    print(f"{'HTTP /agent/listen/batch (JSON)':<36} {_rate(len(messages), time.perf_counter() - t0)}")
+
+    body = "".join(json.dumps(m) + "\n" for m in messages).encode()
+    t0 = time.perf_counter()
+    r = session.post(
+        f"{url}/agent/listen/batch",
+        data=(body[i:i + 65536] for i in range(0, len(body), 65536)),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    r.raise_for_status()
+    assert r.text.count("\n") == len(messages)
+    print(f"{'HTTP /agent/listen/batch (NDJSON)':<36} {_rate(len(messages), time.perf_counter() - t0)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk", type=int, default=listen_batch.LISTEN_BATCH_CHUNK)
+    parser.add_argument("--url", help="also benchmark a running agent-service")
+    parser.add_argument("--http-single", type=int, default=500, help="messages sent one per call")
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    print(f"{args.messages} messages, chunk {args.chunk}")
+    print(f"{'in process, one call per message':<36} {_rate(len(messages), bench_sequential(messages))}")
+    for workers in args.workers:
+        label = f"in process, batch, {workers} worker(s)"
+        print(f"{label:<36} {_rate(len(messages), bench_batch(messages, workers, args.chunk))}")
+    if args.url:
+        bench_http(args.url.rstrip("/"), messages, args.http_single)
+
+
+if __name__ == "__main__":
+    main()
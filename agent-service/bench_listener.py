@@ -0,0 +1,154 @@
+"""
+Benchmark: Listener slot extraction — compiled single-pass matcher vs the
+previous per-pattern / linear-scan approach, as the gazetteer grows.
+Also times typo lookups: the symmetric-delete index vs a linear Levenshtein
+scan over every name.
+
+    python bench_listener.py --sizes 14 1000 5000 20000
+"""
+
+import argparse
+import random
+import re
+import string
+import time
+
+import listener
+from gazetteer import FuzzyIndex, max_edits
+from schemas import ListenRequest
+
+TYPOS = ["palakad", "thrisur", "kozhikkode", "kanur", "eranakulam", "tomatos", "wayand"]
+
+TEXTS = [
+    "I want to sell 500 kg of tomato in Palakkad",
+    "what is the current market price of tomato in Ernakulam?",
+    "can you do 25 for 5 quintals, that is too low",
+    "ok I accept the deal, deliver to Kozhikode",
+    "create new listing with 2 tonnes of Tomato at Kasaragod",
+]
+
+# The regexes the Listener used to run one by one
+LEGACY_INTENT_PATTERNS = {
+    "create_listing": [
+        r"\b(sell|list|post|offer|put up|want to sell|selling)\b",
+        r"\b(create|new|add)\b.*\b(listing|lot|stock)\b",
+    ],
+    "check_price": [
+        r"\b(price|rate|cost|worth|value|going for)\b",
+        r"\b(how much|what is|current)\b.*\b(price|rate)\b",
+        r"\b(market|mandi)\b.*\b(price|rate)\b",
+    ],
+    "accept_offer": [
+        r"\b(accept|agree|yes|ok|done|confirm|take)\b.*\b(offer|deal|bid)\b",
+        r"\b(go ahead|proceed)\b",
+    ],
+    "counter_offer": [
+        r"\b(counter|negotiate|higher|more|increase|raise)\b",
+        r"\b(not enough|too low|want more)\b",
+        r"\b(can you do|at least)\b.*\b(\d+)\b",
+    ],
+}
+LEGACY_QUANTITY_PATTERNS = [
+    r"(\d+(?:\.\d+)?)\s*(?:kg|kilos?|kilograms?)\b",
+    r"(\d+(?:\.\d+)?)\s*(?:quintals?|qtl)\b",
+    r"(\d+(?:\.\d+)?)\s*(?:tonnes?|tons?|mt)\b",
+]
+
+
+def legacy_slots(text: str, crops: list[str], districts: list[str]) -> tuple:
+    text_lower = text.lower()
+    scores = {}
+    for intent, patterns in LEGACY_INTENT_PATTERNS.items():
+        for pattern in patterns:
+            if re.search(pattern, text_lower):
+                scores[intent] = scores.get(intent, 0) + 1
+    crop = next((c for c in crops if c.lower() in text_lower), None)
+    district = next((d for d in districts if d.lower() in text_lower), None)
+    quantity = None
+    for pattern in LEGACY_QUANTITY_PATTERNS:
+        match = re.search(pattern, text_lower)
+        if match:
+            quantity = float(match.group(1))
+            break
+    if quantity is None and next((c for c in crops if c.lower() in text_lower), None):
+        match = re.search(r"\b(\d+(?:\.\d+)?)\b", text)
+        quantity = float(match.group(1)) if match else None
+    return scores, crop, district, quantity
+
+
+def levenshtein(a: str, b: str) -> int:
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        row = [i]
+        for j, cb in enumerate(b, 1):
+            row.append(min(row[j - 1] + 1, prev[j] + 1, prev[j - 1] + (ca != cb)))
+        prev = row
+    return prev[-1]
+
+
+def linear_fuzzy(word: str, names: list[str]) -> str | None:
+    # Same budget as the index: that of the shorter of the two words
+    matches = [
+        (dist, n) for n in names
+        if n[0] == word[0] and (dist := levenshtein(word, n)) <= min(max_edits(word), max_edits(n))
+    ]
+    return min(matches, default=(None, None))[1]
+
+
+def _fuzzy_per_call_us(fn, iterations: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(iterations):
+        fn(TYPOS[i % len(TYPOS)])
+    return (time.perf_counter() - t0) / iterations * 1e6
+
+
+def _fake_names(n: int, rng: random.Random) -> list[str]:
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(6, 12))).title() for _ in range(n)]
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(iterations):
+        fn(TEXTS[i % len(TEXTS)])
+    return (time.perf_counter() - t0) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[14, 1000, 5000, 20000])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print(f"{'gazetteer':>10} {'build ms':>9} {'legacy µs':>10} {'compiled µs':>12} {'speed-up':>9}")
+    for size in args.sizes:
+        # Real names last, so the legacy scan walks the whole list
+        crops = _fake_names(size // 10, rng) + listener.KNOWN_CROPS
+        districts = _fake_names(size, rng) + listener.KNOWN_DISTRICTS
+
+        t0 = time.perf_counter()
+        gazetteer = listener.build_gazetteer(crops, districts)
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        legacy = _per_call_us(lambda t: legacy_slots(t, crops, districts), args.iterations)
+        # Exact matching only, like for like with the legacy scan
+        compiled = _per_call_us(lambda t: listener._scan(t, gazetteer, fuzzy=False), args.iterations)
+        print(f"{size:>10} {build_ms:>9.1f} {legacy:>10.1f} {compiled:>12.1f} {legacy / compiled:>8.1f}x")
+
+    print(f"\n{'names':>10} {'linear µs':>10} {'index µs':>10} {'speed-up':>9}")
+    for size in args.sizes:
+        names = [n.lower() for n in _fake_names(size, rng) + listener.KNOWN_DISTRICTS + listener.KNOWN_CROPS]
+        index = FuzzyIndex()
+        for name in names:
+            index.add(name, name)
+        iterations = max(args.iterations // max(size // 100, 1), 20)
+        linear = _fuzzy_per_call_us(lambda w: linear_fuzzy(w, names), iterations)
+        indexed = _fuzzy_per_call_us(lambda w: min(index.search(w, max_edits(w)), default=None), args.iterations)
+        print(f"{size:>10} {linear:>10.1f} {indexed:>10.1f} {linear / indexed:>8.1f}x")
+
+    full = _per_call_us(lambda t: listener.extract_intent(ListenRequest(rawText=t)), args.iterations)
+    print(f"\nextract_intent end to end (shipped gazetteer): {full:.1f} µs/call")
+
+
+if __name__ == "__main__":
+    main()
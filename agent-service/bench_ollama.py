@@ -0,0 +1,92 @@
+"""
+Benchmark: Ollama warm-up + per-conversation context reuse vs cold, stateless calls.
+
+Runs against the local mock server (mock_ollama.py), so no model is needed:
+    python bench_ollama.py --conversations 5 --rounds 4
+"""
+
+import argparse
+import statistics
+import time
+
+import llm_message_generator as llm
+from mock_ollama import MockOllama
+
+
+def _round(conversation: str, offer: float) -> None:
+    llm.extract_offer_from_text(f"I can offer {offer} per kg", conversation=conversation)
+    llm.generate_negotiation_message(
+        {"status": "counter_offer", "counter_price": offer + 1.5},
+        {
+            "crop": "Tomato", "quantity": 500,
+            "farmer_district": "Palakkad", "buyer_district": "Malappuram",
+            "buyer_offer": offer, "delivery_cost": 160.0,
+            "net_profit_at_offer": offer * 500 - 160.0, "reserve_price": offer + 3,
+            "round_number": 1,
+        },
+        conversation=conversation,
+    )
+
+
+def run_scenario(mock: MockOllama, warm: bool, reuse: bool, conversations: int, rounds: int) -> dict:
+    mock.unload()
+    llm._CONTEXTS.clear()
+    llm.OLLAMA_CONTEXT_REUSE = reuse
+    llm.OLLAMA_WARMUP = warm
+    before = dict(mock.stats)
+
+    warmup_ms = 0.0
+    if warm:
+        t0 = time.perf_counter()
+        llm.warm_up_model()
+        warmup_ms = (time.perf_counter() - t0) * 1000
+
+    latencies = []
+    for c in range(conversations):
+        for r in range(rounds):
+            t0 = time.perf_counter()
+            _round(f"L{c}:B{c}", 20.0 + r)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    return {
+        "warmupMs": warmup_ms,
+        "firstRoundMs": latencies[0],
+        "meanRoundMs": statistics.mean(latencies),
+        "promptChars": mock.stats["promptCharsProcessed"] - before["promptCharsProcessed"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--conversations", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--load-ms", type=float, default=800.0)
+    parser.add_argument("--prompt-ms-per-char", type=float, default=0.05)
+    parser.add_argument("--gen-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    # Measure LLM extraction, not the local extractor
+    llm.LOCAL_EXTRACTOR = None
+
+    with MockOllama(
+        load_ms=args.load_ms,
+        prompt_ms_per_char=args.prompt_ms_per_char,
+        gen_ms=args.gen_ms,
+    ) as mock:
+        llm.OLLAMA_URL = mock.url
+        scenarios = {
+            "cold, stateless": run_scenario(mock, False, False, args.conversations, args.rounds),
+            "warm-up only": run_scenario(mock, True, False, args.conversations, args.rounds),
+            "warm-up + context": run_scenario(mock, True, True, args.conversations, args.rounds),
+        }
+
+    print(f"{'scenario':<20} {'warm-up ms':>10} {'1st round ms':>13} {'mean round ms':>14} {'prompt chars':>13}")
+    for name, r in scenarios.items():
+        print(
+            f"{name:<20} {r['warmupMs']:>10.1f} {r['firstRoundMs']:>13.1f} "
+            f"{r['meanRoundMs']:>14.1f} {r['promptChars']:>13}"
+        )
+
+
+if __name__ == "__main__":
+    main()
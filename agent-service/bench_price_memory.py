@@ -0,0 +1,131 @@
+"""
+Benchmark: memory per mandi price row, and the cost of a full-column scan,
+for the row representations the service has used:
+
+    dicts        7-key dict per row, strings as parsed (previous snapshot format)
+    MandiPrice   a pydantic model per row (previous mandiPrices list)
+    MandiRow     slotted record per row, strings as parsed
+    PriceBatch   float64 columns + dictionary-encoded strings (current)
+
+Rows are synthetic with realistic cardinality (14 districts, ~300 markets,
+three years of dates); every string is a fresh object, as a CSV reader
+produces them.
+
+    python bench_price_memory.py --rows 1000000
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from price_batch import MandiRow, PriceBatch
+from schemas import MandiPrice
+
+DISTRICTS = [
+    "Thiruvananthapuram", "Kollam", "Pathanamthitta", "Alappuzha", "Kottayam", "Idukki", "Ernakulam",
+    "Thrissur", "Palakkad", "Malappuram", "Kozhikode", "Wayanad", "Kannur", "Kasaragod",
+]
+
+
+def _source(rows: int, seed: int = 0):
+    """(district, market, min, max, modal, arrival, date) tuples with fresh string objects."""
+    rng = random.Random(seed)
+    markets = [(d.encode(), f"{d} Market {i} APMC".encode()) for d in DISTRICTS for i in range(22)]
+    dates = [f"{day % 28 + 1:02d}-{day // 28 % 12 + 1:02d}-{2024 + day // 336}".encode() for day in range(1008)]
+    for _ in range(rows):
+        district, market = rng.choice(markets)
+        modal = round(rng.uniform(15, 40), 2)
+        yield (
+            district.decode(), market.decode(),
+            round(modal * 0.9, 2), round(modal * 1.1, 2), modal,
+            round(rng.uniform(0, 5), 2), rng.choice(dates).decode(),
+        )
+
+
+def build_dicts(source):
+    return [
+        {
+            "district": d, "market": m, "minPricePerKg": lo, "maxPricePerKg": hi,
+            "modalPricePerKg": modal, "arrivalTonnes": arrival, "date": dt,
+        }
+        for d, m, lo, hi, modal, arrival, dt in source
+    ]
+
+
+def build_models(source):
+    return [
+        MandiPrice(
+            district=d, market=m, minPricePerKg=lo, maxPricePerKg=hi,
+            modalPricePerKg=modal, arrivalTonnes=arrival, date=dt,
+        )
+        for d, m, lo, hi, modal, arrival, dt in source
+    ]
+
+
+def build_slotted(source):
+    return [MandiRow(*row) for row in source]
+
+
+def build_batch(source):
+    batch = PriceBatch()
+    for row in source:
+        batch.append(*row)
+    return batch
+
+
+def scan_dicts(rows) -> float:
+    return sum(p["modalPricePerKg"] for p in rows) / len(rows)
+
+
+def scan_attrs(rows) -> float:
+    return sum(p.modalPricePerKg for p in rows) / len(rows)
+
+
+def scan_batch(batch) -> float:
+    return sum(batch.modalPricePerKg) / len(batch)
+
+
+REPRESENTATIONS = [
+    ("dicts", build_dicts, scan_dicts),
+    ("MandiPrice", build_models, scan_attrs),
+    ("MandiRow", build_slotted, scan_attrs),
+    ("PriceBatch", build_batch, scan_batch),
+]
+
+
+def measure(build, scan, rows: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    data = build(_source(rows))
+    build_s = time.perf_counter() - t0
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    t0 = time.perf_counter()
+    scan(data)
+    scan_s = time.perf_counter() - t0
+    del data
+    gc.collect()
+    return {"bytesPerRow": retained / rows, "buildS": build_s, "scanMs": scan_s * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{args.rows:,} rows")
+    print(f"{'representation':<14}{'bytes/row':>11}{'MB total':>10}{'build':>10}{'mean-price scan':>17}")
+    for name, build, scan in REPRESENTATIONS:
+        r = measure(build, scan, args.rows)
+        print(
+            f"{name:<14}{r['bytesPerRow']:>11.0f}{r['bytesPerRow'] * args.rows / 1e6:>10.1f}"
+            f"{r['buildS']:>9.2f}s{r['scanMs']:>14.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
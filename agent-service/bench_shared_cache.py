@@ -0,0 +1,92 @@
+"""
+Benchmark: cache hit rate by worker count, per-process caches vs the
+two-level cache (shared_cache.py), on simulated traffic.
+
+Each worker gets its own TieredCache. They share one MemoryRedis stand-in,
+wrapped to add a network round trip (--rtt-ms) to every L2 call. Requests
+draw keys from a Zipf-like distribution over --keys distinct keys, and each
+request goes to a random worker, as behind a load balancer. A miss runs a
+computation (--compute-ms, e.g. an Ollama extraction).
+
+    python bench_shared_cache.py --requests 10000 --keys 2000 --rtt-ms 0.3
+"""
+
+import argparse
+import random
+import time
+
+from shared_cache import MemoryRedis, TieredCache
+
+
+class SlowStore(MemoryRedis):
+    """MemoryRedis with a fixed delay per call, standing in for the network."""
+
+    def __init__(self, rtt_s: float):
+        super().__init__()
+        self.rtt_s = rtt_s
+        self.calls = 0
+
+    def _wait(self) -> None:
+        self.calls += 1
+        if self.rtt_s:
+            time.sleep(self.rtt_s)
+
+    def get(self, name):
+        self._wait()
+        return super().get(name)
+
+    def set(self, name, value, ex=None, px=None, nx=False):
+        self._wait()
+        return super().set(name, value, ex=ex, px=px, nx=nx)
+
+
+def _keys(n: int, distinct: int, seed: int = 0) -> list[int]:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return rng.choices(range(distinct), weights=weights, k=n)
+
+
+def run(workers: int, keys: list[int], shared: bool, rtt_s: float, compute_s: float) -> dict:
+    store = SlowStore(rtt_s) if shared else None
+    caches = [TieredCache("bench", maxsize=len(keys), ttl_s=3600, store=store) for _ in range(workers)]
+    rng = random.Random(1)
+    computed = 0
+    cost_s = 0.0
+    for key in keys:
+        cache = caches[rng.randrange(workers)]
+        t0 = time.perf_counter()
+        if cache.get(key) is None:
+            computed += 1
+            cache.put(key, {"value": key})
+            cost_s += compute_s
+        cost_s += time.perf_counter() - t0
+    return {"hitRatio": 1 - computed / len(keys), "computed": computed, "msPerRequest": cost_s / len(keys) * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--keys", type=int, default=2_000)
+    parser.add_argument("--rtt-ms", type=float, default=0.3)
+    parser.add_argument("--compute-ms", type=float, default=400.0)
+    args = parser.parse_args()
+
+    keys = _keys(args.requests, args.keys)
+    print(
+        f"{args.requests:,} requests over {args.keys:,} keys, L2 round trip {args.rtt_ms} ms, "
+        f"miss costs {args.compute_ms:.0f} ms"
+    )
+    print(f"{'':>7}  {'per-process':^30}  {'two-level':^30}")
+    print(f"{'workers':>7}  " + f"{'hit ratio':>10}{'computed':>10}{'ms/req':>10}  " * 2)
+    for workers in (1, 2, 4, 8):
+        row = [
+            run(workers, keys, False, 0.0, args.compute_ms / 1000),
+            run(workers, keys, True, args.rtt_ms / 1000, args.compute_ms / 1000),
+        ]
+        print(f"{workers:>7}  " + "".join(
+            f"{r['hitRatio']:>10.1%}{r['computed']:>10,}{r['msPerRequest']:>10.1f}  " for r in row
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Microbenchmarks for the agent hot paths, in-process and without network,
+checked against a saved JSON baseline.
+
+    python bench_suite.py --save               # record bench_baseline.json
+    python bench_suite.py                      # compare; exit 1 on a regression
+    python bench_suite.py -k evaluate --tolerance 0.15
+
+Each case is timed as the best of --repeat runs of an auto-sized loop
+(~--min-time seconds each), which is steadier than a mean on a shared box.
+A case regresses when it is slower than baseline × (1 + tolerance);
+TOLERANCES widens that for cases that cross threads.
+
+`handle_buyer_chat` runs the real pipeline with Ollama replaced by a stub
+that returns a canned message, so it measures everything but the LLM.
+
+Baselines are machine-specific — record one per machine (or CI runner
+type) rather than committing one.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable
+
+import llm_message_generator as llm
+from buyer_chat import handle_buyer_chat
+from delivery_config import DELIVERY_AGENTS
+from distance import haversine
+from evaluator import evaluate_offers
+from listener import extract_intent
+from market_data import CSV_FILES, _parse_mandi_csv, get_overall_stats, load_mandi_prices
+from market_analyst import analyze_market_full
+from negotiation import decide, negotiate, to_query
+from records import MarketQuery, NegotiationQuery
+from schemas import (
+    ChatRequest, EvaluateRequest, Farmer, ListenRequest, NegotiateBuyer,
+    NegotiateFarmer, NegotiateRequest, Offer,
+)
+from wire import dumps
+
+BASELINE_FILE = os.environ.get("BENCH_BASELINE", "bench_baseline.json")
+DEFAULT_TOLERANCE = 0.25
+
+# Cases whose timing includes thread hand-offs get more slack
+TOLERANCES = {
+    "handle_buyer_chat": 0.5,
+}
+
+OFFER_COUNTS = (1, 10, 100)
+
+
+# ─── Cases ────────────────────────────────────────────────────────────────────
+
+def _stub_ollama(prompt: str, system: str = "", temperature: float = 0.7, **kwargs) -> str:
+    return "Thank you for your offer. We can do ₹24.50/kg including delivery."
+
+
+def _cases() -> dict[str, Callable[[], object]]:
+    districts = sorted(DELIVERY_AGENTS)
+    negotiate_request = NegotiateRequest(
+        crop="Tomato",
+        quantity=500,
+        farmer=NegotiateFarmer(district="Palakkad"),
+        buyer=NegotiateBuyer(district="Malappuram"),
+        offerPricePerKg=22,
+        reservePrice=25,
+    )
+    listen_request = ListenRequest(rawText="I want to sell 5 quintals of tomato in Palakkad")
+    chat_request = ChatRequest(
+        listingId="L1",
+        buyerMessage="I can offer 22 per kg",
+        buyerId="B1",
+        buyerDistrict="Malappuram",
+        crop="Tomato",
+        quantity=500,
+        farmerDistrict="Palakkad",
+        roundNumber=2,
+        currentOfferPrice=22,
+        lastCounterPrice=24,
+    )
+    csv_path = CSV_FILES["Tomato"]
+
+    cases: dict[str, Callable[[], object]] = {
+        "load_mandi_prices": lambda: load_mandi_prices("Tomato"),
+        "load_mandi_prices[parse]": lambda: _parse_mandi_csv(csv_path),
+        "get_overall_stats": lambda: get_overall_stats("Tomato"),
+        "haversine": lambda: haversine(10.7867, 76.6548, 11.0732, 76.074),
+        "negotiate": lambda: negotiate(negotiate_request),
+        "negotiation.decide": lambda: decide(NegotiationQuery("Tomato", 500, "Palakkad", "Malappuram", 22, 25)),
+        "negotiate[wire]": lambda: dumps(decide(to_query(negotiate_request)).to_wire()),
+        "analyze_market_full": lambda: analyze_market_full(MarketQuery("Tomato", 500, "Palakkad")),
+        "extract_intent": lambda: extract_intent(listen_request),
+        "_regex_fallback": lambda: llm._regex_fallback("I can offer 22 per kg for 500 kg"),
+        "handle_buyer_chat": lambda: handle_buyer_chat(chat_request),
+    }
+    for n in OFFER_COUNTS:
+        request = EvaluateRequest(
+            crop="Tomato",
+            quantity=500,
+            farmer=Farmer(district="Palakkad", lat=10.7867, lon=76.6548),
+            offers=[
+                Offer(buyerId=f"B{i}", buyerDistrict=districts[i % len(districts)], offerPricePerKg=20 + i % 9)
+                for i in range(n)
+            ],
+        )
+        cases[f"evaluate_offers[{n}]"] = lambda request=request: evaluate_offers(request)
+    return cases
+
+
+# ─── Runner ───────────────────────────────────────────────────────────────────
+
+def _time_case(fn: Callable[[], object], repeat: int, min_time: float) -> dict:
+    """Best-of-`repeat` ns per call, with the loop sized to ~min_time s."""
+    fn()  # warm caches / lazy imports
+    loops = 1
+    while True:
+        t0 = time.perf_counter_ns()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter_ns() - t0
+        if elapsed >= min_time * 1e9 or loops >= 1_000_000:
+            break
+        loops *= 10 if elapsed < min_time * 1e8 else 2
+
+    runs = [elapsed / loops]
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter_ns()
+        for _ in range(loops):
+            fn()
+        runs.append((time.perf_counter_ns() - t0) / loops)
+    return {"ns": round(min(runs), 1), "loops": loops}
+
+
+def _machine() -> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()}
+
+
+def _fmt_ns(ns: float) -> str:
+    if ns >= 1e6:
+        return f"{ns / 1e6:8.2f} ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:8.2f} µs"
+    return f"{ns:8.0f} ns"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown as a fraction (default %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timed run")
+    parser.add_argument("-k", dest="filter", default="", help="only cases whose name contains this")
+    args = parser.parse_args()
+
+    llm._ollama_generate = _stub_ollama
+    cases = {name: fn for name, fn in _cases().items() if args.filter in name}
+
+    baseline: dict = {}
+    if not args.save:
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"No baseline at {args.baseline}; run with --save to record one.")
+        if baseline and baseline.get("machine") != _machine():
+            print(f"Warning: baseline recorded on {baseline.get('machine')}, this is {_machine()}")
+
+    results = {}
+    regressions = []
+    print(f"{'case':<26}{'time':>12}{'baseline':>12}{'change':>9}")
+    for name, fn in cases.items():
+        results[name] = _time_case(fn, args.repeat, args.min_time)
+        ns = results[name]["ns"]
+        base = baseline.get("cases", {}).get(name)
+        if base is None:
+            print(f"{name:<26}{_fmt_ns(ns):>12}")
+            continue
+        change = ns / base["ns"] - 1
+        tolerance = max(args.tolerance, TOLERANCES.get(name, 0))
+        flag = "  REGRESSED" if change > tolerance else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<26}{_fmt_ns(ns):>12}{_fmt_ns(base['ns']):>12}{change:>+8.0%}{flag}")
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"machine": _machine(), "cases": results}, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
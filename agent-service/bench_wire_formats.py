@@ -0,0 +1,102 @@
+"""
+Benchmark: JSON vs MessagePack on the agent service's own payloads —
+encoded size, encode time and decode time per payload.
+
+    json      stdlib (what FastAPI uses to parse request bodies)
+    orjson    the JSON encoder behind WireResponse, when installed
+    msgpack   Content-Type / Accept: application/msgpack
+
+Payloads are a chat request (the backend's per-round call), a negotiate
+response, an orchestrate response with its mandi price list, and a
+1000-item /agent/listen/batch body and result set.
+
+    python bench_wire_formats.py
+"""
+
+import json
+import time
+from typing import Any, Callable
+
+import msgpack
+
+from listener import extract_intent
+from market_analyst import analyze_market_full
+from negotiation import decide
+from records import MarketQuery, NegotiationQuery
+from schemas import ListenRequest
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _payloads() -> dict[str, Any]:
+    listen = [
+        {"rawText": f"I want to sell {q} kg of tomato in Palakkad", "language": "en"}
+        for q in range(1, 1001)
+    ]
+    analysis = analyze_market_full(MarketQuery("Tomato", 500, "Palakkad")).to_detail()
+    return {
+        "chat request": {
+            "listingId": "L1", "buyerMessage": "I can offer 22 per kg", "buyerId": "B1",
+            "buyerDistrict": "Malappuram", "crop": "Tomato", "quantity": 500,
+            "farmerDistrict": "Palakkad", "roundNumber": 2, "currentOfferPrice": 22,
+            "lastCounterPrice": 24,
+        },
+        "negotiate response": decide(NegotiationQuery("Tomato", 500, "Palakkad", "Malappuram", 22, 25)).to_wire(),
+        "orchestrate market": analysis.model_dump(mode="json"),
+        "listen batch x1000": listen,
+        "listen results x1000": [
+            extract_intent(ListenRequest(**item)).model_dump(mode="json") for item in listen
+        ],
+    }
+
+
+def _codecs() -> dict[str, tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    codecs = {
+        "json": (
+            lambda obj: json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+            json.loads,
+        ),
+    }
+    if orjson is not None:
+        codecs["orjson"] = (orjson.dumps, orjson.loads)
+    codecs["msgpack"] = (msgpack.packb, msgpack.unpackb)
+    return codecs
+
+
+def _best_us(fn: Callable[[], object], min_time: float = 0.2, repeat: int = 5) -> float:
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - t0 >= min_time / repeat:
+            break
+        loops *= 2
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / loops)
+    return best * 1e6
+
+
+def main() -> None:
+    codecs = _codecs()
+    print(f"{'payload':<22}{'codec':<9}{'bytes':>9}{'encode µs':>12}{'decode µs':>12}")
+    for name, payload in _payloads().items():
+        for codec, (encode, decode) in codecs.items():
+            data = encode(payload)
+            assert decode(data) == payload
+            print(
+                f"{name:<22}{codec:<9}{len(data):>9,}"
+                f"{_best_us(lambda: encode(payload)):>12.1f}{_best_us(lambda: decode(data)):>12.1f}"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ Buyer Chat Flow — LLM-powered negotiation chat.
 
 Flow:
     1. LLM extracts structured offer from buyer text
+       (market analysis and delivery context run while it is in flight)
     2. Python engine makes the decision (accept / counter / reject)
     3. LLM generates human-style response
     4. Returns decision + chatMessage + ReservePrice
@@ -11,32 +12,200 @@ LLM = communication layer.
 Python engine = decision layer.
 """
 
+import functools
+import os
+import time
+from concurrent.futures import Future
+from typing import Callable
+
 from schemas import (
     ChatRequest,
     ChatResponse,
     ChatDecision,
-    NegotiateRequest,
-    NegotiateFarmer,
-    NegotiateBuyer,
-    MarketAnalysisRequest,
 )
-from llm_message_generator import generate_negotiation_message, extract_offer_from_text
-from negotiation import negotiate
+from admission import CHAT, COMMIT
+from llm_message_generator import (
+    LOCAL_EXTRACTOR, generate_negotiation_message, extract_offer_from_text, _regex_fallback,
+)
+from negotiation import decide
 from market_analyst import analyze_market_full
-from delivery_config import DELIVERY_AGENTS, PRICE_PER_KM
-from distance import haversine
+from distance import hub_distance
+from speculation import (
+    SPECULATIVE_CACHE, SPECULATIVE_MODE, STATS as SPECULATIVE_STATS, likely_offers, schedule,
+)
+from executors import ManagedExecutor
+from records import MarketQuery, NegotiationQuery
+from tracing import in_context, span
+
+# Default end-to-end latency budget for chat rounds (unset = no budget)
+_DEFAULT_BUDGET = os.environ.get("CHAT_LATENCY_BUDGET_MS")
+CHAT_LATENCY_BUDGET_MS = float(_DEFAULT_BUDGET) if _DEFAULT_BUDGET else None
+
+# Stages that don't depend on the buyer's text run here while extraction is in flight
+_STAGE_POOL = ManagedExecutor("chat-stage", int(os.environ.get("CHAT_STAGE_WORKERS", "16")))
 
 
-def handle_buyer_chat(request: ChatRequest) -> ChatResponse:
+def _timed(timings: dict, name: str, fn, *args, **kwargs):
+    """Run fn in a `chat.<name>` span and record its duration (ms) under `name`."""
+    t0 = time.perf_counter()
+    try:
+        with span(f"chat.{name}"):
+            return fn(*args, **kwargs)
+    finally:
+        timings[name] = round((time.perf_counter() - t0) * 1000, 3)
+
+
+def _cancel(timings: dict, name: str, future: Future) -> None:
+    """Drop a speculative stage; it is marked None if it never got to run."""
+    if future.cancel():
+        timings[name] = None
+
+
+def _delivery_context(request: ChatRequest) -> tuple[float, float]:
+    """Distance (km) and delivery cost between farmer and buyer hubs."""
+    dist_km = hub_distance(request.farmerDistrict, request.buyerDistrict)
+    # Same formula as negotiation.py
+    delivery_cost = round(max(50.0, dist_km * request.quantity * 0.5 / 100), 2)
+    return dist_km, delivery_cost
+
+
+def explicit_ids(request: ChatRequest) -> tuple[str | None, str | None]:
+    """(buyerId, listingId), each None when the caller left it at its schema default."""
+    fields = request.model_fields_set
+    return (
+        request.buyerId if "buyerId" in fields else None,
+        request.listingId if "listingId" in fields else None,
+    )
+
+
+def conversation_key(request: ChatRequest) -> str | None:
+    """
+    The listing/buyer negotiation a round belongs to, or None when the caller
+    left either id at its schema default: rounds of unrelated negotiations
+    must not share one Ollama context.
+    """
+    buyer_id, listing_id = explicit_ids(request)
+    if buyer_id is None or listing_id is None:
+        return None
+    return f"{listing_id}:{buyer_id}"
+
+
+def chat_lane(request: ChatRequest) -> str:
+    """
+    Admission lane for a chat round (see admission.py): COMMIT when the buyer
+    confirms the last counter-offer, which the pipeline answers from a
+    template, else CHAT. Classified with the local extractor (~0.1 ms) or the
+    regex fallback, never Ollama; the pipeline still makes the decision.
+    """
+    if not request.lastCounterPrice:
+        return CHAT
+    extracted = (LOCAL_EXTRACTOR.extract if LOCAL_EXTRACTOR is not None else _regex_fallback)(request.buyerMessage)
+    if extracted.get("intent") == "accept_counter" and extracted.get("offerPricePerKg") is None:
+        return COMMIT
+    return CHAT
+
+
+class _InlineStage(Future):
+    """
+    A stage run in the caller's thread when its result is first asked for,
+    or never if it is cancelled before that.
+    """
+
+    def __init__(self, call: Callable[[], object]):
+        super().__init__()
+        self._call = call
+
+    def result(self, timeout: float | None = None):
+        if not self.done() and self.set_running_or_notify_cancel():
+            try:
+                self.set_result(self._call())
+            except BaseException as e:
+                self.set_exception(e)
+        return super().result(timeout)
+
+
+def _stage(lane: str, timings: dict, name: str, fn, *args, **kwargs) -> Future:
+    """
+    Start a stage on the chat-stage pool, or (COMMIT lane) defer it to the
+    caller's thread: a round that closes a deal must not wait for a pool
+    worker behind chat rounds.
+    """
+    if lane == COMMIT:
+        return _InlineStage(functools.partial(_timed, timings, name, fn, *args, **kwargs))
+    return _STAGE_POOL.submit(in_context(_timed), timings, name, fn, *args, **kwargs)
+
+
+def handle_buyer_chat(
+    request: ChatRequest,
+    timings: dict | None = None,
+    events: Callable[[str, dict], None] | None = None,
+    lane: str = CHAT,
+) -> ChatResponse:
     """
     Process a buyer's chat message through the full negotiation pipeline.
+
+    If `timings` is given, it is filled with per-stage durations in ms
+    (None for stages cancelled before they ran).
+
+    If `events` is given, it is called from the worker thread as partial
+    results are ready: ("decision", {...}) once the engine has decided, then
+    ("delta", {"text": ...}) for the reply message as it is generated. The
+    returned ChatResponse is still the complete, authoritative result.
+
+    `request.latencyBudgetMs` (or CHAT_LATENCY_BUDGET_MS) bounds the LLM
+    stages: each one gets whatever is left of the budget.
+
+    `lane` is the round's admission lane (chat_lane); COMMIT rounds run
+    their stages in this thread instead of on the shared stage pool.
     """
+    timings = {} if timings is None else timings
+    t_start = time.perf_counter()
+    budget_ms = request.latencyBudgetMs or CHAT_LATENCY_BUDGET_MS
+    deadline = t_start + budget_ms / 1000 if budget_ms else None
+    try:
+        return _run_chat_stages(request, timings, deadline, events, lane)
+    finally:
+        timings["total"] = round((time.perf_counter() - t_start) * 1000, 3)
+
+
+def _remaining_ms(deadline: float | None) -> float | None:
+    if deadline is None:
+        return None
+    return (deadline - time.perf_counter()) * 1000
+
+
+def _run_chat_stages(
+    request: ChatRequest,
+    timings: dict,
+    deadline: float | None,
+    events: Callable[[str, dict], None] | None = None,
+    lane: str = CHAT,
+) -> ChatResponse:
+    # One Ollama context per listing/buyer negotiation; none without both ids
+    conversation = conversation_key(request)
+
     # ── Step 1: Extract offer from buyer text ─────────────────────────────
-    extracted = extract_offer_from_text(request.buyerMessage)
+    # Market analysis and delivery context don't depend on the buyer's text,
+    # so they are scheduled alongside the extraction call.
+    extract_future = _stage(
+        lane, timings, "extract",
+        extract_offer_from_text, request.buyerMessage,
+        conversation=conversation, budget_ms=_remaining_ms(deadline),
+    )
+    market_future = _stage(
+        lane, timings, "market",
+        analyze_market_full, MarketQuery(request.crop, request.quantity, request.farmerDistrict),
+    )
+    dist_km, delivery_cost = _timed(timings, "delivery", _delivery_context, request)
+
+    try:
+        extracted = extract_future.result()
+    except BaseException:
+        _cancel(timings, "market", market_future)
+        raise
 
     # If LLM didn't find a price, try regex as secondary check
     if extracted.get("offerPricePerKg") is None:
-        from llm_message_generator import _regex_fallback
         regex_result = _regex_fallback(request.buyerMessage)
         if regex_result.get("offerPricePerKg") is not None:
             extracted["offerPricePerKg"] = regex_result["offerPricePerKg"]
@@ -49,6 +218,14 @@ def handle_buyer_chat(request: ChatRequest) -> ChatResponse:
     if extracted.get("offerPricePerKg") is not None:
         buyer_intent = "new_offer"
 
+    # No price to negotiate on — the market analysis isn't needed
+    if (
+        buyer_intent in ("reject", "question")
+        or (buyer_intent == "accept_counter" and request.lastCounterPrice)
+        or offer_price is None
+    ):
+        _cancel(timings, "market", market_future)
+
     # Buyer is accepting a previous counter-offer
     if buyer_intent == "accept_counter" and request.lastCounterPrice:
         return ChatResponse(
@@ -109,11 +286,7 @@ def handle_buyer_chat(request: ChatRequest) -> ChatResponse:
         )
 
     # ── Step 2: Get market analysis for reserve price ─────────────────────
-    market = analyze_market_full(MarketAnalysisRequest(
-        crop=request.crop,
-        quantity=request.quantity,
-        farmerDistrict=request.farmerDistrict,
-    ))
+    market = market_future.result()
     reserve_price = market.recommendedReservePrice
 
     # Guard: if no market data for this crop, we can't negotiate
@@ -130,32 +303,75 @@ def handle_buyer_chat(request: ChatRequest) -> ChatResponse:
             ReservePrice=None,
         )
 
+    # ── Speculative hit: this price was pre-computed after our last counter.
+    # Only for a known negotiation: without both ids, replies would be
+    # shared between unrelated buyers.
+    response = None
+    if SPECULATIVE_MODE and conversation is not None:
+        hit = SPECULATIVE_CACHE.get(_speculation_key(request, offer_price))
+        if hit is not None and hit.ReservePrice == reserve_price:
+            timings["speculative"] = 0.0
+            response = hit.model_copy(deep=True)
+            if events is not None:
+                # Same events as a live round; an LLM-worded reply is one delta
+                events("decision", {
+                    "status": response.decision.status,
+                    "finalPrice": response.decision.finalPrice,
+                    "counterPrice": response.decision.counterPrice,
+                    "ReservePrice": response.ReservePrice,
+                })
+                if response.decision.status == "counter_offer":
+                    events("delta", {"text": response.chatMessage})
+
+    if response is None:
+        response = _decide(
+            request, offer_price, reserve_price, delivery_cost, timings,
+            conversation=conversation, budget_ms=_remaining_ms(deadline), events=events,
+        )
+
+    if SPECULATIVE_MODE and conversation is not None and response.decision.status == "counter_offer":
+        _speculate_next_round(
+            request, offer_price, response.decision.counterPrice, reserve_price, delivery_cost,
+        )
+
+    return response
+
+
+def _decide(
+    request: ChatRequest,
+    offer_price: float,
+    reserve_price: float,
+    delivery_cost: float,
+    timings: dict,
+    conversation: str | None = None,
+    budget_ms: float | None = None,
+    background: bool = False,
+    events: Callable[[str, dict], None] | None = None,
+) -> ChatResponse:
+    """Steps 3–5: engine decision, LLM context and reply message."""
     # ── Step 3: Run negotiation engine ────────────────────────────────────
-    neg_result = negotiate(NegotiateRequest(
+    neg_result = _timed(timings, "negotiate", decide, NegotiationQuery(
         crop=request.crop,
         quantity=request.quantity,
-        farmer=NegotiateFarmer(district=request.farmerDistrict),
-        buyer=NegotiateBuyer(district=request.buyerDistrict),
+        farmerDistrict=request.farmerDistrict,
+        buyerDistrict=request.buyerDistrict,
         offerPricePerKg=offer_price,
         reservePrice=reserve_price,
     ))
 
     # ── Step 4: Compute context for LLM ───────────────────────────────────
-    DEFAULT_HUB = DELIVERY_AGENTS["Ernakulam"]
-    farmer_hub = DELIVERY_AGENTS.get(request.farmerDistrict) or DEFAULT_HUB
-    buyer_hub = DELIVERY_AGENTS.get(request.buyerDistrict) or DEFAULT_HUB
-    dist_km = haversine(
-        farmer_hub["lat"], farmer_hub["lon"],
-        buyer_hub["lat"], buyer_hub["lon"],
-    )
-    # Same formula as negotiation.py
-    delivery_cost = round(max(50.0, dist_km * request.quantity * 0.5 / 100), 2)
+    # Distance and delivery cost were computed during extraction
     net_profit = round(offer_price * request.quantity - delivery_cost, 2)
 
-    counter_price = (
-        neg_result.counterOffer.counterPrice
-        if neg_result.counterOffer else None
-    )
+    counter_price = neg_result.counterPrice
+    if events is not None:
+        # The decision is final here; only the wording is still to come
+        events("decision", {
+            "status": neg_result.status,
+            "finalPrice": neg_result.finalPrice,
+            "counterPrice": counter_price,
+            "ReservePrice": reserve_price,
+        })
 
     # ── Step 5: Generate message ──────────────────────────────────────────
     # Use templates for accepted/rejected (precise numbers required)
@@ -195,7 +411,12 @@ def handle_buyer_chat(request: ChatRequest) -> ChatResponse:
         if counter_price:
             counter_gross = counter_price * request.quantity
             context_dict["net_profit_at_counter"] = round(counter_gross - delivery_cost, 2)
-        chat_message = generate_negotiation_message(decision_dict, context_dict)
+        chat_message = _timed(
+            timings, "message",
+            generate_negotiation_message, decision_dict, context_dict,
+            conversation=conversation, budget_ms=budget_ms, background=background,
+            on_text=(lambda text: events("delta", {"text": text})) if events is not None else None,
+        )
 
     return ChatResponse(
         decision=ChatDecision(
@@ -206,3 +427,42 @@ def handle_buyer_chat(request: ChatRequest) -> ChatResponse:
         chatMessage=chat_message,
         ReservePrice=reserve_price,
     )
+
+
+# ─── Speculative next round ───────────────────────────────────────────────────
+
+def _speculation_key(request: ChatRequest, offer_price: float) -> tuple:
+    # The round and the counter it answers are part of the key: a reply made
+    # for the round after one counter must not be served after another.
+    return (
+        request.listingId, request.buyerId,
+        request.crop, request.quantity, request.farmerDistrict, request.buyerDistrict,
+        request.roundNumber, request.lastCounterPrice,
+        offer_price,
+    )
+
+
+def _speculate_next_round(
+    request: ChatRequest,
+    offer_price: float,
+    counter_price: float,
+    reserve_price: float,
+    delivery_cost: float,
+) -> None:
+    """Pre-compute replies for the buyer's most likely next offers while the LLM is idle."""
+    next_request = request.model_copy(update={
+        "roundNumber": request.roundNumber + 1,
+        "lastCounterPrice": counter_price,
+    })
+
+    def job(should_continue) -> None:
+        for price in likely_offers(offer_price, counter_price):
+            if not should_continue():
+                return
+            response = _decide(
+                next_request, price, reserve_price, delivery_cost, {}, background=True,
+            )
+            SPECULATIVE_CACHE.put(_speculation_key(next_request, price), response)
+            SPECULATIVE_STATS["generated"] += 1
+
+    schedule(conversation_key(request), job)
@@ -0,0 +1,84 @@
+"""
+Small in-process caches shared by the agents.
+Thread-safe LRU with per-entry TTL and hit/miss counters.
+"""
+
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Hashable
+
+_MISSING = object()
+
+# Every live cache, for /metrics
+_CACHES: "weakref.WeakSet[TTLCache]" = weakref.WeakSet()
+
+
+def all_caches() -> list["TTLCache"]:
+    return sorted(_CACHES, key=lambda c: c.name)
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after `ttl_s` seconds.
+
+    Expired entries are dropped lazily, when a get finds them; a full cache
+    evicts the least recently used entry whether or not it has expired, so
+    there is no background sweeper thread and no scan on put.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl_s: float = 300.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        _CACHES.add(self)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, ttl_s: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl_s if ttl_s is None else ttl_s)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / total, 4) if total else 0.0,
+        }
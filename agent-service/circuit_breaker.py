@@ -0,0 +1,212 @@
+"""
+Circuit breaker for the local Ollama dependency.
+
+Trips after N consecutive failures (slow calls count as failures) so callers
+go straight to their template / regex fallbacks instead of waiting on a dead
+socket. While open, a background prober runs half-open trials and closes the
+breaker again once Ollama answers.
+"""
+
+import os
+import threading
+import time
+from typing import Callable
+
+# ─── States ──────────────────────────────────────────────────────────────────
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is short-circuited because the breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Only the background prober moves an open breaker forward: live traffic is
+    never used as a half-open trial, so buyers always get an instant fallback
+    while the dependency is down.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        slow_call_ms: float = 8000.0,
+        open_seconds: float = 10.0,
+        max_open_seconds: float = 120.0,
+        half_open_successes: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_ms = slow_call_ms
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_successes = half_open_successes
+
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_seconds = open_seconds
+        self.opened_at = 0.0
+        self.half_open_passed = 0
+        self.last_error = ""
+
+        # Counters (monotonic, exported by /health and /metrics)
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.short_circuited = 0
+        self.trips = 0
+        self.probes = 0
+        self.probe_failures = 0
+
+    # ── Call path ─────────────────────────────────────────────────────────
+
+    def allow(self) -> bool:
+        """True if a live call may go through. Counts rejected calls."""
+        if self.state == CLOSED:
+            return True
+        with self._lock:
+            self.short_circuited += 1
+        return False
+
+    def record_success(self, latency_s: float) -> None:
+        """Record a completed call; calls slower than slow_call_ms count as failures."""
+        latency_ms = latency_s * 1000
+        if latency_ms > self.slow_call_ms:
+            with self._lock:
+                self.slow_calls += 1
+            self.record_failure(f"slow call: {latency_ms:.0f} ms")
+            return
+        with self._lock:
+            self.calls += 1
+            self.consecutive_failures = 0
+
+    def record_failure(self, error: object) -> None:
+        """Record a failed call and trip the breaker once the threshold is hit."""
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = str(error)
+            if self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._trip()
+
+    def _trip(self) -> None:
+        # Caller holds the lock
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        print(
+            f"[Breaker] {self.name} opened after {self.consecutive_failures} "
+            f"consecutive failures ({self.last_error}); retry in {self.open_seconds:.0f}s"
+        )
+
+    # ── Half-open probing ─────────────────────────────────────────────────
+
+    def probe_due(self) -> bool:
+        return (
+            self.state == OPEN
+            and time.monotonic() - self.opened_at >= self.open_seconds
+        )
+
+    def run_probe(self, probe: Callable[[], None]) -> bool:
+        """
+        Run one half-open trial. Closes the breaker after enough successful
+        probes; a failed probe reopens it with exponential backoff.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            self.state = HALF_OPEN
+            self.probes += 1
+
+        try:
+            probe()
+        except Exception as e:
+            with self._lock:
+                self.probe_failures += 1
+                self.half_open_passed = 0
+                self.last_error = str(e)
+                self.open_seconds = min(self.open_seconds * 2, self.max_open_seconds)
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            return False
+
+        with self._lock:
+            self.half_open_passed += 1
+            if self.half_open_passed >= self.half_open_successes:
+                self.state = CLOSED
+                self.consecutive_failures = 0
+                self.half_open_passed = 0
+                self.open_seconds = self.base_open_seconds
+                print(f"[Breaker] {self.name} closed — dependency is reachable again")
+        return True
+
+    def snapshot(self) -> dict:
+        """Point-in-time view for health checks and metrics."""
+        with self._lock:
+            open_for = (
+                round(time.monotonic() - self.opened_at, 1)
+                if self.state != CLOSED else 0.0
+            )
+            return {
+                "state": self.state,
+                "consecutiveFailures": self.consecutive_failures,
+                "openForSeconds": open_for,
+                "retryInSeconds": self.open_seconds if self.state != CLOSED else 0.0,
+                "lastError": self.last_error,
+                "calls": self.calls,
+                "failures": self.failures,
+                "slowCalls": self.slow_calls,
+                "shortCircuited": self.short_circuited,
+                "trips": self.trips,
+                "probes": self.probes,
+                "probeFailures": self.probe_failures,
+            }
+
+
+class BreakerProber:
+    """Background thread that runs half-open trials while the breaker is open."""
+
+    def __init__(self, breaker: CircuitBreaker, probe: Callable[[], None], interval_s: float = 1.0):
+        self.breaker = breaker
+        self.probe = probe
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"{self.breaker.name}-prober", daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_s * 2)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            if self.breaker.probe_due():
+                self.breaker.run_probe(self.probe)
+
+
+def breaker_from_env(name: str, prefix: str) -> CircuitBreaker:
+    """Build a breaker from <prefix>_BREAKER_* environment variables."""
+    return CircuitBreaker(
+        name=name,
+        failure_threshold=int(os.environ.get(f"{prefix}_BREAKER_FAILURES", "3")),
+        slow_call_ms=float(os.environ.get(f"{prefix}_BREAKER_SLOW_MS", "8000")),
+        open_seconds=float(os.environ.get(f"{prefix}_BREAKER_OPEN_SECONDS", "10")),
+        max_open_seconds=float(os.environ.get(f"{prefix}_BREAKER_MAX_OPEN_SECONDS", "120")),
+    )
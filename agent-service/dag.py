@@ -0,0 +1,152 @@
+"""
+Small async DAG executor for agent pipelines.
+
+Stages declare the stages whose results they need; a stage starts as soon as
+those have finished, so independent stages overlap. Each stage runs under its
+own timeout, the whole graph under an overall deadline, and anything still
+running when the deadline passes is cancelled. A stage whose inputs failed
+is skipped rather than run.
+
+Synchronous stage functions run on the default thread pool. A timed-out
+thread cannot be interrupted — its result is discarded and dependents move on.
+"""
+
+import asyncio
+import time
+from typing import Any, Callable
+
+from tracing import span
+
+# Outcome statuses
+SUCCESS = "success"
+ERROR = "error"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+SKIPPED = "skipped"
+
+
+class StageSkipped(Exception):
+    """Raised by a stage function when its inputs make running it pointless."""
+
+
+class Stage:
+    """
+    A pipeline stage: `fn(inputs)` where inputs maps each dependency's name
+    to its result. `fn` may be a plain function or a coroutine function.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[dict[str, Any]], Any],
+        deps: tuple[str, ...] = (),
+        timeout_s: float | None = None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout_s = timeout_s
+
+
+class StageOutcome:
+    """What happened to one stage. Times are ms offsets from the graph start."""
+
+    def __init__(self, stage: Stage):
+        self.name = stage.name
+        self.deps = stage.deps
+        self.status = SKIPPED
+        self.value: Any = None
+        self.error = ""
+        self.start_ms: float | None = None
+        self.end_ms: float | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        if self.start_ms is None or self.end_ms is None:
+            return 0.0
+        return round(self.end_ms - self.start_ms, 3)
+
+
+def _validate(stages: list[Stage]) -> None:
+    """Names must be unique and dependencies declared earlier (so no cycles)."""
+    seen: set[str] = set()
+    for stage in stages:
+        if stage.name in seen:
+            raise ValueError(f"Duplicate stage '{stage.name}'")
+        missing = [d for d in stage.deps if d not in seen]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on undeclared stage(s): {', '.join(missing)}")
+        seen.add(stage.name)
+
+
+async def run_dag(
+    stages: list[Stage],
+    default_timeout_s: float | None = None,
+    deadline_s: float | None = None,
+) -> dict[str, StageOutcome]:
+    """
+    Run the stages and return name → outcome, in declaration order.
+
+    default_timeout_s applies to stages without their own timeout;
+    deadline_s bounds the whole graph.
+    """
+    _validate(stages)
+    t0 = time.perf_counter()
+    outcomes = {stage.name: StageOutcome(stage) for stage in stages}
+    tasks: dict[str, asyncio.Task] = {}
+
+    def now_ms() -> float:
+        return round((time.perf_counter() - t0) * 1000, 3)
+
+    async def run_stage(stage: Stage) -> None:
+        outcome = outcomes[stage.name]
+        if stage.deps:
+            await asyncio.wait([tasks[d] for d in stage.deps])
+        failed = [d for d in stage.deps if outcomes[d].status != SUCCESS]
+        if failed:
+            outcome.error = f"Upstream {', '.join(failed)} did not succeed"
+            return
+
+        inputs = {d: outcomes[d].value for d in stage.deps}
+        timeout_s = stage.timeout_s if stage.timeout_s is not None else default_timeout_s
+
+        with span(f"stage.{stage.name}") as stage_span:
+            # Created inside the span so the worker thread inherits it
+            if asyncio.iscoroutinefunction(stage.fn):
+                call = stage.fn(inputs)
+            else:
+                call = asyncio.to_thread(stage.fn, inputs)
+
+            outcome.start_ms = now_ms()
+            try:
+                outcome.value = await asyncio.wait_for(call, timeout_s)
+                outcome.status = SUCCESS
+            except StageSkipped as e:
+                outcome.status, outcome.error = SKIPPED, str(e)
+            except asyncio.TimeoutError:
+                outcome.status, outcome.error = TIMEOUT, f"Timed out after {timeout_s * 1000:.0f} ms"
+            except asyncio.CancelledError:
+                outcome.status, outcome.error = CANCELLED, "Cancelled at pipeline deadline"
+                raise
+            except Exception as e:
+                outcome.status, outcome.error = ERROR, str(e)
+            finally:
+                outcome.end_ms = now_ms()
+                stage_span.set(**{"stage.status": outcome.status})
+                if outcome.status in (ERROR, TIMEOUT):
+                    stage_span.status, stage_span.error = "ERROR", outcome.error
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.create_task(run_stage(stage), name=f"stage:{stage.name}")
+
+    _, pending = await asyncio.wait(tasks.values(), timeout=deadline_s)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+        for name, task in tasks.items():
+            outcome = outcomes[name]
+            if task in pending and outcome.start_ms is None:
+                # Never started: still waiting on inputs at the deadline
+                outcome.status, outcome.error = CANCELLED, "Cancelled at pipeline deadline"
+    return outcomes
@@ -1,9 +1,12 @@
 """
-Haversine distance calculation between two GPS coordinates.
+Haversine distance calculation between two GPS coordinates, and the
+distance table between the district logistics hubs.
 """
 
 import math
 
+from delivery_config import DELIVERY_AGENTS
+
 EARTH_RADIUS_KM: float = 6371.0
 
 
@@ -34,3 +37,34 @@ def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
 
     distance = EARTH_RADIUS_KM * c
     return round(distance, 2)
+
+
+# ─── Hub distance table ──────────────────────────────────────────────────────
+# Every farmer → buyer pair is one of the 14 × 14 district hubs, so the
+# distances are computed once (see startup.preload) instead of per request.
+
+DEFAULT_HUB_DISTRICT = "Ernakulam"  # central Kerala, for unknown districts
+
+_HUB_DISTANCES: dict[tuple[str, str], float] = {}
+
+
+def build_hub_distances() -> dict[tuple[str, str], float]:
+    """(farmer district, buyer district) → haversine km between their hubs."""
+    if not _HUB_DISTANCES:
+        _HUB_DISTANCES.update({
+            (a, b): haversine(hub_a["lat"], hub_a["lon"], hub_b["lat"], hub_b["lon"])
+            for a, hub_a in DELIVERY_AGENTS.items()
+            for b, hub_b in DELIVERY_AGENTS.items()
+        })
+    return _HUB_DISTANCES
+
+
+def hub_distance(farmer_district: str | None, buyer_district: str | None) -> float:
+    """Km between two districts' hubs; unknown districts use the Ernakulam hub."""
+    table = _HUB_DISTANCES or build_hub_distances()
+    dist = table.get((farmer_district, buyer_district))
+    if dist is None:
+        farmer = farmer_district if farmer_district in DELIVERY_AGENTS else DEFAULT_HUB_DISTRICT
+        buyer = buyer_district if buyer_district in DELIVERY_AGENTS else DEFAULT_HUB_DISTRICT
+        dist = table[(farmer, buyer)]
+    return dist
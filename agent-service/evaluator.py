@@ -8,8 +8,10 @@ from schemas import EvaluateRequest, EvaluateResponse, BuyerComparison, BestBuye
 from delivery_config import DELIVERY_AGENTS, PRICE_PER_KM
 from distance import haversine
 from reasoning import generate_reasoning
+from tracing import traced
 
 
+@traced()
 def evaluate_offers(request: EvaluateRequest) -> EvaluateResponse:
     """
     Evaluate all offers for a listing and select the best buyer
@@ -24,6 +26,18 @@ def evaluate_offers(request: EvaluateRequest) -> EvaluateResponse:
     Returns:
         EvaluateResponse with best buyer, breakdown, and reasoning.
 
+    Raises:
+        ValueError: If a buyer district is not found in DELIVERY_AGENTS.
+    """
+    return select_best(request, compare_offers(request))
+
+
+def compare_offers(request: EvaluateRequest) -> list[BuyerComparison]:
+    """
+    Delivery-aware financials for every offer. Needs no market data, so the
+    orchestrator runs it alongside the Market Analyst and applies the reserve
+    afterwards (apply_reserve).
+
     Raises:
         ValueError: If a buyer district is not found in DELIVERY_AGENTS.
     """
@@ -64,6 +78,20 @@ def evaluate_offers(request: EvaluateRequest) -> EvaluateResponse:
                 belowReserve=below_reserve,
             )
         )
+    return comparisons
+
+
+def apply_reserve(comparisons: list[BuyerComparison], reserve: float | None) -> list[BuyerComparison]:
+    """Re-flag comparisons against a reserve price known only after comparing."""
+    return [
+        c.model_copy(update={"belowReserve": reserve is not None and c.offerPricePerKg < reserve})
+        for c in comparisons
+    ]
+
+
+def select_best(request: EvaluateRequest, comparisons: list[BuyerComparison]) -> EvaluateResponse:
+    """Pick the most profitable viable offer from precomputed comparisons."""
+    reserve = request.reservePrice
 
     # ── Select best buyer ─────────────────────────────────────────────────
     # Filter: positive profit AND meets reserve (if set)
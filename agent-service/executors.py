@@ -0,0 +1,132 @@
+"""
+Where endpoint work runs: inline on the event loop, or on a sized executor.
+
+    INLINE — pure-Python paths that finish well under a millisecond
+             (negotiate, extract_intent, analyze_market on a loaded price
+             snapshot). A thread hop would cost more than the work.
+    IO     — paths that block on the network, i.e. Ollama (handle_buyer_chat).
+             Threads, sized for concurrent LLM waits (AGENT_IO_WORKERS).
+    CPU    — parsing and number crunching that can run for milliseconds
+             (analyze_market when the price CSV must be re-read).
+             AGENT_CPU_WORKERS threads, or processes with
+             AGENT_CPU_EXECUTOR=process (true parallelism, but spans,
+             metrics and caches recorded in the workers stay there).
+
+Every ManagedExecutor counts submitted / in-flight / queued tasks so
+/metrics can show saturation.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from tracing import in_context
+
+INLINE = "inline"
+IO = "io"
+CPU = "cpu"
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+AGENT_IO_WORKERS = int(os.environ.get("AGENT_IO_WORKERS", "32"))
+AGENT_CPU_WORKERS = int(os.environ.get("AGENT_CPU_WORKERS", str(os.cpu_count() or 1)))
+AGENT_CPU_EXECUTOR = os.environ.get("AGENT_CPU_EXECUTOR", "thread").lower()
+
+_EXECUTORS: list["ManagedExecutor"] = []
+
+
+def all_executors() -> list["ManagedExecutor"]:
+    return list(_EXECUTORS)
+
+
+class ManagedExecutor:
+    """
+    A thread or process pool with saturation counters. `submit` returns the
+    pool's own Future, so callers can cancel and wait on it as usual.
+    """
+
+    def __init__(self, name: str, max_workers: int, processes: bool = False):
+        self.name = name
+        self.max_workers = max_workers
+        self.processes = processes
+        self._pool: Executor | None = None
+        self._pool_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.inflight = 0
+        self.peak_inflight = 0
+        _EXECUTORS.append(self)
+
+    def _get_pool(self) -> Executor:
+        # Created on first use, so importing the module starts no threads or processes
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    if self.processes:
+                        self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                    else:
+                        self._pool = ThreadPoolExecutor(
+                            max_workers=self.max_workers, thread_name_prefix=self.name,
+                        )
+        return self._pool
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        with self._lock:
+            self.submitted += 1
+            self.inflight += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+        try:
+            future = self._get_pool().submit(fn, *args, **kwargs)
+        except BaseException:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, _future) -> None:
+        with self._lock:
+            self.inflight -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            inflight = self.inflight
+            return {
+                "workers": self.max_workers,
+                "inflight": inflight,
+                "queued": max(0, inflight - self.max_workers),
+                "submitted": self.submitted,
+                "peakInflight": self.peak_inflight,
+            }
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+IO_EXECUTOR = ManagedExecutor("agent-io", AGENT_IO_WORKERS)
+CPU_EXECUTOR = ManagedExecutor("agent-cpu", AGENT_CPU_WORKERS, processes=AGENT_CPU_EXECUTOR == "process")
+
+
+def submit(kind: str, fn: Callable, *args, **kwargs) -> Future:
+    """Submit fn(*args, **kwargs) to the IO or CPU executor; the pool's Future."""
+    executor = IO_EXECUTOR if kind == IO else CPU_EXECUTOR
+    call = functools.partial(fn, *args, **kwargs)
+    if not executor.processes:
+        call = in_context(call)  # keep the request's span in the worker thread
+    return executor.submit(call)
+
+
+async def run(kind: str, fn: Callable, *args, **kwargs) -> Any:
+    """Run fn(*args, **kwargs) inline or on the executor for `kind`."""
+    if kind == INLINE:
+        return fn(*args, **kwargs)
+    return await asyncio.wrap_future(submit(kind, fn, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    for executor in _EXECUTORS:
+        executor.shutdown()
@@ -0,0 +1,216 @@
+"""
+Gazetteer matching for the Listener agent.
+
+An Aho-Corasick automaton finds every known crop / district name (and alias)
+in one pass over the text, however many names the gazetteer holds. Words
+that match nothing exactly are looked up with a bounded edit distance in a
+per-kind symmetric-delete index, so a typo costs time that depends on the
+word's length, not on the gazetteer size.
+"""
+
+import re
+from collections import deque
+from typing import Iterator
+
+# Latin / Malayalam words; Malayalam vowel signs and ZWJ/ZWNJ stay inside the word
+_WORD_RE = re.compile(r"(?:[^\W\d_]|[\u0D00-\u0D7F\u200c\u200d])+")
+
+FUZZY_MIN_LEN = 5      # shorter words are too ambiguous to correct
+
+
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher.
+
+    Add (pattern, value) pairs, call build(), then iter_matches(text) yields
+    (start, end, value) for every occurrence, overlapping ones included.
+    """
+
+    def __init__(self):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[tuple[int, object]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, value: object) -> None:
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(pattern), value))
+        self._built = False
+
+    def build(self) -> "AhoCorasick":
+        """Compute failure links (BFS) and merge outputs along them."""
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque()
+        for nxt in goto[0].values():
+            fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        self._built = True
+        return self
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def iter_matches(self, text: str) -> Iterator[tuple[int, int, object]]:
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = i + 1
+                for length, value in out[state]:
+                    yield end - length, end, value
+
+
+def levenshtein(a: str, b: str, limit: int) -> int:
+    """Edit distance between a and b, or limit + 1 once it must exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        row = [i]
+        for j, cb in enumerate(b, 1):
+            row.append(min(row[j - 1] + 1, prev[j] + 1, prev[j - 1] + (ca != cb)))
+        if min(row) > limit:
+            return limit + 1
+        prev = row
+    return prev[-1]
+
+
+def _deletes(word: str, depth: int) -> set[str]:
+    """`word` and every string obtained from it by deleting up to `depth` characters."""
+    found = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def max_edits(word: str) -> int:
+    """Edit budget for a word: 1 for short words, 2 from 8 characters."""
+    return 1 if len(word) < 8 else 2
+
+
+class FuzzyIndex:
+    """
+    Bounded edit-distance lookup over a symmetric-delete index (as in
+    SymSpell). Every entry is indexed under the strings left after deleting
+    up to max_edits(entry) of its characters; a query generates its own
+    deletes and verifies the entries they share. Two words within k edits
+    always share a delete of depth k, so nothing in budget is missed, and a
+    lookup costs the same however many entries there are.
+
+    The first character must match: typos rarely hit it, and it keeps the
+    delete sets small.
+    """
+
+    def __init__(self):
+        self._entries: list[tuple[str, object]] = []
+        self._deletes: dict[str, list[int]] = {}
+
+    def add(self, word: str, value: object) -> None:
+        index = len(self._entries)
+        self._entries.append((word, value))
+        for key in _deletes(word[1:], max_edits(word)):
+            self._deletes.setdefault(word[0] + key, []).append(index)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def search(self, word: str, max_dist: int) -> list[tuple[int, object]]:
+        """
+        (distance, value) for every entry within the edit budget of both
+        words, i.e. of the shorter one: "coaching" is 2 edits from "cochin",
+        but a 6-letter name allows only 1.
+        """
+        if not word:
+            return []
+        candidates: set[int] = set()
+        for key in _deletes(word[1:], max_dist):
+            candidates.update(self._deletes.get(word[0] + key, ()))
+        results: list[tuple[int, object]] = []
+        for index in candidates:
+            entry, value = self._entries[index]
+            limit = min(max_dist, max_edits(entry))
+            dist = levenshtein(word[1:], entry[1:], limit)
+            if dist <= limit:
+                results.append((dist, value))
+        return results
+
+
+class Gazetteer:
+    """
+    Named entities of several kinds (crop, district, ...) in one automaton.
+
+    When several entries of the same kind occur in a text, the one added
+    first wins — the same result as scanning the name lists in order.
+    Kinds with no exact hit fall back to the closest fuzzy match.
+    """
+
+    def __init__(self):
+        self._automaton = AhoCorasick()
+        self._indexes: dict[str, FuzzyIndex] = {}
+        self._count = 0
+
+    def add(self, kind: str, name: str, canonical: str | None = None) -> None:
+        """Register `name` (matched case-insensitively) as an entry of `kind`."""
+        name_lower = name.lower()
+        entry = (self._count, canonical or name)
+        self._automaton.add(name_lower, (kind,) + entry)
+        words = _WORD_RE.findall(name_lower)
+        if len(words) == 1 and len(words[0]) >= FUZZY_MIN_LEN:
+            self._indexes.setdefault(kind, FuzzyIndex()).add(words[0], entry)
+        self._count += 1
+
+    def build(self) -> "Gazetteer":
+        self._automaton.build()
+        return self
+
+    def __len__(self) -> int:
+        return self._count
+
+    def match(self, text_lower: str, fuzzy: bool = True) -> dict[str, str]:
+        """kind → canonical name of the best entry found in the text."""
+        best: dict[str, tuple[int, int, str]] = {}
+        for _, _, (kind, priority, canonical) in self._automaton.iter_matches(text_lower):
+            current = best.get(kind)
+            if current is None or priority < current[1]:
+                best[kind] = (0, priority, canonical)
+
+        missing = [kind for kind in self._indexes if kind not in best] if fuzzy else []
+        if missing:
+            for word in _WORD_RE.findall(text_lower):
+                if len(word) < FUZZY_MIN_LEN:
+                    continue
+                limit = max_edits(word)
+                for kind in missing:
+                    for dist, (priority, canonical) in self._indexes[kind].search(word, limit):
+                        candidate = (dist, priority, canonical)
+                        if kind not in best or candidate < best[kind]:
+                            best[kind] = candidate
+
+        return {kind: canonical for kind, (_, _, canonical) in best.items()}
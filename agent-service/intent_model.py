@@ -0,0 +1,313 @@
+"""
+Local offer extractor — replaces the Ollama extraction call on the hot path.
+
+Two small linear models, trained offline by train_intent_model.py and stored
+in intent_model.json:
+    1. Intent classifier — averaged perceptron over hashed character n-grams
+    2. Span tagger        — labels each number as price / quantity / other
+                            from the surrounding tokens
+
+Output matches extract_offer_from_text():
+    {"offerPricePerKg", "quantity", "buyerDistrict", "intent"}
+"""
+
+import json
+import re
+import zlib
+from pathlib import Path
+
+from delivery_config import DELIVERY_AGENTS
+from market_data import DISTRICT_ALIASES
+
+MODEL_PATH = Path(__file__).parent / "intent_model.json"
+
+HASH_BITS = 18
+_HASH_MASK = (1 << HASH_BITS) - 1
+NGRAM_RANGE = (2, 4)
+
+INTENT_LABELS = ["new_offer", "accept_counter", "reject", "question"]
+SPAN_LABELS = ["price", "quantity", "other"]
+
+# Quantity units → kg; price units → per-kg divisor
+QUANTITY_UNITS = {
+    "kg": 1, "kgs": 1, "kilo": 1, "kilos": 1, "kilogram": 1, "kilograms": 1,
+    "quintal": 100, "quintals": 100, "qtl": 100,
+    "tonne": 1000, "tonnes": 1000, "ton": 1000, "tons": 1000,
+}
+PRICE_PER_QUINTAL = {"quintal", "quintals", "qtl"}
+
+_TOKEN_RE = re.compile(r"₹|\d+(?:\.\d+)?|[a-z]+|/")
+_DIGIT_RE = re.compile(r"\d")
+
+# lowercase name or alias → standard district name
+_DISTRICTS = {d.lower(): d for d in DELIVERY_AGENTS}
+_DISTRICTS.update({alias.lower(): name for alias, name in DISTRICT_ALIASES.items()})
+
+
+def _hash(feature: str) -> int:
+    return zlib.crc32(feature.encode()) & _HASH_MASK
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def intent_features(text: str) -> list[int]:
+    """Hashed character n-grams (digits folded to 0) plus word unigrams."""
+    norm = " " + " ".join(_DIGIT_RE.sub("0", text.lower()).split()) + " "
+    feats = []
+    lo, hi = NGRAM_RANGE
+    for n in range(lo, hi + 1):
+        for i in range(len(norm) - n + 1):
+            feats.append(_hash(norm[i:i + n]))
+    for word in norm.split():
+        feats.append(_hash("w:" + word))
+    return feats
+
+
+def span_features(tokens: list[str], i: int) -> list[int]:
+    """Context features for the number at tokens[i]."""
+    def tok(j: int) -> str:
+        if 0 <= j < len(tokens):
+            return "0" if tokens[j][0].isdigit() else tokens[j]
+        return "<s>" if j < 0 else "</s>"
+
+    value = tokens[i]
+    magnitude = len(value.split(".")[0])
+    return [_hash(f) for f in (
+        "bias",
+        f"p1={tok(i - 1)}",
+        f"p2={tok(i - 2)}",
+        f"n1={tok(i + 1)}",
+        f"n2={tok(i + 2)}",
+        f"n1n2={tok(i + 1)}_{tok(i + 2)}",
+        f"p1n1={tok(i - 1)}_{tok(i + 1)}",
+        f"mag={magnitude}",
+        f"dec={'.' in value}",
+        f"first={i == 0}",
+    )]
+
+
+# ─── Averaged perceptron ──────────────────────────────────────────────────────
+
+class _Perceptron:
+    """Multiclass averaged perceptron over sparse hashed features."""
+
+    def __init__(self, n_classes: int):
+        self.n = n_classes
+        self.w: dict[int, list[float]] = {}
+        self.bias = [0.0] * n_classes
+        # Running sums for averaging (w_avg = w - acc / t)
+        self._acc: dict[int, list[float]] = {}
+        self._acc_bias = [0.0] * n_classes
+        self._t = 1
+
+    def scores(self, feats: list[int]) -> list[float]:
+        s = list(self.bias)
+        w = self.w
+        for f in feats:
+            row = w.get(f)
+            if row is not None:
+                for c in range(self.n):
+                    s[c] += row[c]
+        return s
+
+    def update(self, feats: list[int], truth: int) -> None:
+        s = self.scores(feats)
+        guess = max(range(self.n), key=s.__getitem__)
+        if guess != truth:
+            for f in feats:
+                row = self.w.setdefault(f, [0.0] * self.n)
+                acc = self._acc.setdefault(f, [0.0] * self.n)
+                row[truth] += 1
+                row[guess] -= 1
+                acc[truth] += self._t
+                acc[guess] -= self._t
+            self.bias[truth] += 1
+            self.bias[guess] -= 1
+            self._acc_bias[truth] += self._t
+            self._acc_bias[guess] -= self._t
+        self._t += 1
+
+    def averaged(self) -> tuple[dict[int, list[float]], list[float]]:
+        t = self._t
+        weights = {}
+        for f, row in self.w.items():
+            acc = self._acc[f]
+            avg = [round(row[c] - acc[c] / t, 4) for c in range(self.n)]
+            if any(avg):
+                weights[f] = avg
+        bias = [round(self.bias[c] - self._acc_bias[c] / t, 4) for c in range(self.n)]
+        return weights, bias
+
+
+def _argmax(scores: list[float]) -> int:
+    return max(range(len(scores)), key=scores.__getitem__)
+
+
+# ─── Extractor ────────────────────────────────────────────────────────────────
+
+class LocalExtractor:
+    """Trained intent classifier + number span tagger."""
+
+    def __init__(
+        self,
+        intent_weights: dict[int, list[float]],
+        intent_bias: list[float],
+        span_weights: dict[int, list[float]],
+        span_bias: list[float],
+    ):
+        self.intent_weights = intent_weights
+        self.intent_bias = intent_bias
+        self.span_weights = span_weights
+        self.span_bias = span_bias
+
+    @staticmethod
+    def _score(weights: dict[int, list[float]], bias: list[float], feats: list[int]) -> list[float]:
+        s = list(bias)
+        n = len(s)
+        for f in feats:
+            row = weights.get(f)
+            if row is not None:
+                for c in range(n):
+                    s[c] += row[c]
+        return s
+
+    def predict_intent(self, text: str) -> str:
+        scores = self._score(self.intent_weights, self.intent_bias, intent_features(text))
+        return INTENT_LABELS[_argmax(scores)]
+
+    def tag_numbers(self, tokens: list[str]) -> list[tuple[int, str, float]]:
+        """(token index, label, margin) for each number in the token list."""
+        tags = []
+        for i, tok in enumerate(tokens):
+            if not tok[0].isdigit():
+                continue
+            scores = self._score(self.span_weights, self.span_bias, span_features(tokens, i))
+            best = _argmax(scores)
+            runner_up = max(s for c, s in enumerate(scores) if c != best)
+            tags.append((i, SPAN_LABELS[best], scores[best] - runner_up))
+        return tags
+
+    def extract(self, text: str) -> dict:
+        tokens = tokenize(text)
+        price = quantity = None
+        price_margin = quantity_margin = float("-inf")
+
+        for i, label, margin in self.tag_numbers(tokens):
+            value = float(tokens[i])
+            following = tokens[i + 1:i + 4]
+            if label == "price" and margin > price_margin:
+                if PRICE_PER_QUINTAL.intersection(following):
+                    value = round(value / 100, 2)
+                price, price_margin = value, margin
+            elif label == "quantity" and margin > quantity_margin:
+                unit = next((t for t in following if t in QUANTITY_UNITS), "kg")
+                quantity, quantity_margin = value * QUANTITY_UNITS[unit], margin
+
+        district = next((_DISTRICTS[t] for t in tokens if t in _DISTRICTS), None)
+
+        return {
+            "offerPricePerKg": price,
+            "quantity": quantity,
+            "buyerDistrict": district,
+            "intent": self.predict_intent(text),
+        }
+
+    # ── Persistence ───────────────────────────────────────────────────────
+
+    def save(self, path: Path = MODEL_PATH) -> None:
+        artefact = {
+            "version": 1,
+            "hashBits": HASH_BITS,
+            "ngramRange": list(NGRAM_RANGE),
+            "intentLabels": INTENT_LABELS,
+            "spanLabels": SPAN_LABELS,
+            "intent": {"bias": self.intent_bias, "weights": self.intent_weights},
+            "span": {"bias": self.span_bias, "weights": self.span_weights},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(artefact, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> "LocalExtractor":
+        with open(path, encoding="utf-8") as f:
+            artefact = json.load(f)
+        if (
+            artefact.get("hashBits") != HASH_BITS
+            or artefact.get("intentLabels") != INTENT_LABELS
+            or artefact.get("spanLabels") != SPAN_LABELS
+        ):
+            raise ValueError(f"{path} was trained with incompatible features; retrain it.")
+        return cls(
+            intent_weights={int(k): v for k, v in artefact["intent"]["weights"].items()},
+            intent_bias=artefact["intent"]["bias"],
+            span_weights={int(k): v for k, v in artefact["span"]["weights"].items()},
+            span_bias=artefact["span"]["bias"],
+        )
+
+
+def load_default() -> LocalExtractor | None:
+    """Load the shipped artefact; None if it is missing or incompatible."""
+    try:
+        return LocalExtractor.load(MODEL_PATH)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[Extractor] Local model unavailable, using Ollama extraction: {e}")
+        return None
+
+
+# ─── Training ─────────────────────────────────────────────────────────────────
+
+def span_labels_for(tokens: list[str], example: dict) -> list[tuple[int, int]]:
+    """Derive (token index, label index) for each number from an example's targets."""
+    price = example.get("offerPricePerKg")
+    quantity = example.get("quantity")
+    labels = []
+    for i, tok in enumerate(tokens):
+        if not tok[0].isdigit():
+            continue
+        value = float(tok)
+        following = tokens[i + 1:i + 4]
+        unit = next((t for t in following if t in QUANTITY_UNITS), "kg")
+        if price is not None and (
+            value == price
+            or (PRICE_PER_QUINTAL.intersection(following) and round(value / 100, 2) == price)
+        ):
+            labels.append((i, SPAN_LABELS.index("price")))
+        elif quantity is not None and value * QUANTITY_UNITS[unit] == quantity:
+            labels.append((i, SPAN_LABELS.index("quantity")))
+        else:
+            labels.append((i, SPAN_LABELS.index("other")))
+    return labels
+
+
+def train(examples: list[dict], epochs: int = 12, seed: int = 7) -> LocalExtractor:
+    """
+    Train both models on labelled examples shaped like the LLM output plus
+    a "text" field.
+    """
+    import random
+
+    rng = random.Random(seed)
+    intent_model = _Perceptron(len(INTENT_LABELS))
+    span_model = _Perceptron(len(SPAN_LABELS))
+
+    prepared = []
+    for ex in examples:
+        tokens = tokenize(ex["text"])
+        prepared.append((
+            intent_features(ex["text"]),
+            INTENT_LABELS.index(ex["intent"]),
+            [(span_features(tokens, i), label) for i, label in span_labels_for(tokens, ex)],
+        ))
+
+    for _ in range(epochs):
+        rng.shuffle(prepared)
+        for feats, intent, spans in prepared:
+            intent_model.update(feats, intent)
+            for span_feats, label in spans:
+                span_model.update(span_feats, label)
+
+    intent_weights, intent_bias = intent_model.averaged()
+    span_weights, span_bias = span_model.averaged()
+    return LocalExtractor(intent_weights, intent_bias, span_weights, span_bias)
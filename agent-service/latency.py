@@ -0,0 +1,54 @@
+"""
+Rolling latency windows used for load-aware routing decisions.
+"""
+
+import math
+import time
+from collections import deque
+
+
+class LatencyWindow:
+    """
+    Last `size` latency samples (ms) with nearest-rank percentiles.
+
+    Samples older than `max_age_s` are ignored, so a window that routing has
+    stopped feeding (every call diverted after a latency spike) empties and
+    lets calls through again instead of remembering the spike forever.
+
+    Appends are lock-free (deque with maxlen); percentile() copies the
+    window, so it costs O(size log size) — keep size in the hundreds.
+    """
+
+    def __init__(self, size: int = 256, min_samples: int = 5, max_age_s: float | None = None):
+        self.min_samples = min_samples
+        self.max_age_s = max_age_s
+        self._samples: deque[tuple[float, float]] = deque(maxlen=size)  # (recorded at, ms)
+
+    def record(self, ms: float) -> None:
+        self._samples.append((time.monotonic(), ms))
+
+    def _live(self) -> list[float]:
+        samples = list(self._samples)
+        if self.max_age_s is None:
+            return [ms for _, ms in samples]
+        cutoff = time.monotonic() - self.max_age_s
+        return [ms for t, ms in samples if t >= cutoff]
+
+    def __len__(self) -> int:
+        return len(self._live())
+
+    def percentile(self, q: float) -> float | None:
+        """q in [0, 1]; None until min_samples recent samples have been recorded."""
+        samples = sorted(self._live())
+        if len(samples) < self.min_samples:
+            return None
+        rank = max(math.ceil(q * len(samples)) - 1, 0)
+        return samples[rank]
+
+    def snapshot(self) -> dict:
+        return {
+            "samples": len(self),
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
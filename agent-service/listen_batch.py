@@ -0,0 +1,183 @@
+"""
+Bulk Listener — runs extract_intent over thousands of transcripts (SMS / IVR
+bursts) in chunks across a process pool.
+
+Input is a JSON list of ListenRequest objects, an NDJSON stream of them, or
+a msgpack stream (maps, or arrays of maps); output is NDJSON — or a stream
+of msgpack maps when the client asks for msgpack — one ListenResponse per
+input, in input order. An input that fails validation yields
+{"error": ...} in its place so positions still line up.
+"""
+
+import asyncio
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Iterable
+
+from pydantic import ValidationError
+
+from listener import extract_intent
+from schemas import ListenRequest
+from wire import packb, unpacker
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+# 0 workers runs chunks on the event loop's default thread pool instead
+LISTEN_BATCH_WORKERS = int(os.environ.get("LISTEN_BATCH_WORKERS", str(os.cpu_count() or 1)))
+LISTEN_BATCH_CHUNK = int(os.environ.get("LISTEN_BATCH_CHUNK", "256"))
+# Chunks in flight per worker; bounds memory when the input is a long stream
+LISTEN_BATCH_WINDOW = int(os.environ.get("LISTEN_BATCH_WINDOW", "2"))
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def get_pool() -> ProcessPoolExecutor | None:
+    """The shared worker pool, created on first use."""
+    global _pool
+    if _pool is None and LISTEN_BATCH_WORKERS > 0:
+        _pool = ProcessPoolExecutor(max_workers=LISTEN_BATCH_WORKERS)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# ─── Worker side ──────────────────────────────────────────────────────────────
+
+class MalformedInput:
+    """Stands in for the rest of a stream that could not be decoded."""
+
+    __slots__ = ("message",)
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+def _extract_one(item: "dict | str | bytes | MalformedInput", as_msgpack: bool = False) -> str | bytes:
+    if isinstance(item, MalformedInput):
+        error = {"error": item.message}
+        return packb(error) if as_msgpack else json.dumps(error)
+    try:
+        if isinstance(item, (str, bytes)):
+            request = ListenRequest.model_validate_json(item)
+        else:
+            request = ListenRequest.model_validate(item)
+    except ValidationError as e:
+        error = {"error": e.errors(include_url=False, include_context=False)[0]["msg"]}
+        return packb(error) if as_msgpack else json.dumps(error)
+    if as_msgpack:
+        return packb(extract_intent(request).model_dump(mode="json"))
+    return extract_intent(request).model_dump_json()
+
+
+def extract_chunk(items: list, as_msgpack: bool = False) -> str | bytes:
+    """
+    Results for one chunk: NDJSON, or concatenated msgpack maps. Items are
+    request dicts or raw JSON lines; lines are parsed here so the API
+    process only splits the stream.
+    """
+    if as_msgpack:
+        return b"".join(_extract_one(item, True) for item in items)
+    return "".join(_extract_one(item) + "\n" for item in items)
+
+
+# ─── API side ─────────────────────────────────────────────────────────────────
+
+def chunked(items: Iterable, size: int = LISTEN_BATCH_CHUNK) -> Iterable[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def ndjson_chunks(stream: AsyncIterator[bytes], size: int = LISTEN_BATCH_CHUNK) -> AsyncIterator[list[bytes]]:
+    """Split a byte stream into chunks of non-blank lines as it arrives."""
+    buffer = b""
+    chunk: list[bytes] = []
+    async for data in stream:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                chunk.append(line)
+                if len(chunk) >= size:
+                    yield chunk
+                    chunk = []
+    if buffer.strip():
+        chunk.append(buffer)
+    if chunk:
+        yield chunk
+
+
+async def msgpack_chunks(stream: AsyncIterator[bytes], size: int = LISTEN_BATCH_CHUNK) -> AsyncIterator[list]:
+    """
+    Chunks of request maps from a msgpack byte stream as it arrives. A
+    top-level array contributes its elements, so one packed list works too.
+
+    Malformed or truncated msgpack cannot be resynchronised: the items
+    decoded so far are kept and a MalformedInput ends the stream, so the
+    response ends with an {"error": ...} object instead of breaking off.
+    """
+    objects = unpacker()
+    chunk: list = []
+    try:
+        async for data in stream:
+            objects.feed(data)
+            for obj in objects:
+                for item in obj if isinstance(obj, list) else (obj,):
+                    chunk.append(item)
+                    if len(chunk) >= size:
+                        yield chunk
+                        chunk = []
+    except ValueError:
+        chunk.append(MalformedInput("Malformed msgpack input"))
+    else:
+        # Bytes left over mean the last object is incomplete; the unpacker
+        # refuses to read raw bytes then, which is how it can be told.
+        try:
+            objects.read_bytes(0)
+        except ValueError:
+            chunk.append(MalformedInput("Truncated msgpack input"))
+    if chunk:
+        yield chunk
+
+
+async def _aiter(chunks: Iterable[list]) -> AsyncIterator[list]:
+    for chunk in chunks:
+        yield chunk
+
+
+async def stream_results(
+    chunks: AsyncIterator[list] | Iterable[list], as_msgpack: bool = False,
+) -> AsyncIterator[str | bytes]:
+    """
+    Submit chunks to the pool as they arrive and yield their results (see
+    extract_chunk) in submission order, keeping at most WINDOW chunks per
+    worker in flight.
+    """
+    if not hasattr(chunks, "__aiter__"):
+        chunks = _aiter(chunks)
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    window = max(LISTEN_BATCH_WORKERS, 1) * max(LISTEN_BATCH_WINDOW, 1)
+    pending: deque[asyncio.Future] = deque()
+    try:
+        async for chunk in chunks:
+            pending.append(loop.run_in_executor(pool, extract_chunk, chunk, as_msgpack))
+            while len(pending) >= window:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        # Client went away or the input broke mid-stream
+        for future in pending:
+            future.cancel()
@@ -2,50 +2,117 @@
 Listener Agent.
 Extracts structured intent and slots from raw text input.
 Pattern-based NLP for hackathon — LLM-ready interface.
+
+All slots come from one regex pass (intent keywords, numbers, units) and
+one Aho-Corasick pass (crop and district gazetteer) over the text.
+Crop and district names are matched with per-language aliases
+(`ListenRequest.language`) and a bounded-edit-distance fallback for typos.
 """
 
 import re
 from schemas import ListenRequest, ListenResponse, ExtractedSlots
 from delivery_config import DELIVERY_AGENTS
-from market_data import CROP_INFO
+from market_data import CROP_INFO, DISTRICT_ALIASES
+from gazetteer import Gazetteer
+from tracing import traced
 
 
 # ─── Known values for matching ────────────────────────────────────────────────
 KNOWN_CROPS = list(CROP_INFO.keys())
 KNOWN_DISTRICTS = list(DELIVERY_AGENTS.keys())
 
+# ─── Per-language aliases (alias → canonical name) ────────────────────────────
+# English covers colonial-era names, transliteration variants and the
+# Agmarknet spellings; every language also gets the English table.
+CROP_ALIASES = {
+    "en": {"Tomatoes": "Tomato", "Thakkali": "Tomato"},
+    "ml": {"തക്കാളി": "Tomato"},
+}
+
+DISTRICT_ALIASES_BY_LANGUAGE = {
+    "en": {
+        **{alias: name for alias, name in DISTRICT_ALIASES.items() if alias != name},
+        "Trivandrum": "Thiruvananthapuram",
+        "Thiruvanthapuram": "Thiruvananthapuram",
+        "Quilon": "Kollam",
+        "Alleppey": "Alappuzha",
+        "Cochin": "Ernakulam",
+        "Kochi": "Ernakulam",
+        "Trichur": "Thrissur",
+        "Thrisur": "Thrissur",
+        "Palghat": "Palakkad",
+        "Calicut": "Kozhikode",
+        "Kozhikkode": "Kozhikode",
+        "Cannanore": "Kannur",
+        "Kasargode": "Kasaragod",
+        "Wayanadu": "Wayanad",
+    },
+    "ml": {
+        "തിരുവനന്തപുരം": "Thiruvananthapuram",
+        "കൊല്ലം": "Kollam",
+        "പത്തനംതിട്ട": "Pathanamthitta",
+        "ആലപ്പുഴ": "Alappuzha",
+        "കോട്ടയം": "Kottayam",
+        "ഇടുക്കി": "Idukki",
+        "എറണാകുളം": "Ernakulam",
+        "കൊച്ചി": "Ernakulam",
+        "തൃശ്ശൂർ": "Thrissur",
+        "തൃശൂർ": "Thrissur",
+        "പാലക്കാട്": "Palakkad",
+        "മലപ്പുറം": "Malappuram",
+        "കോഴിക്കോട്": "Kozhikode",
+        "വയനാട്": "Wayanad",
+        "കണ്ണൂർ": "Kannur",
+        "കാസർഗോഡ്": "Kasaragod",
+        "കാസറഗോഡ്": "Kasaragod",
+    },
+}
+
+# Malayalam case endings replace a final chillu with its base consonant
+# (തൃശ്ശൂർ → തൃശ്ശൂരിൽ) or drop the final virama (കോഴിക്കോട് → കോഴിക്കോടിന്).
+_CHILLU_BASE = {"ൻ": "ന", "ർ": "ര", "ൽ": "ല", "ൾ": "ള", "ൺ": "ണ"}
+_VIRAMA = "\u0d4d"
+
+
+def _malayalam_stem(name: str) -> str | None:
+    if name[-1] in _CHILLU_BASE:
+        return name[:-1] + _CHILLU_BASE[name[-1]]
+    if name[-1] == _VIRAMA:
+        return name[:-1]
+    return None
+
 # ─── Intent patterns ─────────────────────────────────────────────────────────
+# Each pattern is a sequence of keyword alternations that must appear in order
+# (whole words), i.e. ("create|new|add", "listing|lot|stock") behaves like
+# r"\b(create|new|add)\b.*\b(listing|lot|stock)\b". "\d+" stands for any number.
 INTENT_PATTERNS = {
     "create_listing": [
-        r"\b(sell|list|post|offer|put up|want to sell|selling)\b",
-        r"\b(create|new|add)\b.*\b(listing|lot|stock)\b",
+        ("sell|list|post|offer|put up|want to sell|selling",),
+        ("create|new|add", "listing|lot|stock"),
     ],
     "check_price": [
-        r"\b(price|rate|cost|worth|value|going for)\b",
-        r"\b(how much|what is|current)\b.*\b(price|rate)\b",
-        r"\b(market|mandi)\b.*\b(price|rate)\b",
+        ("price|rate|cost|worth|value|going for",),
+        ("how much|what is|current", "price|rate"),
+        ("market|mandi", "price|rate"),
     ],
     "accept_offer": [
-        r"\b(accept|agree|yes|ok|done|confirm|take)\b.*\b(offer|deal|bid)\b",
-        r"\b(go ahead|proceed)\b",
+        ("accept|agree|yes|ok|done|confirm|take", "offer|deal|bid"),
+        ("go ahead|proceed",),
     ],
     "counter_offer": [
-        r"\b(counter|negotiate|higher|more|increase|raise)\b",
-        r"\b(not enough|too low|want more)\b",
-        r"\b(can you do|at least)\b.*\b(\d+)\b",
+        ("counter|negotiate|higher|more|increase|raise",),
+        ("not enough|too low|want more",),
+        ("can you do|at least", r"\d+"),
     ],
 }
 
-# ─── Quantity patterns ─────────────────────────────────────────────────────────
-QUANTITY_PATTERNS = [
-    # "500 kg" or "500kg" or "500 kilos"
-    r"(\d+(?:\.\d+)?)\s*(?:kg|kilos?|kilograms?)\b",
-    # "5 quintal" or "5 quintals"
-    r"(\d+(?:\.\d+)?)\s*(?:quintals?|qtl)\b",
-    # "2 tonnes" or "2 tons"
-    r"(\d+(?:\.\d+)?)\s*(?:tonnes?|tons?|mt)\b",
-    # Plain number near a crop mention (fallback)
-    r"\b(\d+(?:\.\d+)?)\b",
+# ─── Quantity units ───────────────────────────────────────────────────────────
+# Unit spellings in priority order: kg-style quantities win over quintals,
+# quintals over tonnes, wherever they appear in the text.
+UNIT_CLASSES = [
+    ["kilograms", "kilogram", "kilos", "kilo", "kg"],
+    ["quintals", "quintal", "qtl"],
+    ["tonnes", "tonne", "tons", "ton", "mt"],
 ]
 
 UNIT_MULTIPLIERS = {
@@ -56,14 +123,178 @@ UNIT_MULTIPLIERS = {
 }
 
 
-def _detect_intent(text: str) -> tuple[str, float]:
-    """Detect the most likely intent from text. Returns (intent, confidence)."""
+# ─── Compiled matcher ─────────────────────────────────────────────────────────
+
+def _compile_intents(patterns: dict[str, list[tuple[str, ...]]]):
+    """
+    Turn INTENT_PATTERNS into:
+        - keyword → ids of the alternation groups it satisfies
+        - intent → list of group-id sequences
+    A phrase also satisfies the groups of any keyword it contains
+    ("want more" counts as "more"), as the original regexes did.
+    """
+    group_ids: dict[str, int] = {}
+    compiled: dict[str, list[tuple[int, ...]]] = {}
+    for intent, sequences in patterns.items():
+        compiled[intent] = [
+            tuple(group_ids.setdefault(alt, len(group_ids)) for alt in seq)
+            for seq in sequences
+        ]
+
+    keyword_groups: dict[str, set[int]] = {}
+    for alt, gid in group_ids.items():
+        if alt == r"\d+":
+            continue
+        for kw in alt.split("|"):
+            keyword_groups.setdefault(kw, set()).add(gid)
+    for phrase in keyword_groups:
+        for kw, gids in keyword_groups.items():
+            if kw != phrase and re.search(rf"\b{re.escape(kw)}\b", phrase):
+                keyword_groups[phrase] = keyword_groups[phrase] | gids
+
+    return keyword_groups, compiled, group_ids.get(r"\d+")
+
+
+_KEYWORD_GROUPS, _INTENT_SEQUENCES, _NUMBER_GROUP = _compile_intents(INTENT_PATTERNS)
+
+_UNIT_RANK = {u: rank for rank, units in enumerate(UNIT_CLASSES) for u in units}
+_UNIT_NAME = {u: next(name for name in UNIT_MULTIPLIERS if name in u) for u in _UNIT_RANK}
+
+# One alternation for numbers (with an optional unit) and every intent keyword;
+# longest alternatives first so phrases win over the words inside them.
+_TOKEN_RE = re.compile(
+    r"(?P<num>\d+(?:\.\d+)?)(?:\s*(?P<unit>"
+    + "|".join(sorted(_UNIT_RANK, key=len, reverse=True))
+    + r")\b)?"
+    + r"|\b(?P<kw>"
+    + "|".join(re.escape(k) for k in sorted(_KEYWORD_GROUPS, key=len, reverse=True))
+    + r")\b"
+)
+
+# A number with word boundaries on both sides (the lookarounds see past `pos`)
+_BARE_NUMBER_RE = re.compile(r"(?<!\w)\d+(?:\.\d+)?(?!\w)")
+
+
+def _bare_number(text: str, start: int, end: int) -> re.Match | None:
+    """The whole-word number inside the number token text[start:end], if any."""
+    dot = text.find(".", start, end)
+    for pos in (start, dot + 1) if dot != -1 else (start,):
+        bare = _BARE_NUMBER_RE.match(text, pos)
+        if bare is not None and bare.end() <= end:
+            return bare
+    return None
+
+
+def build_gazetteer(
+    crops: list[str],
+    districts: list[str],
+    crop_aliases: dict[str, str] | None = None,
+    district_aliases: dict[str, str] | None = None,
+) -> Gazetteer:
+    """
+    Crops and districts in one automaton; canonical names win over aliases,
+    earlier names over later ones.
+    """
+    gazetteer = Gazetteer()
+    for crop in crops:
+        gazetteer.add("crop", crop)
+    for district in districts:
+        gazetteer.add("district", district)
+    for kind, aliases in (("crop", crop_aliases), ("district", district_aliases)):
+        for alias, canonical in (aliases or {}).items():
+            gazetteer.add(kind, alias, canonical)
+            stem = _malayalam_stem(alias)
+            if stem:
+                gazetteer.add(kind, stem, canonical)
+    return gazetteer.build()
+
+
+_GAZETTEERS: dict[str, Gazetteer] = {}
+
+
+def gazetteer_for(language: str) -> Gazetteer:
+    """Gazetteer with the English aliases plus those of `language` (built once)."""
+    language = language.lower().split("-")[0]
+    if language not in CROP_ALIASES and language not in DISTRICT_ALIASES_BY_LANGUAGE:
+        language = "en"
+    gazetteer = _GAZETTEERS.get(language)
+    if gazetteer is None:
+        crop_aliases = {**CROP_ALIASES["en"], **CROP_ALIASES.get(language, {})}
+        district_aliases = {
+            **DISTRICT_ALIASES_BY_LANGUAGE["en"],
+            **DISTRICT_ALIASES_BY_LANGUAGE.get(language, {}),
+        }
+        gazetteer = build_gazetteer(KNOWN_CROPS, KNOWN_DISTRICTS, crop_aliases, district_aliases)
+        _GAZETTEERS[language] = gazetteer
+    return gazetteer
+
+
+GAZETTEER = gazetteer_for("en")
+
+
+def _scan(text: str, gazetteer: Gazetteer = GAZETTEER, fuzzy: bool = True) -> dict:
+    """
+    Single pass over the text for intent keywords, numbers and units, plus
+    one automaton pass for crops and districts (and a trie lookup for typos).
+    """
     text_lower = text.lower()
+
+    # group id → (earliest end, latest start) of its keywords
+    spans: dict[int, tuple[int, int]] = {}
+    best_qty = None        # (unit rank, position, value, unit)
+    first_number = None
+
+    for m in _TOKEN_RE.finditer(text_lower):
+        start, end = m.span()
+        kw = m.group("kw")
+        if kw is not None:
+            gids = _KEYWORD_GROUPS[kw]
+        else:
+            unit = m.group("unit")
+            value = float(m.group("num"))
+            if unit is not None:
+                candidate = (_UNIT_RANK[unit], start, value, unit)
+                if best_qty is None or candidate < best_qty:
+                    best_qty = candidate
+            # Whole-word numbers only: "500kg" is not a bare number, but the
+            # "3" of "3.5kg" is, as it was for the original \b\d+\b patterns.
+            bare = _bare_number(text_lower, start, m.end("num"))
+            if bare is None:
+                continue
+            start, num_end = bare.span()
+            if first_number is None:
+                first_number = float(bare.group())
+            if _NUMBER_GROUP is None:
+                continue
+            gids = (_NUMBER_GROUP,)
+            end = num_end
+        for gid in gids:
+            seen = spans.get(gid)
+            spans[gid] = (end, start) if seen is None else (min(seen[0], end), max(seen[1], start))
+
+    return {
+        "spans": spans,
+        "quantity": best_qty,
+        "first_number": first_number,
+        "entities": gazetteer.match(text_lower, fuzzy=fuzzy),
+    }
+
+
+def _sequence_matches(seq: tuple[int, ...], spans: dict[int, tuple[int, int]]) -> bool:
+    if len(seq) == 1:
+        return seq[0] in spans
+    first, second = seq
+    return first in spans and second in spans and spans[first][0] <= spans[second][1]
+
+
+def _detect_intent(text: str, scan: dict | None = None) -> tuple[str, float]:
+    """Detect the most likely intent from text. Returns (intent, confidence)."""
+    spans = (scan or _scan(text))["spans"]
     scores: dict[str, int] = {}
 
-    for intent, patterns in INTENT_PATTERNS.items():
-        for pattern in patterns:
-            if re.search(pattern, text_lower):
+    for intent, sequences in _INTENT_SEQUENCES.items():
+        for seq in sequences:
+            if _sequence_matches(seq, spans):
                 scores[intent] = scores.get(intent, 0) + 1
 
     if not scores:
@@ -76,48 +307,33 @@ def _detect_intent(text: str) -> tuple[str, float]:
     return best_intent, round(confidence, 2)
 
 
-def _extract_crop(text: str) -> str | None:
+def _extract_crop(text: str, scan: dict | None = None) -> str | None:
     """Find a known crop name in the text."""
-    text_lower = text.lower()
-    for crop in KNOWN_CROPS:
-        if crop.lower() in text_lower:
-            return crop
-    return None
+    return (scan or _scan(text))["entities"].get("crop")
 
 
-def _extract_quantity(text: str) -> tuple[float | None, str | None]:
+def _extract_quantity(text: str, scan: dict | None = None) -> tuple[float | None, str | None]:
     """Extract quantity and unit from text. Returns (quantity_in_kg, original_unit)."""
-    text_lower = text.lower()
+    scan = scan or _scan(text)
 
-    for pattern in QUANTITY_PATTERNS[:-1]:  # Skip the plain number fallback first
-        match = re.search(pattern, text_lower)
-        if match:
-            value = float(match.group(1))
-            # Determine unit from the matched text
-            matched_text = match.group(0).lower()
-            for unit_name, multiplier in UNIT_MULTIPLIERS.items():
-                if unit_name in matched_text:
-                    return value * multiplier, unit_name
-            return value, "kg"
+    if scan["quantity"] is not None:
+        _, _, value, unit = scan["quantity"]
+        name = _UNIT_NAME[unit]
+        return value * UNIT_MULTIPLIERS[name], name
 
     # Fallback: plain number (only if crop is also mentioned)
-    if _extract_crop(text) is not None:
-        match = re.search(QUANTITY_PATTERNS[-1], text)
-        if match:
-            return float(match.group(1)), "kg"
+    if scan["entities"].get("crop") is not None and scan["first_number"] is not None:
+        return scan["first_number"], "kg"
 
     return None, None
 
 
-def _extract_district(text: str) -> str | None:
+def _extract_district(text: str, scan: dict | None = None) -> str | None:
     """Find a known district name in the text (case-insensitive)."""
-    text_lower = text.lower()
-    for district in KNOWN_DISTRICTS:
-        if district.lower() in text_lower:
-            return district
-    return None
+    return (scan or _scan(text))["entities"].get("district")
 
 
+@traced()
 def extract_intent(request: ListenRequest) -> ListenResponse:
     """
     Extract structured intent and slots from raw text.
@@ -125,14 +341,15 @@ def extract_intent(request: ListenRequest) -> ListenResponse:
     Returns intent type, extracted slots, missing slots, and confidence.
     """
     text = request.rawText
+    scan = _scan(text, gazetteer_for(request.language))
 
     # Detect intent
-    intent, confidence = _detect_intent(text)
+    intent, confidence = _detect_intent(text, scan)
 
     # Extract slots
-    crop = _extract_crop(text)
-    quantity, unit = _extract_quantity(text)
-    district = _extract_district(text)
+    crop = _extract_crop(text, scan)
+    quantity, unit = _extract_quantity(text, scan)
+    district = _extract_district(text, scan)
 
     slots = ExtractedSlots(
         crop=crop,
@@ -8,37 +8,325 @@ CRITICAL DESIGN PRINCIPLE:
 Two functions:
     1. generate_negotiation_message() — Turn a machine decision into polite text
     2. extract_offer_from_text()       — Parse buyer's natural language into structured offer
+                                         (local model by default, Ollama optional)
 """
 
 import os
 import json
 import re
+import threading
+import time
+from typing import Callable
+
 import requests
 
+from cache import TTLCache
+from circuit_breaker import CLOSED, BreakerProber, CircuitOpenError, breaker_from_env
+from intent_model import load_default as load_local_extractor
+from latency import LatencyWindow
+from metrics import LLM_FALLBACKS, LLM_FUNCTION_CALLS, LLM_FUNCTION_LATENCY, OLLAMA_LATENCY
+from shared_cache import TieredCache
+from tracing import record_span, span
+
 # ─── Ollama config ────────────────────────────────────────────────────────────
 
 OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2:3b")
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "30"))
+OLLAMA_PROBE_INTERVAL = float(os.environ.get("OLLAMA_PROBE_INTERVAL", "1.0"))
+
+# How long Ollama keeps the model loaded after the last request
+# ("30m", "1h", or "-1" to pin it in memory).
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_WARMUP = os.environ.get("OLLAMA_WARMUP", "1") == "1"
+OLLAMA_WARMUP_TIMEOUT = float(os.environ.get("OLLAMA_WARMUP_TIMEOUT", "120"))
+
+# Reuse Ollama's returned `context` tokens across rounds of one negotiation,
+# so the system prompt is processed once per conversation, not per message.
+OLLAMA_CONTEXT_REUSE = os.environ.get("OLLAMA_CONTEXT_REUSE", "1") == "1"
+OLLAMA_CONTEXT_MAX_TOKENS = int(os.environ.get("OLLAMA_CONTEXT_MAX_TOKENS", "3000"))
+
+# Trips after OLLAMA_BREAKER_FAILURES consecutive failures or slow calls;
+# while open, callers fail instantly into their template / regex fallbacks.
+OLLAMA_BREAKER = breaker_from_env("ollama", "OLLAMA")
+
+# conversation key → context tokens from the previous round
+_CONTEXTS = TTLCache(
+    "ollama_context",
+    maxsize=int(os.environ.get("OLLAMA_CONTEXT_MAX_SESSIONS", "1024")),
+    ttl_s=float(os.environ.get("OLLAMA_CONTEXT_TTL", "1800")),
+)
+
+WARMUP_STATE = {"state": "pending", "durationMs": None, "error": ""}
+
+# ─── Latency-budget routing ───────────────────────────────────────────────────
+# With a latency budget, a fresh Ollama call is only made when the observed
+# LLM_ROUTING_PERCENTILE latency fits in it; otherwise a cached LLM message
+# (or the template / regex path) is served.
+LLM_ROUTING_PERCENTILE = float(os.environ.get("LLM_ROUTING_PERCENTILE", "0.99"))
+# Samples older than this are forgotten, so routing retries Ollama after a spike
+LLM_LATENCY_WINDOW_S = float(os.environ.get("LLM_LATENCY_WINDOW_S", "60"))
+
+LLM_LATENCY = {
+    "negotiation": LatencyWindow(max_age_s=LLM_LATENCY_WINDOW_S),
+    "extraction": LatencyWindow(max_age_s=LLM_LATENCY_WINDOW_S),
+}
+
+
+def _served(function: str, route: str, t0: float) -> None:
+    """Count how a call was served (fresh / cached / template, local / llm / regex) and time it."""
+    LLM_FUNCTION_CALLS.inc((function, route))
+    LLM_FUNCTION_LATENCY.observe(time.perf_counter() - t0, (function,))
+
+
+# Generated counter-offer messages, keyed by the numbers in the prompt;
+# shared by all workers when SHARED_CACHE_URL is set (see shared_cache.py)
+_MESSAGE_CACHE = TieredCache(
+    "llm_message",
+    maxsize=int(os.environ.get("LLM_MESSAGE_CACHE_SIZE", "2048")),
+    ttl_s=float(os.environ.get("LLM_MESSAGE_CACHE_TTL", "3600")),
+)
+
+
+# Live (non-background) Ollama calls currently in flight
+_live_calls = 0
+_live_lock = threading.Lock()
+
+
+def llm_is_idle() -> bool:
+    """True when no live call is waiting on Ollama and the breaker is closed."""
+    return _live_calls == 0 and OLLAMA_BREAKER.state == CLOSED
+
+
+def _fits_budget(purpose: str, budget_ms: float | None) -> bool:
+    """True if a fresh LLM call is expected to finish within budget_ms."""
+    if budget_ms is None:
+        return True
+    if budget_ms <= 0:
+        return False
+    observed = LLM_LATENCY[purpose].percentile(LLM_ROUTING_PERCENTILE)
+    # No history yet: try it, the call timeout is capped to the budget anyway
+    return observed is None or observed <= budget_ms
+
+
+def _ollama_generate(
+    prompt: str,
+    system: str = "",
+    temperature: float = 0.7,
+    conversation: str | None = None,
+    purpose: str | None = None,
+    budget_ms: float | None = None,
+    background: bool = False,
+    on_text: Callable[[str], None] | None = None,
+) -> str:
+    """
+    Call local Ollama API and return the generated text.
 
+    With a `conversation` key, the context returned by the previous round is
+    sent back instead of the system prompt (which it already contains), so
+    Ollama only has to process the new prompt tokens.
 
-def _ollama_generate(prompt: str, system: str = "", temperature: float = 0.7) -> str:
-    """Call local Ollama API and return the generated text."""
-    response = requests.post(
-        f"{OLLAMA_URL}/api/generate",
-        json={
-            "model": OLLAMA_MODEL,
-            "prompt": prompt,
-            "system": system,
-            "stream": False,
-            "options": {
-                "temperature": temperature,
-                "num_predict": 200,
-            },
+    With a `budget_ms`, the request timeout is capped to the budget. A call
+    cut short by the budget does not count against the circuit breaker.
+
+    `background` calls (speculative work) are left out of the live in-flight
+    count and the latency windows used for routing.
+
+    With `on_text`, the reply is streamed and each fragment is passed to it
+    as it arrives (the timeout then bounds each read, not the whole reply).
+    """
+    global _live_calls
+    if not OLLAMA_BREAKER.allow():
+        raise CircuitOpenError("Ollama circuit breaker is open")
+
+    timeout = OLLAMA_TIMEOUT
+    if budget_ms is not None:
+        timeout = min(OLLAMA_TIMEOUT, budget_ms / 1000)
+
+    payload = {
+        "model": OLLAMA_MODEL,
+        "prompt": prompt,
+        "stream": on_text is not None,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": {
+            "temperature": temperature,
+            "num_predict": 200,
         },
-        timeout=30,
-    )
+    }
+    context = _CONTEXTS.get(conversation) if conversation and OLLAMA_CONTEXT_REUSE else None
+    if context:
+        payload["context"] = context
+    else:
+        payload["system"] = system
+
+    if background:
+        purpose = None
+    else:
+        with _live_lock:
+            _live_calls += 1
+
+    t0 = time.perf_counter()
+    with span("llm.generate", **{
+        "llm.model": OLLAMA_MODEL,
+        "llm.purpose": purpose or ("background" if background else "other"),
+        "llm.context_reuse": bool(context),
+    }):
+        start_ns = time.perf_counter_ns()
+        try:
+            response = requests.post(
+                f"{OLLAMA_URL}/api/generate",
+                json=payload,
+                timeout=timeout,
+                stream=on_text is not None,
+            )
+            response.raise_for_status()
+            data = response.json() if on_text is None else _read_stream(response, on_text)
+        except Exception as e:
+            budget_cut = timeout < OLLAMA_TIMEOUT and isinstance(e, requests.Timeout)
+            OLLAMA_LATENCY.observe(
+                time.perf_counter() - t0,
+                (purpose or "background", "budget_timeout" if budget_cut else "error"),
+            )
+            if budget_cut:
+                # Censored sample: the call took at least this long
+                if purpose:
+                    LLM_LATENCY[purpose].record(timeout * 1000)
+            else:
+                OLLAMA_BREAKER.record_failure(e)
+            if conversation:
+                _CONTEXTS.pop(conversation)
+            raise
+        finally:
+            if not background:
+                with _live_lock:
+                    _live_calls -= 1
+        _trace_ollama_phases(start_ns, time.perf_counter_ns(), data)
+
+    elapsed = time.perf_counter() - t0
+    OLLAMA_LATENCY.observe(elapsed, (purpose or "background", "ok"))
+    OLLAMA_BREAKER.record_success(elapsed)
+    if purpose:
+        LLM_LATENCY[purpose].record(elapsed * 1000)
+
+    if conversation and OLLAMA_CONTEXT_REUSE:
+        new_context = data.get("context")
+        if new_context and len(new_context) <= OLLAMA_CONTEXT_MAX_TOKENS:
+            _CONTEXTS.put(conversation, new_context)
+        else:
+            # Too long to keep growing — next round starts fresh with the system prompt
+            _CONTEXTS.pop(conversation)
+
+    return data.get("response", "").strip()
+
+
+def _read_stream(response: requests.Response, on_text: Callable[[str], None]) -> dict:
+    """
+    Consume a streamed /api/generate reply: one JSON object per line, each
+    with a `response` fragment; the last (`done`) carries the context and
+    timings. Returns that last object with the full text as `response`.
+    """
+    parts = []
+    with response:
+        for line in response.iter_lines(chunk_size=None):
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("response"):
+                parts.append(chunk["response"])
+                on_text(chunk["response"])
+            if chunk.get("done"):
+                chunk["response"] = "".join(parts)
+                return chunk
+    raise ValueError("Ollama stream ended before the reply was done")
+
+
+def _trace_ollama_phases(start_ns: int, end_ns: int, data: dict) -> None:
+    """
+    Child spans from Ollama's own timings (ns), laid back-to-back so they end
+    when the response arrived. Whatever precedes them is time spent queued
+    behind other requests (plus network).
+    """
+    phases = [
+        ("llm.load", data.get("load_duration") or 0, None),
+        ("llm.prompt_eval", data.get("prompt_eval_duration") or 0, data.get("prompt_eval_count")),
+        ("llm.eval", data.get("eval_duration") or 0, data.get("eval_count")),
+    ]
+    server_ns = data.get("total_duration") or sum(ns for _, ns, _ in phases)
+    if not server_ns:
+        return
+    cursor = max(start_ns, end_ns - server_ns)
+    record_span("llm.queue_wait", start_ns, cursor)
+    for name, ns, tokens in phases:
+        if ns:
+            end = min(cursor + ns, end_ns)
+            record_span(name, cursor, end, **({"llm.tokens": tokens} if tokens is not None else {}))
+            cursor = end
+
+
+def _probe_ollama() -> None:
+    """Half-open trial: cheap request that fails if Ollama is unreachable."""
+    response = requests.get(f"{OLLAMA_URL}/api/tags", timeout=2)
     response.raise_for_status()
-    return response.json().get("response", "").strip()
+
+
+def warm_up_model() -> bool:
+    """
+    Load the model into Ollama memory and pre-process both system prompts,
+    so the first buyer after startup does not pay the model load.
+
+    Updates WARMUP_STATE; `/ready` reports not-ready until this finishes.
+    """
+    if not OLLAMA_WARMUP:
+        WARMUP_STATE.update(state="skipped", durationMs=0.0)
+        return True
+
+    WARMUP_STATE["state"] = "warming"
+    t0 = time.perf_counter()
+    try:
+        # An empty prompt only loads the model and applies keep_alive
+        response = requests.post(
+            f"{OLLAMA_URL}/api/generate",
+            json={"model": OLLAMA_MODEL, "prompt": "", "keep_alive": OLLAMA_KEEP_ALIVE},
+            timeout=OLLAMA_WARMUP_TIMEOUT,
+        )
+        response.raise_for_status()
+
+        # Prime the prompt cache with each system prompt in use
+        systems = [NEGOTIATION_SYSTEM_PROMPT]
+        if LOCAL_EXTRACTOR is None:
+            systems.append(EXTRACTION_SYSTEM_PROMPT)
+        for system in systems:
+            response = requests.post(
+                f"{OLLAMA_URL}/api/generate",
+                json={
+                    "model": OLLAMA_MODEL,
+                    "prompt": "ping",
+                    "system": system,
+                    "stream": False,
+                    "keep_alive": OLLAMA_KEEP_ALIVE,
+                    "options": {"num_predict": 1},
+                },
+                timeout=OLLAMA_WARMUP_TIMEOUT,
+            )
+            response.raise_for_status()
+    except Exception as e:
+        print(f"[LLM] Warm-up failed, serving fallbacks until Ollama is reachable: {e}")
+        WARMUP_STATE.update(
+            state="failed",
+            durationMs=round((time.perf_counter() - t0) * 1000, 1),
+            error=str(e),
+        )
+        return False
+
+    WARMUP_STATE.update(
+        state="ready",
+        durationMs=round((time.perf_counter() - t0) * 1000, 1),
+        error="",
+    )
+    return True
+
+
+OLLAMA_PROBER = BreakerProber(OLLAMA_BREAKER, _probe_ollama, interval_s=OLLAMA_PROBE_INTERVAL)
 
 
 # ═════════════════════════════════════════════════════════════════════════════
@@ -59,7 +347,14 @@ NEGOTIATION_SYSTEM_PROMPT = """You are a professional agricultural trade negotia
 - If status is "rejected", firmly but politely decline and encourage a better offer"""
 
 
-def generate_negotiation_message(decision: dict, context: dict) -> str:
+def generate_negotiation_message(
+    decision: dict,
+    context: dict,
+    conversation: str | None = None,
+    budget_ms: float | None = None,
+    background: bool = False,
+    on_text: Callable[[str], None] | None = None,
+) -> str:
     """
     Generate a human-style negotiation message using local Llama model.
 
@@ -83,6 +378,16 @@ def generate_negotiation_message(decision: dict, context: dict) -> str:
                 "reserve_price": 25.0,
                 "round_number": 1,
             }
+        conversation: Optional key (listing + buyer) used to reuse the
+            Ollama context across rounds of the same negotiation.
+        budget_ms: Optional latency budget. When the observed LLM latency
+            doesn't fit, a cached message for the same numbers (or the
+            template) is returned instead of calling Ollama.
+        on_text: Optional callback for the message as it is produced —
+            LLM fragments as they stream in, or a cached / template
+            message in one piece. If the LLM fails part-way, the fallback
+            follows the fragments already sent; the return value is the
+            message to keep.
 
     Returns:
         Human-readable negotiation message string.
@@ -110,17 +415,50 @@ def generate_negotiation_message(decision: dict, context: dict) -> str:
                 f"Net profit at counter price: ₹{context['net_profit_at_counter']:,.2f}"
             )
 
+    # Same numbers → same message, whatever the round
+    cache_key = "\n".join(user_parts)
+
     user_parts.append(f"Negotiation round: {context.get('round_number', 1)}")
     user_parts.append("\nGenerate a short, professional negotiation response.")
 
     user_prompt = "\n".join(user_parts)
 
-    try:
-        return _ollama_generate(user_prompt, system=NEGOTIATION_SYSTEM_PROMPT, temperature=0.7)
-    except Exception as e:
-        # Fallback to template if LLM fails
-        print(f"[LLM] Negotiation message generation failed: {e}")
-        return _template_fallback(decision, context)
+    function = "generate_negotiation_message"
+    t0 = time.perf_counter()
+    if _fits_budget("negotiation", budget_ms):
+        try:
+            message = _ollama_generate(
+                user_prompt,
+                system=NEGOTIATION_SYSTEM_PROMPT,
+                temperature=0.7,
+                conversation=f"negotiation:{conversation}" if conversation else None,
+                purpose="negotiation",
+                budget_ms=budget_ms,
+                background=background,
+                on_text=on_text,
+            )
+            _MESSAGE_CACHE.put(cache_key, message)
+            _served(function, "fresh", t0)
+            return message
+        except CircuitOpenError:
+            LLM_FALLBACKS.inc((function, "circuit_open"))
+        except Exception as e:
+            # Fallback to cached message / template if LLM fails
+            LLM_FALLBACKS.inc((function, "error"))
+            print(f"[LLM] Negotiation message generation failed: {e}")
+    else:
+        LLM_FALLBACKS.inc((function, "budget"))
+
+    cached = _MESSAGE_CACHE.get(cache_key)
+    if cached is not None:
+        _served(function, "cached", t0)
+        message = cached
+    else:
+        message = _template_fallback(decision, context)
+        _served(function, "template", t0)
+    if on_text is not None:
+        on_text(message)
+    return message
 
 
 def _template_fallback(decision: dict, context: dict) -> str:
@@ -180,21 +518,64 @@ Input: "That's too high, I'll pass"
 Output: {"offerPricePerKg": null, "quantity": null, "buyerDistrict": null, "intent": "reject"}"""
 
 
-def extract_offer_from_text(buyer_text: str) -> dict:
+# "local" uses the trained extractor in intent_model.json (sub-millisecond);
+# "ollama" sends every message to the LLM. Falls back to Ollama if the
+# artefact is missing.
+EXTRACTION_BACKEND = os.environ.get("EXTRACTION_BACKEND", "local")
+LOCAL_EXTRACTOR = load_local_extractor() if EXTRACTION_BACKEND == "local" else None
+
+# Ollama extraction results by buyer message: the same text extracts the same
+# way (temperature 0), so retries and repeated messages skip the LLM
+_EXTRACTION_CACHE = TieredCache(
+    "llm_extraction",
+    maxsize=int(os.environ.get("LLM_EXTRACTION_CACHE_SIZE", "4096")),
+    ttl_s=float(os.environ.get("LLM_EXTRACTION_CACHE_TTL", "3600")),
+)
+
+
+def extract_offer_from_text(
+    buyer_text: str,
+    conversation: str | None = None,
+    budget_ms: float | None = None,
+) -> dict:
     """
-    Use local Llama model to extract structured offer data from buyer's natural language.
+    Extract structured offer data from buyer's natural language, with the
+    local extractor model or (EXTRACTION_BACKEND=ollama) the local Llama model.
 
     Args:
         buyer_text: Raw text from the buyer, e.g. "I can offer ₹22 per kg for 500kg"
+        conversation: Optional key (listing + buyer) used to reuse the
+            Ollama context across rounds of the same negotiation.
+        budget_ms: Optional latency budget; regex extraction is used when
+            the observed LLM latency doesn't fit in it.
 
     Returns:
         dict with keys: offerPricePerKg, quantity, buyerDistrict, intent
     """
-    try:
+    function = "extract_offer_from_text"
+    t0 = time.perf_counter()
+    if LOCAL_EXTRACTOR is not None:
+        result = LOCAL_EXTRACTOR.extract(buyer_text)
+        _served(function, "local", t0)
+        return result
+
+    cached = _EXTRACTION_CACHE.get(buyer_text)
+    if cached is not None:
+        _served(function, "cached", t0)
+        return dict(cached)
+
+    if not _fits_budget("extraction", budget_ms):
+        LLM_FALLBACKS.inc((function, "budget"))
+        return _served_regex(buyer_text, t0)
+
+    def extract() -> dict:
         raw = _ollama_generate(
             prompt=f"Buyer message: {buyer_text}",
             system=EXTRACTION_SYSTEM_PROMPT,
             temperature=0.0,
+            conversation=f"extraction:{conversation}" if conversation else None,
+            purpose="extraction",
+            budget_ms=budget_ms,
         )
 
         # Clean potential markdown wrapping
@@ -204,10 +585,26 @@ def extract_offer_from_text(buyer_text: str) -> dict:
             raw = raw.strip()
 
         return json.loads(raw)
+
+    try:
+        # Concurrent identical messages share one Ollama call
+        result = dict(_EXTRACTION_CACHE.get_or_compute(buyer_text, extract))
+        _served(function, "llm", t0)
+        return result
+    except CircuitOpenError:
+        LLM_FALLBACKS.inc((function, "circuit_open"))
+        return _served_regex(buyer_text, t0)
     except Exception as e:
         # Fallback: try basic regex extraction
+        LLM_FALLBACKS.inc((function, "error"))
         print(f"[LLM] Offer extraction failed: {e}")
-        return _regex_fallback(buyer_text)
+        return _served_regex(buyer_text, t0)
+
+
+def _served_regex(buyer_text: str, t0: float) -> dict:
+    result = _regex_fallback(buyer_text)
+    _served("extract_offer_from_text", "regex", t0)
+    return result
 
 
 def _regex_fallback(text: str) -> dict:
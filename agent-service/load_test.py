@@ -0,0 +1,408 @@
+"""
+Load test: replay a mix of analyze / negotiate / chat / listen traffic
+against the agent service, with mock_ollama.py standing in for the model,
+and report throughput, failure rate and p50/p95/p99 latency per endpoint.
+Rounds turned away by chat admission (429) are counted on their own: they
+are neither failures nor part of the latency percentiles.
+
+    python load_test.py                                    # app in-process (uvicorn on a thread)
+    python load_test.py --uvicorn --workers 2              # app in a uvicorn subprocess
+    python load_test.py --url http://localhost:8000        # a running service and its own Ollama
+    python load_test.py --concurrency 32 --duration 60 \\
+        --gen-ms 400 --gen-dist lognormal --error-rate 0.02
+    python load_test.py --rps 40                           # open loop: fixed arrival rate
+
+Closed loop (default): --concurrency clients each send their next request
+as soon as the last one returns. Open loop (--rps): requests are due at a
+fixed rate and latency is measured from when each was due, so time spent
+queued behind a slow service is counted rather than hidden.
+
+In-process mode shares one interpreter (and GIL) between the clients, the
+mock and the app; use --uvicorn for numbers closer to a deployment.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from mock_ollama import GEN_DISTRIBUTIONS, MockOllama
+
+DISTRICTS = [
+    "Thiruvananthapuram", "Kollam", "Pathanamthitta", "Alappuzha", "Kottayam", "Idukki", "Ernakulam",
+    "Thrissur", "Palakkad", "Malappuram", "Kozhikode", "Wayanad", "Kannur", "Kasaragod",
+]
+
+BUYER_MESSAGES = [
+    "I can offer {price} per kg",
+    "best I can do is ₹{price}/kg for the full lot",
+    "{price} rupees per kilo, final",
+    "can you do {price}? delivery to {district}",
+    "ok I accept your counter",
+    "too expensive, I'll pass",
+]
+
+LISTEN_TEXTS = [
+    "I want to sell {qty} kg of tomato in {district}",
+    "what is the current market price of tomato in {district}?",
+    "can you do {price} for {qty} kg, that is too low",
+    "ok I accept the deal, deliver to {district}",
+]
+
+DEFAULT_MIX = "chat=4,negotiate=3,analyze=2,listen=1"
+
+
+# ─── Traffic ──────────────────────────────────────────────────────────────────
+
+def _analyze(rng: random.Random) -> tuple[str, dict]:
+    return "/agent/analyze-market", {
+        "crop": "Tomato",
+        "quantity": rng.choice((100, 250, 500, 1000, 2000)),
+        "farmerDistrict": rng.choice(DISTRICTS),
+    }
+
+
+def _negotiate(rng: random.Random) -> tuple[str, dict]:
+    reserve = round(rng.uniform(20, 28), 1)
+    return "/agent/negotiate", {
+        "crop": "Tomato",
+        "quantity": rng.choice((100, 250, 500, 1000)),
+        "farmer": {"district": rng.choice(DISTRICTS)},
+        "buyer": {"district": rng.choice(DISTRICTS)},
+        "offerPricePerKg": round(reserve * rng.uniform(0.6, 1.2), 1),
+        "reservePrice": reserve,
+    }
+
+
+def _chat(rng: random.Random) -> tuple[str, dict]:
+    # Buyers mostly open a little under the tomato reserve (~₹25), the counter-offer band
+    price = round(rng.triangular(16, 28, 22.5), 1)
+    district = rng.choice(DISTRICTS)
+    round_number = rng.randint(1, 4)
+    # A few hundred live negotiations, so Ollama contexts are reused and evicted;
+    # each has its own buyer, so no one buyer exceeds CHAT_RATE_PER_BUYER
+    negotiation = rng.randint(1, 400)
+    return "/agent/chat", {
+        "listingId": f"L{negotiation % 50 + 1}",
+        "buyerId": f"B{negotiation}",
+        "buyerMessage": rng.choice(BUYER_MESSAGES).format(price=price, district=district),
+        "buyerDistrict": district,
+        "crop": "Tomato",
+        "quantity": rng.choice((250, 500, 1000)),
+        "farmerDistrict": rng.choice(DISTRICTS),
+        "roundNumber": round_number,
+        "currentOfferPrice": price if round_number > 1 else None,
+        "lastCounterPrice": round(price + rng.uniform(1, 4), 1) if round_number > 1 else None,
+    }
+
+
+def _listen(rng: random.Random) -> tuple[str, dict]:
+    text = rng.choice(LISTEN_TEXTS).format(
+        qty=rng.choice((50, 200, 500)), price=rng.randint(18, 30), district=rng.choice(DISTRICTS),
+    )
+    return "/agent/listen", {"rawText": text}
+
+
+GENERATORS = {"analyze": _analyze, "negotiate": _negotiate, "chat": _chat, "listen": _listen}
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in GENERATORS:
+            raise ValueError(f"Unknown endpoint '{name}' in mix (choose from {', '.join(GENERATORS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ─── Clients ──────────────────────────────────────────────────────────────────
+
+class Recorder:
+    """Latencies (ms), failures and 429s per endpoint, shared by the client threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: dict[str, list[float]] = {}
+        self.failures: dict[str, dict[str, int]] = {}
+        self.rate_limited: dict[str, int] = {}
+
+    def record(self, endpoint: str, ms: float, failure: str | None) -> None:
+        with self._lock:
+            if failure == "429":
+                # Admission turned the round away in well under a millisecond
+                self.rate_limited[endpoint] = self.rate_limited.get(endpoint, 0) + 1
+                return
+            self.latencies.setdefault(endpoint, []).append(ms)
+            if failure is not None:
+                by_kind = self.failures.setdefault(endpoint, {})
+                by_kind[failure] = by_kind.get(failure, 0) + 1
+
+
+def _client(
+    base_url: str,
+    mix: dict[str, float],
+    recorder: Recorder,
+    deadline: float,
+    seed: int,
+    timeout_s: float,
+    schedule: tuple[float, float, float] | None,
+) -> None:
+    """
+    One client thread. With `schedule` = (start, interval, offset) it sends
+    the requests due at start + (offset + k) * interval (open loop).
+    """
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    session = requests.Session()
+    k = 0
+    while True:
+        if schedule is not None:
+            start, interval, offset = schedule
+            due = start + (offset + k) * interval
+            k += 1
+            if due >= deadline:
+                return
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            due = time.perf_counter()
+            if due >= deadline:
+                return
+
+        name = rng.choices(names, weights)[0]
+        path, body = GENERATORS[name](rng)
+        failure = None
+        try:
+            r = session.post(f"{base_url}{path}", json=body, timeout=timeout_s)
+            if r.status_code >= 400:
+                failure = str(r.status_code)
+        except requests.Timeout:
+            failure = "timeout"
+        except requests.RequestException as e:
+            failure = type(e).__name__
+        recorder.record(name, (time.perf_counter() - due) * 1000, failure)
+
+
+def run_load(
+    base_url: str,
+    mix: dict[str, float],
+    concurrency: int,
+    duration_s: float,
+    rps: float | None = None,
+    timeout_s: float = 35.0,
+    seed: int = 0,
+) -> tuple[Recorder, float]:
+    recorder = Recorder()
+    start = time.perf_counter()
+    deadline = start + duration_s
+    threads = []
+    for i in range(concurrency):
+        schedule = (start, concurrency / rps, i / concurrency) if rps else None
+        t = threading.Thread(
+            target=_client,
+            args=(base_url, mix, recorder, deadline, seed + i, timeout_s, schedule),
+            daemon=True,
+        )
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    return recorder, time.perf_counter() - start
+
+
+# ─── Report ───────────────────────────────────────────────────────────────────
+
+def _percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+def summarize(recorder: Recorder, elapsed_s: float) -> dict[str, dict]:
+    summary = {}
+    everything: list[float] = []
+    total_failures: dict[str, int] = {}
+    for name in sorted(recorder.latencies.keys() | recorder.rate_limited.keys()):
+        latencies = sorted(recorder.latencies.get(name, []))
+        everything.extend(latencies)
+        failures = recorder.failures.get(name, {})
+        for kind, n in failures.items():
+            total_failures[kind] = total_failures.get(kind, 0) + n
+        summary[name] = _stats(latencies, failures, recorder.rate_limited.get(name, 0), elapsed_s)
+    summary["all"] = _stats(sorted(everything), total_failures, sum(recorder.rate_limited.values()), elapsed_s)
+    return summary
+
+
+def _stats(latencies: list[float], failures: dict[str, int], rate_limited: int, elapsed_s: float) -> dict:
+    count = len(latencies)
+    failed = sum(failures.values())
+    return {
+        "requests": count,
+        "rps": round(count / elapsed_s, 2),
+        "failureRate": round(failed / count, 4) if count else 0.0,
+        "failures": failures,
+        "rateLimited": rate_limited,
+        "p50Ms": round(_percentile(latencies, 0.50), 2),
+        "p95Ms": round(_percentile(latencies, 0.95), 2),
+        "p99Ms": round(_percentile(latencies, 0.99), 2),
+        "maxMs": round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+def print_report(summary: dict[str, dict]) -> None:
+    print(
+        f"\n{'endpoint':<10}{'reqs':>7}{'rps':>8}{'fail':>8}{'429':>7}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    )
+    for name, s in summary.items():
+        print(
+            f"{name:<10}{s['requests']:>7}{s['rps']:>8.1f}{s['failureRate']:>8.1%}{s['rateLimited']:>7}"
+            f"{s['p50Ms']:>10.1f}{s['p95Ms']:>10.1f}{s['p99Ms']:>10.1f}{s['maxMs']:>10.1f}"
+        )
+    failures = summary["all"]["failures"]
+    if failures:
+        print("failures: " + ", ".join(f"{kind} × {n}" for kind, n in sorted(failures.items())))
+
+
+# ─── Service under test ───────────────────────────────────────────────────────
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(base_url: str, timeout_s: float = 120.0) -> None:
+    """Wait for /ready (the Ollama warm-up runs against the mock at startup)."""
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/ready", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Service at {base_url} not ready after {timeout_s:.0f}s")
+
+
+def start_inprocess(port: int):
+    """Serve main.app with uvicorn on a background thread; returns a stop function."""
+    import uvicorn
+    import main  # imported after OLLAMA_URL is set, as the service reads it at import
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    def stop() -> None:
+        server.should_exit = True
+        thread.join(timeout=10)
+    return stop
+
+
+def start_uvicorn(port: int, workers: int):
+    """Run `uvicorn main:app` as a subprocess; returns a stop function."""
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=os.environ.copy(),
+    )
+
+    def stop() -> None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return stop
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_argument_group("service under test")
+    target.add_argument("--url", help="load an already-running service (no mock is started)")
+    target.add_argument("--uvicorn", action="store_true", help="run the app in a uvicorn subprocess")
+    target.add_argument("--workers", type=int, default=1, help="uvicorn workers (with --uvicorn)")
+
+    load = parser.add_argument_group("load")
+    load.add_argument("--concurrency", type=int, default=16)
+    load.add_argument("--duration", type=float, default=20.0, help="seconds")
+    load.add_argument("--rps", type=float, default=None, help="open-loop arrival rate")
+    load.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights (default %(default)s)")
+    load.add_argument("--timeout", type=float, default=35.0, help="client timeout, seconds")
+    load.add_argument("--seed", type=int, default=0)
+    load.add_argument("--json", dest="json_path", help="also write the summary here")
+
+    mock = parser.add_argument_group("mock Ollama")
+    mock.add_argument("--load-ms", type=float, default=1500.0)
+    mock.add_argument("--prompt-ms-per-char", type=float, default=0.05)
+    mock.add_argument("--gen-ms", type=float, default=300.0)
+    mock.add_argument("--gen-dist", choices=GEN_DISTRIBUTIONS, default="lognormal")
+    mock.add_argument("--gen-sigma", type=float, default=0.5)
+    mock.add_argument("--error-rate", type=float, default=0.0)
+    mock.add_argument("--stall-rate", type=float, default=0.0)
+    mock.add_argument("--stall-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    ollama = None
+    stop = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            ollama = MockOllama(
+                load_ms=args.load_ms,
+                prompt_ms_per_char=args.prompt_ms_per_char,
+                gen_ms=args.gen_ms,
+                gen_dist=args.gen_dist,
+                gen_sigma=args.gen_sigma,
+                error_rate=args.error_rate,
+                stall_rate=args.stall_rate,
+                stall_ms=args.stall_ms,
+                seed=args.seed,
+            ).start()
+            os.environ["OLLAMA_URL"] = ollama.url
+            port = _free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            stop = start_uvicorn(port, args.workers) if args.uvicorn else start_inprocess(port)
+        _wait_ready(base_url)
+
+        mode = f"open loop at {args.rps:g} req/s" if args.rps else "closed loop"
+        print(f"{args.concurrency} clients, {mode}, {args.duration:g}s against {base_url}  mix: {args.mix}")
+        recorder, elapsed = run_load(
+            base_url, mix, args.concurrency, args.duration, args.rps, args.timeout, args.seed,
+        )
+    finally:
+        if stop is not None:
+            stop()
+        if ollama is not None:
+            ollama.stop()
+
+    summary = summarize(recorder, elapsed)
+    print_report(summary)
+    if ollama is not None:
+        print(f"mock Ollama: {ollama.stats}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "elapsedS": round(elapsed, 3), "endpoints": summary}, f, indent=2)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,16 @@ FastAPI entrypoint for the agent-service.
 Clean endpoints matching the exact backend integration contract.
 """
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from typing import Optional
+
+from fastapi import FastAPI, Header, HTTPException, Request, Response, WebSocket
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from schemas import (
@@ -11,11 +20,44 @@ from schemas import (
     NegotiateRequest, NegotiateResponse,
     ChatRequest, ChatResponse,
     ListenRequest, ListenResponse,
+    OrchestrateRequest, OrchestrateResponse,
 )
-from market_analyst import analyze_market
-from negotiation import negotiate
-from buyer_chat import handle_buyer_chat
+from market_analyst import analyze_market_wire
+from negotiation import decide, to_query
+from buyer_chat import chat_lane, explicit_ids, handle_buyer_chat
+from admission import ADMISSION, AdmissionRejected
 from listener import extract_intent
+from orchestrator import run_pipeline
+from listen_batch import chunked, msgpack_chunks, ndjson_chunks, shutdown_pool, stream_results
+from executors import CPU, INLINE, run, shutdown_executors
+from market_data import data_version, snapshot_info, snapshot_is_current, snapshot_version
+from tracing import EXPORTER, REQUEST_ID_HEADER, current_span, span
+from ws_channel import WS_ROUTE, serve_channel
+from response_cache import REPLAYED_HEADER, serve_cached
+from shared_cache import shared_cache_info
+from wire import MSGPACK, WireRoute, accepts_msgpack, is_msgpack
+import metrics
+import profiling
+import startup
+from llm_message_generator import (
+    OLLAMA_BREAKER, OLLAMA_PROBER, OLLAMA_KEEP_ALIVE, WARMUP_STATE, warm_up_model,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Price snapshots, distances and matchers before the first request (a
+    # no-op in serve.py workers, which inherit them from the master).
+    startup.preload()
+    # Warm up in the background so /health answers while the model loads;
+    # /ready stays 503 until warm-up has finished.
+    threading.Thread(target=warm_up_model, name="ollama-warmup", daemon=True).start()
+    OLLAMA_PROBER.start()
+    yield
+    OLLAMA_PROBER.stop()
+    shutdown_pool()
+    shutdown_executors()
+
 
 app = FastAPI(
     title="FairCrop Agent Service",
@@ -25,10 +67,16 @@ app = FastAPI(
         "- 📊 `/agent/analyze-market` — Reserve price from real Agmarknet data\n"
         "- 🤝 `/agent/negotiate` — Accept / counter / reject decision\n"
         "- 💬 `/agent/chat` — LLM-powered buyer negotiation chat\n"
-        "- 🎧 `/agent/listen` — Text → intent extraction"
+        "- 🔌 `/agent/ws` — WebSocket: many chat / negotiate sessions on one connection\n"
+        "- 🎧 `/agent/listen` — Text → intent extraction\n"
+        "- 📦 `/agent/listen/batch` — Bulk intent extraction (JSON list or NDJSON stream)\n"
+        "- 🧭 `/agent/orchestrate` — Listener → Market Analyst → Negotiator pipeline"
     ),
     version="3.0.0",
+    lifespan=lifespan,
 )
+# JSON or msgpack per request (see wire.py); set before any route is declared
+app.router.route_class = WireRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -36,55 +84,203 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[REQUEST_ID_HEADER, "Server-Timing", profiling.PROFILE_HEADER, "ETag", REPLAYED_HEADER],
 )
 
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Root span per request. The backend's X-Request-Id becomes the trace's
+    request id (one is generated if absent) and is echoed on the response.
+
+    `X-Profile: 1` (or PROFILE_SAMPLE_RATE) also profiles the request; the
+    response's X-Profile header names the files written.
+    """
+    request_id = request.headers.get(REQUEST_ID_HEADER)
+    profile = profiling.start(request.headers.get(profiling.PROFILE_HEADER))
+    t0 = time.perf_counter()
+    with span(
+        f"HTTP {request.method} {request.url.path}",
+        request_id=request_id,
+        **{"http.method": request.method, "http.target": request.url.path},
+    ) as root:
+        try:
+            response = await call_next(request)
+        finally:
+            if profile is not None:
+                profile.stop()
+        root.set(**{"http.status_code": response.status_code})
+        if response.status_code >= 500:
+            root.status = "ERROR"
+    route = request.scope.get("route")
+    metrics.HTTP_LATENCY.observe(
+        time.perf_counter() - t0,
+        (
+            request.method,
+            route.path if route is not None else "unmatched",
+            str(response.status_code),
+            root.attributes.get("agent.decision", ""),
+        ),
+    )
+    response.headers[REQUEST_ID_HEADER] = root.request_id
+    if profile is not None:
+        label = f"{request.method} {request.url.path} -> {response.status_code}"
+        response.headers[profiling.PROFILE_HEADER] = await asyncio.to_thread(
+            profile.write, root.request_id, label
+        )
+    return response
+
+
+def _record_decision(decision: str) -> None:
+    """Tag the request's root span; /metrics splits latency by it."""
+    root = current_span()
+    if root is not None:
+        root.set(**{"agent.decision": decision})
+
+
 # ─── 1. Health Check ─────────────────────────────────────────────────────────
 
 @app.get("/health", tags=["System"])
 async def health_check():
-    """Let backend know the service is alive."""
-    return {"status": "ok", "version": "3.0.0"}
+    """
+    Let backend know the service is alive.
+
+    `llm` reports the Ollama circuit breaker: while it is open, chat replies
+    come from templates and extraction from regex, without waiting on Ollama.
+    `sharedCache` reports the shared cache tier's backend and breaker.
+    `admission` reports chat rate limits, lane occupancy and rejections.
+    """
+    return {
+        "status": "ok",
+        "version": "3.0.0",
+        "llm": OLLAMA_BREAKER.snapshot(),
+        "sharedCache": shared_cache_info(),
+        "admission": ADMISSION.snapshot(),
+    }
+
+
+@app.get("/agent/traces/{request_id}", tags=["System"])
+async def get_trace(request_id: str):
+    """Spans recorded for a request id (in-memory or file exporter)."""
+    spans = EXPORTER.spans(request_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail=f"No spans for request '{request_id}'")
+    return {"requestId": request_id, "spans": sorted(spans, key=lambda s: s["startTimeUnixNano"])}
+
+
+@app.get("/metrics", tags=["System"])
+async def get_metrics():
+    """
+    Prometheus scrape endpoint: request latency by route and decision, LLM
+    routes, fallbacks and Ollama latency, cache hit ratios and price
+    snapshot freshness.
+    """
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/ready", tags=["System"])
+async def readiness_check():
+    """
+    Readiness probe — 503 until the data is preloaded and the Ollama warm-up
+    has finished. Unlike /health, it reports warm state: the price data
+    version (the same on every worker serving the same CSVs) and the
+    startup time breakdown of this process (see startup.py).
+
+    A failed warm-up still reports ready: chat falls back to templates until
+    the circuit breaker sees Ollama again.
+    """
+    warm = WARMUP_STATE["state"]
+    info = startup.startup_info()
+    body = {
+        "ready": info["preloaded"] and warm not in ("pending", "warming"),
+        "llm": {**WARMUP_STATE, "keepAlive": OLLAMA_KEEP_ALIVE},
+        "data": {"version": data_version(), "snapshots": snapshot_info()},
+        "startup": info,
+    }
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
 
 
 # ─── 2. Market Analyst (Farmer Backend → Agent) ─────────────────────────────
 
 @app.post("/agent/analyze-market", response_model=MarketAnalysisResponse, tags=["Market Analyst"])
-async def analyze(request: MarketAnalysisRequest):
+async def analyze(
+    request: MarketAnalysisRequest,
+    if_none_match: Optional[str] = Header(default=None),
+    idempotency_key: Optional[str] = Header(default=None),
+):
     """
     Compute recommended reserve price for a farmer's listing.
 
     Farmer backend stores this in Mongo and sends to farmer frontend.
+
+    Cached per request and price snapshot version, with `ETag` /
+    `If-None-Match` and `Idempotency-Key` support (see response_cache.py).
     """
-    result = analyze_market(request)
-    if result.recommendedReservePrice == 0:
-        raise HTTPException(
-            status_code=404,
-            detail=f"No market data for crop '{request.crop}'. Supported: Tomato."
-        )
-    return result
+    async def compute() -> dict:
+        # Sub-millisecond on a loaded price snapshot; re-reading the CSV is not
+        kind = INLINE if snapshot_is_current(request.crop) else CPU
+        body = await run(kind, analyze_market_wire, request)
+        if body["recommendedReservePrice"] == 0:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No market data for crop '{request.crop}'. Supported: Tomato."
+            )
+        return body
+
+    # Pre-validated body: skips FastAPI's response_model re-validation (see wire.py)
+    return await serve_cached(
+        "/agent/analyze-market", request, compute, lambda: snapshot_version(request.crop),
+        if_none_match, idempotency_key,
+    )
 
 
 # ─── 3. Negotiation Engine (Buyer Backend → Agent) ──────────────────────────
 
 @app.post("/agent/negotiate", response_model=NegotiateResponse, tags=["Negotiation"])
-async def negotiate_endpoint(request: NegotiateRequest):
+async def negotiate_endpoint(
+    request: NegotiateRequest,
+    if_none_match: Optional[str] = Header(default=None),
+    idempotency_key: Optional[str] = Header(default=None),
+):
     """
     Core decision endpoint. Accepts/counters/rejects a buyer's offer.
 
     Buyer backend stores counter in Redis. If accepted, stores final price in Mongo.
+
+    The decision depends on the request alone, so it is cached per request,
+    with `ETag` / `If-None-Match` and `Idempotency-Key` support (see
+    response_cache.py).
     """
-    try:
-        result = negotiate(request)
-        return result
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    async def compute() -> dict:
+        try:
+            return decide(to_query(request)).to_wire()
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return await serve_cached(
+        "/agent/negotiate", request, compute, lambda: "",
+        if_none_match, idempotency_key,
+        on_body=lambda body: _record_decision(body["status"]),
+    )
 
 
 # ─── 4. Buyer Chat — LLM Communication Layer (Buyer Backend → Agent) ────────
 
+def _server_timing(timings: dict) -> str:
+    """Format stage timings as a Server-Timing header value."""
+    return ", ".join(
+        f'{name};desc="cancelled"' if ms is None else f"{name};dur={ms}"
+        for name, ms in timings.items()
+    )
+
+
 @app.post("/agent/chat", response_model=ChatResponse, tags=["Buyer Chat"])
-async def chat(request: ChatRequest):
+async def chat(
+    request: ChatRequest,
+    response: Response,
+    x_latency_budget_ms: Optional[float] = Header(default=None, gt=0),
+):
     """
     LLM-powered buyer negotiation chat.
 
@@ -93,19 +289,119 @@ async def chat(request: ChatRequest):
     3. LLM generates polite response message
 
     Buyer backend stores counter price and sends chatMessage to frontend.
+    Per-stage durations are returned in the `Server-Timing` header.
+
+    An `X-Latency-Budget-Ms` header (or `latencyBudgetMs` field) lets the
+    caller trade a fresh LLM message for a cached or template one under load.
+
+    Rounds are rate-limited per buyer and per listing (429 with Retry-After)
+    and queued behind CHAT_MAX_INFLIGHT (503 when the queue is full);
+    accepting the last counter-offer skips both (see admission.py).
     """
+    if x_latency_budget_ms is not None:
+        request.latencyBudgetMs = x_latency_budget_ms
+    timings: dict = {}
     try:
-        result = handle_buyer_chat(request)
+        lane = chat_lane(request)
+        # Blocks on Ollama for up to OLLAMA_TIMEOUT — never on the event loop
+        result = await ADMISSION.run(
+            lane, *explicit_ids(request),
+            handle_buyer_chat, request, timings, lane=lane,
+        )
+        _record_decision(result.decision.status)
+        response.headers["Server-Timing"] = _server_timing(timings)
         return result
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status, detail=e.detail, headers=e.headers)
     except RuntimeError as e:
         raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
 
+@app.websocket(WS_ROUTE)
+async def agent_channel(websocket: WebSocket):
+    """
+    Multiplexed chat / negotiate requests over one long-lived connection,
+    with the decision and the LLM reply pushed as they are ready.
+    Frame protocol: see ws_channel.py.
+    """
+    await serve_channel(websocket)
+
+
 # ─── Listener Agent (optional) ───────────────────────────────────────────────
 
 @app.post("/agent/listen", response_model=ListenResponse, tags=["Listener"])
 async def listen(request: ListenRequest):
     """Extract structured intent and slots from raw text."""
     return extract_intent(request)
+
+
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-seq")
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    Streams results while the request body is still being read.
+
+    StreamingResponse watches for disconnects by consuming `receive()`, which
+    would swallow the rest of an NDJSON upload; here a disconnect surfaces as
+    ClientDisconnect from `request.stream()` instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@app.post("/agent/listen/batch", tags=["Listener"])
+async def listen_batch(request: Request):
+    """
+    Bulk intent extraction for SMS / IVR transcript bursts.
+
+    Body: a JSON list of ListenRequest objects, an NDJSON stream of them
+    (`Content-Type: application/x-ndjson`), or msgpack
+    (`Content-Type: application/msgpack`: request maps and/or arrays of
+    them, back to back), processed as it arrives.
+    Returns NDJSON — one ListenResponse per input, in input order; an
+    invalid input yields `{"error": ...}` on its line. With
+    `Accept: application/msgpack` the results are msgpack maps back to back.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if is_msgpack(content_type):
+        chunks = msgpack_chunks(request.stream())
+    elif content_type in NDJSON_TYPES:
+        chunks = ndjson_chunks(request.stream())
+    else:
+        try:
+            items = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(
+                status_code=400,
+                detail="Expected a JSON list of listen requests (or send NDJSON).",
+            )
+        chunks = chunked(items)
+    if accepts_msgpack(request.headers.get("accept")):
+        return DuplexStreamingResponse(stream_results(chunks, as_msgpack=True), media_type=MSGPACK)
+    return DuplexStreamingResponse(stream_results(chunks), media_type="application/x-ndjson")
+
+
+# ─── Orchestrator ────────────────────────────────────────────────────────────
+
+@app.post("/agent/orchestrate", response_model=OrchestrateResponse, tags=["Orchestrator"])
+async def orchestrate(request: OrchestrateRequest):
+    """
+    Run the Listener → Market Analyst → Negotiator pipeline for an action.
+
+    Independent stages run concurrently; `pipelineTrace` gives each stage's
+    start/end offset (ms from pipeline start), so overlap is visible.
+    Stages that time out or fail are reported there, and their dependents
+    are skipped.
+    """
+    result = await run_pipeline(request)
+    if result.finalDecision:
+        _record_decision(result.finalDecision)
+    return result
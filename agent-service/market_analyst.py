@@ -4,13 +4,11 @@ Analyzes real Agmarknet mandi prices for a crop and computes
 a recommended reserve price based on perishability and quantity.
 """
 
-from schemas import (
-    MarketAnalysisRequest,
-    MarketAnalysisResponse,
-    MarketAnalysisDetail,
-    MandiPrice,
-)
+from schemas import MarketAnalysisRequest, MarketAnalysisResponse
 from market_data import load_mandi_prices, get_crop_info, get_overall_stats
+from price_batch import PriceBatch
+from records import MarketAnalysis, MarketQuery
+from tracing import traced
 
 
 # ─── Perishability discount factors ──────────────────────────────────────────
@@ -29,19 +27,21 @@ def _quantity_factor(quantity_kg: float) -> float:
     return 1.0
 
 
-def analyze_market_full(request: MarketAnalysisRequest) -> MarketAnalysisDetail:
+@traced()
+def analyze_market_full(request: MarketQuery) -> MarketAnalysis:
     """
     Full internal analysis — used by other agents (negotiation, chat).
-    Returns detailed breakdown with all mandi prices and reasoning.
+    Returns detailed breakdown with all mandi prices and reasoning
+    (`.to_detail()` for the API model).
     """
     crop = request.crop
     crop_info = get_crop_info(crop)
 
     if crop_info is None:
-        return MarketAnalysisDetail(
+        return MarketAnalysis(
             crop=crop,
             totalMarkets=0,
-            mandiPrices=[],
+            mandiPrices=PriceBatch(),
             avgPricePerKg=0,
             minPricePerKg=0,
             maxPricePerKg=0,
@@ -54,19 +54,6 @@ def analyze_market_full(request: MarketAnalysisRequest) -> MarketAnalysisDetail:
     raw_prices = load_mandi_prices(crop)
     stats = get_overall_stats(crop)
 
-    mandi_list = [
-        MandiPrice(
-            district=p["district"],
-            market=p["market"],
-            minPricePerKg=p["minPricePerKg"],
-            maxPricePerKg=p["maxPricePerKg"],
-            modalPricePerKg=p["modalPricePerKg"],
-            arrivalTonnes=p["arrivalTonnes"],
-            date=p["date"],
-        )
-        for p in raw_prices
-    ]
-
     perishability = crop_info["perishability"]
     shelf_life = crop_info["shelfLifeDays"]
     avg_price = stats["avgPrice"]
@@ -84,10 +71,10 @@ def analyze_market_full(request: MarketAnalysisRequest) -> MarketAnalysisDetail:
         f"Recommended reserve price: ₹{reserve_price}/kg.",
     ]
 
-    return MarketAnalysisDetail(
+    return MarketAnalysis(
         crop=crop,
         totalMarkets=stats["totalMarkets"],
-        mandiPrices=mandi_list,
+        mandiPrices=raw_prices,
         avgPricePerKg=avg_price,
         minPricePerKg=stats["minPrice"],
         maxPricePerKg=stats["maxPrice"],
@@ -103,7 +90,12 @@ def analyze_market(request: MarketAnalysisRequest) -> MarketAnalysisResponse:
     Public API response — returns only the recommended reserve price.
     Backend stores this in Mongo and sends to farmer frontend.
     """
-    detail = analyze_market_full(request)
+    detail = analyze_market_full(MarketQuery(request.crop, request.quantity, request.farmerDistrict))
     return MarketAnalysisResponse(
         recommendedReservePrice=detail.recommendedReservePrice,
     )
+
+
+def analyze_market_wire(request: MarketAnalysisRequest) -> dict:
+    """analyze_market's response body as a JSON-ready dict, for WireResponse."""
+    return analyze_market_full(MarketQuery(request.crop, request.quantity, request.farmerDistrict)).to_wire()
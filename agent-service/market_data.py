@@ -4,9 +4,13 @@ Parses the downloaded daily price CSV and provides lookup functions.
 """
 
 import csv
+import hashlib
 import os
+import threading
 from pathlib import Path
 
+from price_batch import PriceBatch
+
 # ─── Crop metadata (static) ──────────────────────────────────────────────────
 
 CROP_INFO = {
@@ -44,6 +48,10 @@ CSV_FILES = {
     "Tomato": CSV_DIR / "Tomato_price.csv",
 }
 
+# crop → {"mtimeNs", "rows", "loads"}; see load_mandi_prices
+_SNAPSHOTS: dict[str, dict] = {}
+_snapshot_lock = threading.Lock()
+
 
 def _parse_price(value: str) -> float:
     """Parse a price string like '3,500.00' → 3500.0"""
@@ -55,26 +63,87 @@ def _normalize_district(raw_district: str) -> str:
     return DISTRICT_ALIASES.get(raw_district.strip(), raw_district.strip())
 
 
-def load_mandi_prices(crop: str) -> list[dict]:
+def load_mandi_prices(crop: str) -> PriceBatch:
     """
-    Load mandi prices from the Agmarknet CSV for a given crop.
-
-    Returns a list of dicts, one per market row:
-        {
-            "district": "Palakkad",       # normalized
-            "market": "Pattambi APMC",
-            "minPricePerKg": 20.0,        # converted from Rs/Quintal
-            "maxPricePerKg": 24.0,
-            "modalPricePerKg": 22.0,
-            "arrivalTonnes": 0.80,
-            "date": "26-02-2026",
-        }
+    Mandi prices for a crop from its Agmarknet CSV (see _parse_mandi_csv).
+
+    The parsed batch is kept as a snapshot keyed on the file's mtime, so the
+    CSV is only re-read when it changes. The returned batch is shared —
+    callers must not modify it.
     """
     csv_path = CSV_FILES.get(crop)
-    if csv_path is None or not csv_path.exists():
-        return []
+    if csv_path is None:
+        return PriceBatch()
+    try:
+        mtime_ns = csv_path.stat().st_mtime_ns
+    except OSError:
+        return PriceBatch()
+
+    snapshot = _SNAPSHOTS.get(crop)
+    if snapshot is not None and snapshot["mtimeNs"] == mtime_ns:
+        return snapshot["rows"]
+
+    rows = _parse_mandi_csv(csv_path)
+    version = _file_version(csv_path)
+    with _snapshot_lock:
+        loads = _SNAPSHOTS[crop]["loads"] + 1 if crop in _SNAPSHOTS else 1
+        _SNAPSHOTS[crop] = {"mtimeNs": mtime_ns, "rows": rows, "loads": loads, "version": version}
+    return rows
+
+
+def _file_version(csv_path: Path) -> str:
+    """Short content hash, the same for every worker and host serving the same file."""
+    with open(csv_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def snapshot_is_current(crop: str) -> bool:
+    """True when load_mandi_prices(crop) would be served without parsing the CSV."""
+    snapshot = _SNAPSHOTS.get(crop)
+    if snapshot is None:
+        return CSV_FILES.get(crop) is None  # unknown crop: nothing to parse
+    try:
+        return snapshot["mtimeNs"] == CSV_FILES[crop].stat().st_mtime_ns
+    except OSError:
+        return True
+
+
+def snapshot_version(crop: str) -> str | None:
+    """Content hash of the crop's loaded snapshot; None when not loaded or stale."""
+    snapshot = _SNAPSHOTS.get(crop)
+    if snapshot is None or not snapshot_is_current(crop):
+        return None
+    return snapshot["version"]
+
+
+def snapshot_info() -> dict[str, dict]:
+    """crop → {rows, mtime (unix s), loads, version} for the loaded price snapshots."""
+    return {
+        crop: {"rows": len(s["rows"]), "mtime": s["mtimeNs"] / 1e9, "loads": s["loads"], "version": s["version"]}
+        for crop, s in list(_SNAPSHOTS.items())
+    }
 
-    results = []
+
+def data_version() -> str | None:
+    """One hash over the loaded snapshots' versions; None before any is loaded."""
+    versions = sorted((crop, s["version"]) for crop, s in list(_SNAPSHOTS.items()))
+    if not versions:
+        return None
+    return hashlib.sha256(repr(versions).encode()).hexdigest()[:12]
+
+
+def _parse_mandi_csv(csv_path: Path) -> PriceBatch:
+    """
+    Parse an Agmarknet CSV into a PriceBatch, one row per market:
+        district         "Palakkad"        (normalized)
+        market           "Pattambi APMC"
+        minPricePerKg    20.0              (converted from Rs/Quintal)
+        maxPricePerKg    24.0
+        modalPricePerKg  22.0
+        arrivalTonnes    0.80
+        date             "26-02-2026"
+    """
+    results = PriceBatch()
 
     with open(csv_path, "r", encoding="utf-8-sig") as f:
         reader = csv.reader(f)
@@ -84,7 +153,7 @@ def load_mandi_prices(crop: str) -> list[dict]:
         header_row = next(reader, None)  # skip header row
 
         if header_row is None:
-            return []
+            return results
 
         for row in reader:
             # Skip empty rows
@@ -100,15 +169,15 @@ def load_mandi_prices(crop: str) -> list[dict]:
                 arrival_qty = float(row[11].strip()) if row[11].strip() else 0.0
                 arrival_date = row[13].strip()
 
-                results.append({
-                    "district": _normalize_district(district_raw),
-                    "market": market,
-                    "minPricePerKg": round(min_price_quintal / 100, 2),
-                    "maxPricePerKg": round(max_price_quintal / 100, 2),
-                    "modalPricePerKg": round(modal_price_quintal / 100, 2),
-                    "arrivalTonnes": arrival_qty,
-                    "date": arrival_date,
-                })
+                results.append(
+                    district=_normalize_district(district_raw),
+                    market=market,
+                    minPricePerKg=round(min_price_quintal / 100, 2),
+                    maxPricePerKg=round(max_price_quintal / 100, 2),
+                    modalPricePerKg=round(modal_price_quintal / 100, 2),
+                    arrivalTonnes=arrival_qty,
+                    date=arrival_date,
+                )
             except (ValueError, IndexError):
                 continue  # skip malformed rows
 
@@ -126,19 +195,19 @@ def get_district_avg_prices(crop: str) -> dict[str, float]:
     if not prices:
         return {}
 
-    district_data: dict[str, dict] = {}
-    for p in prices:
-        d = p["district"]
-        if d not in district_data:
-            district_data[d] = {"total_weighted": 0.0, "total_weight": 0.0}
-        weight = max(p["arrivalTonnes"], 0.01)  # min weight to avoid zero
-        district_data[d]["total_weighted"] += p["modalPricePerKg"] * weight
-        district_data[d]["total_weight"] += weight
+    # Accumulate per district code, then map codes back to names
+    names = prices.district.values
+    total_weighted = [0.0] * len(names)
+    total_weight = [0.0] * len(names)
+    for code, modal, arrival in zip(prices.district.codes, prices.modalPricePerKg, prices.arrivalTonnes):
+        weight = max(arrival, 0.01)  # min weight to avoid zero
+        total_weighted[code] += modal * weight
+        total_weight[code] += weight
 
     return {
-        d: round(data["total_weighted"] / data["total_weight"], 2)
-        for d, data in district_data.items()
-        if data["total_weight"] > 0
+        names[code]: round(total_weighted[code] / total_weight[code], 2)
+        for code in range(len(names))
+        if total_weight[code] > 0
     }
 
 
@@ -157,10 +226,9 @@ def get_overall_stats(crop: str) -> dict:
     if not prices:
         return {"avgPrice": 0, "minPrice": 0, "maxPrice": 0, "totalMarkets": 0}
 
-    modal_prices = [p["modalPricePerKg"] for p in prices]
     return {
-        "avgPrice": round(sum(modal_prices) / len(modal_prices), 2),
-        "minPrice": min(p["minPricePerKg"] for p in prices),
-        "maxPrice": max(p["maxPricePerKg"] for p in prices),
+        "avgPrice": round(sum(prices.modalPricePerKg) / len(prices), 2),
+        "minPrice": min(prices.minPricePerKg),
+        "maxPrice": max(prices.maxPricePerKg),
         "totalMarkets": len(prices),
     }
@@ -0,0 +1,356 @@
+"""
+In-process metrics in the Prometheus text format, served at /metrics.
+
+Counters and histograms keep one row per label tuple in a per-thread shard,
+so an observation takes no lock: a thread-local lookup, a dict lookup, a
+bisect over the bucket bounds and two additions (~0.2-0.4 µs; see
+`python metrics.py`). Shards are summed at scrape time. Gauges for state
+owned elsewhere (caches, price snapshots) are also computed at scrape time,
+so they cost nothing between scrapes.
+
+Labels are passed as a tuple in the order given at declaration:
+    HTTP_LATENCY.observe(0.012, ("POST", "/agent/chat", "200", "counter_offer"))
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+from admission import ADMISSION, LANES, OUTCOMES
+from cache import all_caches
+from executors import all_executors
+from market_data import snapshot_info
+from shared_cache import all_tiered
+
+# Seconds — sub-millisecond agents up to LLM calls near the Ollama timeout
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY: list = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Sharded:
+    """Per-thread {labels: row} dicts; only the owning thread writes to one."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._shards_lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _new_shard(self) -> dict:
+        shard: dict = {}
+        self._local.shard = shard
+        with self._shards_lock:
+            self._shards.append(shard)
+        return shard
+
+    def _merged(self, width: int) -> dict[tuple, list]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged: dict[tuple, list] = {}
+        for shard in shards:
+            for labels, row in list(shard.items()):
+                total = merged.setdefault(labels, [0] * width)
+                for i in range(width):
+                    total[i] += row[i]
+        return merged
+
+
+class Counter(_Sharded):
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        super().__init__()
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        row = shard.get(labels)
+        if row is None:
+            row = shard[labels] = [0]
+        row[0] += amount
+
+    def value(self, labels: tuple = ()) -> float:
+        return self._merged(1).get(labels, [0])[0]
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, (value,) in self._merged(1).items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_fmt(value)}"
+
+
+class Histogram(_Sharded):
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = tuple(sorted(buckets))
+        # row: [count per bucket (last is +Inf)..., sum]
+        self._width = len(self.buckets) + 2
+        super().__init__()
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        row = shard.get(labels)
+        if row is None:
+            row = shard[labels] = [0] * (self._width - 1) + [0.0]
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def time(self, labels: tuple = ()) -> "_Timer":
+        """Context manager observing the block's duration in seconds."""
+        return _Timer(self, labels)
+
+    def count(self, labels: tuple = ()) -> int:
+        row = self._merged(self._width).get(labels)
+        return int(sum(row[:-1])) if row else 0
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, row in self._merged(self._width).items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += n
+                le = f'le="{_fmt(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_fmt(row[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "t0")
+
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.t0, self.labels)
+
+
+class GaugeFunc:
+    """
+    Gauge (or counter, with kind="counter") whose samples are produced by
+    `fn` at scrape time as (label tuple, value) pairs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...],
+        fn: Callable[[], Iterable[tuple]],
+        kind: str = "gauge",
+    ):
+        self.name, self.help, self.labelnames, self.fn, self.kind = name, help, labelnames, fn, kind
+        REGISTRY.append(self)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in self.fn():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_fmt(value)}"
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+#  Metrics
+# ═════════════════════════════════════════════════════════════════════════════
+
+# ─── HTTP ─────────────────────────────────────────────────────────────────────
+HTTP_LATENCY = Histogram(
+    "agent_http_request_duration_seconds",
+    "Request latency by route, status code and decision (accepted / counter_offer / ... or '').",
+    ("method", "route", "code", "decision"),
+)
+
+# ─── LLM layer ────────────────────────────────────────────────────────────────
+LLM_FUNCTION_CALLS = Counter(
+    "agent_llm_function_calls_total",
+    "Calls to the LLM layer by function and how they were served "
+    "(fresh / cached / template for messages, local / llm / regex for extraction).",
+    ("function", "route"),
+)
+LLM_FUNCTION_LATENCY = Histogram(
+    "agent_llm_function_duration_seconds",
+    "End-to-end latency of generate_negotiation_message / extract_offer_from_text.",
+    ("function",),
+)
+LLM_FALLBACKS = Counter(
+    "agent_llm_fallbacks_total",
+    "Times a function fell back from Ollama, by reason (circuit_open / budget / error).",
+    ("function", "reason"),
+)
+OLLAMA_LATENCY = Histogram(
+    "agent_ollama_request_duration_seconds",
+    "Ollama /api/generate round trips by purpose and outcome (ok / error / budget_timeout).",
+    ("purpose", "outcome"),
+)
+
+# ─── Caches and price data ────────────────────────────────────────────────────
+
+
+def _cache_samples(field: str) -> Iterable[tuple]:
+    for cache in all_caches():
+        yield (cache.name,), cache.stats()[field]
+
+
+GaugeFunc("agent_cache_hits_total", "Cache hits.", ("cache",), lambda: _cache_samples("hits"), kind="counter")
+GaugeFunc("agent_cache_misses_total", "Cache misses.", ("cache",), lambda: _cache_samples("misses"), kind="counter")
+GaugeFunc("agent_cache_hit_ratio", "Cache hits / lookups since start.", ("cache",), lambda: _cache_samples("hitRatio"))
+GaugeFunc("agent_cache_entries", "Entries currently cached.", ("cache",), lambda: _cache_samples("size"))
+
+
+def _shared_cache_samples(field: str) -> Iterable[tuple]:
+    for cache in all_tiered():
+        yield (cache.name,), cache.stats()[field]
+
+
+GaugeFunc("agent_shared_cache_hits_total", "Shared-tier (L2) hits after an in-process miss.", ("cache",), lambda: _shared_cache_samples("l2Hits"), kind="counter")
+GaugeFunc("agent_shared_cache_misses_total", "Shared-tier (L2) misses.", ("cache",), lambda: _shared_cache_samples("l2Misses"), kind="counter")
+GaugeFunc("agent_shared_cache_errors_total", "Failed shared-tier (L2) calls.", ("cache",), lambda: _shared_cache_samples("l2Errors"), kind="counter")
+
+GaugeFunc(
+    "agent_price_snapshot_age_seconds",
+    "Seconds since the crop's Agmarknet CSV was last modified.",
+    ("crop",),
+    lambda: (((crop,), round(time.time() - s["mtime"], 3)) for crop, s in snapshot_info().items()),
+)
+GaugeFunc(
+    "agent_price_snapshot_rows",
+    "Market rows in the loaded price snapshot.",
+    ("crop",),
+    lambda: (((crop,), s["rows"]) for crop, s in snapshot_info().items()),
+)
+GaugeFunc(
+    "agent_price_snapshot_loads_total",
+    "Times the crop's CSV was (re)parsed.",
+    ("crop",),
+    lambda: (((crop,), s["loads"]) for crop, s in snapshot_info().items()),
+    kind="counter",
+)
+
+# ─── Executors ────────────────────────────────────────────────────────────────
+
+
+def _executor_samples(field: str) -> Iterable[tuple]:
+    for executor in all_executors():
+        yield (executor.name,), executor.stats()[field]
+
+
+GaugeFunc("agent_executor_workers", "Executor pool size.", ("executor",), lambda: _executor_samples("workers"))
+GaugeFunc(
+    "agent_executor_inflight",
+    "Tasks submitted and not yet finished (running + queued).",
+    ("executor",),
+    lambda: _executor_samples("inflight"),
+)
+GaugeFunc(
+    "agent_executor_queued",
+    "Tasks waiting for a free worker; above 0 means the pool is saturated.",
+    ("executor",),
+    lambda: _executor_samples("queued"),
+)
+GaugeFunc(
+    "agent_executor_peak_inflight",
+    "Most tasks in flight at once since start.",
+    ("executor",),
+    lambda: _executor_samples("peakInflight"),
+)
+GaugeFunc(
+    "agent_executor_tasks_total",
+    "Tasks submitted.",
+    ("executor",),
+    lambda: _executor_samples("submitted"),
+    kind="counter",
+)
+
+# ─── Admission ────────────────────────────────────────────────────────────────
+
+GaugeFunc(
+    "agent_admission_total",
+    "Chat rounds by lane and admission outcome (admitted, queued, rate_limited, queue_full, queue_timeout).",
+    ("lane", "outcome"),
+    lambda: (((lane, outcome), ADMISSION.outcomes[(lane, outcome)]) for lane in LANES for outcome in OUTCOMES),
+    kind="counter",
+)
+GaugeFunc(
+    "agent_admission_inflight",
+    "Admitted chat rounds not yet answered, by lane.",
+    ("lane",),
+    lambda: (((lane,), ADMISSION.inflight[lane]) for lane in LANES),
+)
+GaugeFunc(
+    "agent_admission_queued",
+    "Chat-lane rounds waiting for a slot (CHAT_MAX_INFLIGHT reached).",
+    (),
+    lambda: [((), ADMISSION.queued)],
+)
+GaugeFunc(
+    "agent_admission_queue_wait_seconds_total",
+    "Time chat-lane rounds spent queued for a slot.",
+    (),
+    lambda: [((), ADMISSION.wait_seconds)],
+    kind="counter",
+)
+
+
+if __name__ == "__main__":
+    # Cost of one observation on this machine (loop overhead subtracted)
+    n = 200_000
+    labels = ("POST", "/agent/chat", "200", "accepted")
+    observe, inc = HTTP_LATENCY.observe, LLM_FUNCTION_CALLS.inc
+
+    t0 = time.perf_counter_ns()
+    for _ in range(n):
+        pass
+    loop_ns = time.perf_counter_ns() - t0
+
+    t0 = time.perf_counter_ns()
+    for _ in range(n):
+        observe(0.003, labels)
+    print(f"Histogram.observe {(time.perf_counter_ns() - t0 - loop_ns) / n:6.0f} ns")
+
+    t0 = time.perf_counter_ns()
+    for _ in range(n):
+        inc(labels)
+    print(f"Counter.inc       {(time.perf_counter_ns() - t0 - loop_ns) / n:6.0f} ns")
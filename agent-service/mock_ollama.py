@@ -0,0 +1,339 @@
+"""
+Mock Ollama server for benchmarks and load tests — no model, no GPU.
+
+Implements just enough of `/api/generate` and `/api/tags` for the agent
+service, with a simple cost model:
+    - model load time, paid again once `keep_alive` expires
+    - prompt processing time per character not already covered by `context`
+    - generation time per response: fixed, exponential or lognormal around
+      `gen_ms` (the median for lognormal)
+    - a fraction of requests failing with HTTP 500 (`error_rate`) or
+      stalling for an extra `stall_ms` (`stall_rate`), e.g. past the
+      client's timeout
+
+`"stream": true` requests get NDJSON fragments spread over the generation
+time, then a final `done` object, as Ollama streams them.
+
+Run standalone:
+    python mock_ollama.py --port 11434 --load-ms 1500
+    python mock_ollama.py --gen-ms 400 --gen-dist lognormal --error-rate 0.02
+"""
+
+import argparse
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+DEFAULT_KEEP_ALIVE_S = 300.0   # Ollama's own default is 5 minutes
+CHARS_PER_TOKEN = 4
+GEN_DISTRIBUTIONS = ("fixed", "exp", "lognormal")
+
+
+class MockFailure(Exception):
+    """An injected failure, answered with HTTP 500 like a crashed runner."""
+
+
+def _parse_keep_alive(value) -> float:
+    """Ollama duration ("30m", "1h", "90s", -1, 0) → seconds; inf for negative."""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE_S
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    match = re.fullmatch(r"\s*(-?\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*", str(value))
+    if not match:
+        return DEFAULT_KEEP_ALIVE_S
+    amount = float(match.group(1))
+    if amount < 0:
+        return float("inf")
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}[match.group(2)]
+    return amount * scale
+
+
+def _fake_tokens(text: str) -> list[int]:
+    return [hash(text[i:i + CHARS_PER_TOKEN]) & 0xFFFF for i in range(0, len(text), CHARS_PER_TOKEN)]
+
+
+def _reply_for(prompt: str) -> str:
+    """Plausible canned output for the two prompts the agent service sends."""
+    if prompt.startswith("Buyer message:"):
+        price = re.search(r"(\d+(?:\.\d+)?)", prompt)
+        lowered = prompt.lower()
+        if price:
+            intent = "new_offer"
+        elif any(w in lowered for w in ("accept", "deal", "ok")):
+            intent = "accept_counter"
+        elif any(w in lowered for w in ("pass", "no", "reject")):
+            intent = "reject"
+        else:
+            intent = "question"
+        return json.dumps({
+            "offerPricePerKg": float(price.group(1)) if price else None,
+            "quantity": None,
+            "buyerDistrict": None,
+            "intent": intent,
+        })
+    counter = re.search(r"Suggested counter price: ₹([\d.]+)", prompt)
+    if counter:
+        return (
+            f"Thank you for your offer. Considering delivery and current mandi rates, "
+            f"we can do ₹{counter.group(1)}/kg. Let us know if that works for you."
+        )
+    return "Thank you for your offer. We will get back to you shortly."
+
+
+class MockOllama:
+    """
+    Threaded mock Ollama server.
+
+    Use as a context manager; `url` is the base URL to point OLLAMA_URL at.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        load_ms: float = 0.0,
+        prompt_ms_per_char: float = 0.0,
+        gen_ms: float = 0.0,
+        gen_dist: str = "fixed",
+        gen_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        stall_rate: float = 0.0,
+        stall_ms: float = 0.0,
+        seed: int | None = None,
+    ):
+        if gen_dist not in GEN_DISTRIBUTIONS:
+            raise ValueError(f"gen_dist must be one of {', '.join(GEN_DISTRIBUTIONS)}")
+        self.load_ms = load_ms
+        self.prompt_ms_per_char = prompt_ms_per_char
+        self.gen_ms = gen_ms
+        self.gen_dist = gen_dist
+        self.gen_sigma = gen_sigma
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_ms = stall_ms
+
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._loaded_until = 0.0
+        self.stats = {
+            "requests": 0,
+            "loads": 0,
+            "promptCharsProcessed": 0,
+            "contextHits": 0,
+            "errors": 0,
+            "stalls": 0,
+        }
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockOllama":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def unload(self) -> None:
+        """Simulate the model being evicted after an idle period."""
+        with self._lock:
+            self._loaded_until = 0.0
+
+    # ── Request handling ──────────────────────────────────────────────────
+
+    def _draw(self) -> tuple[float, bool, bool]:
+        """Generation ms for this request, and whether it fails / stalls."""
+        with self._lock:
+            if self.gen_ms <= 0 or self.gen_dist == "fixed":
+                gen_ms = self.gen_ms
+            elif self.gen_dist == "exp":
+                gen_ms = self._rng.expovariate(1 / self.gen_ms)
+            else:
+                gen_ms = self._rng.lognormvariate(math.log(self.gen_ms), self.gen_sigma)
+            fail = self._rng.random() < self.error_rate
+            stall = not fail and self._rng.random() < self.stall_rate
+            if fail:
+                self.stats["errors"] += 1
+            if stall:
+                self.stats["stalls"] += 1
+        return gen_ms, fail, stall
+
+    def generate(self, body: dict) -> dict:
+        *fragments, final = self.generate_stream(body, paced=False)
+        final["response"] = "".join(f["response"] for f in fragments)
+        return final
+
+    def generate_stream(self, body: dict, paced: bool = True) -> Iterator[dict]:
+        """
+        The reply as Ollama streams it: word fragments, then a `done` object.
+        `paced` spreads the generation time over the fragments; otherwise it
+        is spent in one sleep before the first.
+        """
+        now = time.monotonic()
+        keep_alive = _parse_keep_alive(body.get("keep_alive"))
+        delay_ms = 0.0
+
+        with self._lock:
+            self.stats["requests"] += 1
+            if now >= self._loaded_until:
+                self.stats["loads"] += 1
+                delay_ms += self.load_ms
+            self._loaded_until = now + keep_alive
+
+        prompt = body.get("prompt", "")
+        system = body.get("system", "") or ""
+        context = body.get("context") or []
+
+        if not prompt:
+            # Load-only request, as used for warm-up
+            time.sleep(delay_ms / 1000)
+            yield {"model": body.get("model"), "response": "", "done": True, "done_reason": "load"}
+            return
+
+        processed = prompt if context else system + prompt
+        with self._lock:
+            self.stats["promptCharsProcessed"] += len(processed)
+            if context:
+                self.stats["contextHits"] += 1
+
+        load_ms = delay_ms
+        prompt_ms = len(processed) * self.prompt_ms_per_char
+        gen_ms, fail, stall = self._draw()
+        if fail:
+            time.sleep(load_ms / 1000)
+            raise MockFailure("injected failure")
+        time.sleep((load_ms + prompt_ms + (0 if paced else gen_ms) + (self.stall_ms if stall else 0)) / 1000)
+
+        reply = _reply_for(prompt)
+        words = re.findall(r"\S+\s*", reply) or [reply]
+        for word in words:
+            if paced:
+                time.sleep(gen_ms / len(words) / 1000)
+            yield {"model": body.get("model"), "response": word, "done": False}
+
+        # Ollama reports its own phase timings in nanoseconds
+        yield {
+            "model": body.get("model"),
+            "response": "",
+            "done": True,
+            "context": list(context) + _fake_tokens(processed + reply),
+            "prompt_eval_count": len(processed) // CHARS_PER_TOKEN,
+            "eval_count": len(reply) // CHARS_PER_TOKEN,
+            "load_duration": int(load_ms * 1e6),
+            "prompt_eval_duration": int(prompt_ms * 1e6),
+            "eval_duration": int(gen_ms * 1e6),
+            "total_duration": int((load_ms + prompt_ms + gen_ms) * 1e6),
+        }
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # for chunked streaming replies
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: dict) -> None:
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, chunks: Iterator[dict]) -> None:
+                try:
+                    first = next(chunks)
+                except MockFailure as e:
+                    self._send(500, {"error": str(e)})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for chunk in itertools.chain([first], chunks):
+                        line = json.dumps(chunk).encode() + b"\n"
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # client hung up mid-reply
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send(200, {"models": [{"name": "mock"}]})
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path == "/api/generate" and body.get("stream"):
+                    self._stream(mock.generate_stream(body))
+                elif self.path == "/api/generate":
+                    try:
+                        self._send(200, mock.generate(body))
+                    except MockFailure as e:
+                        self._send(500, {"error": str(e)})
+                else:
+                    self._send(404, {"error": "not found"})
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--load-ms", type=float, default=1500.0)
+    parser.add_argument("--prompt-ms-per-char", type=float, default=0.05)
+    parser.add_argument("--gen-ms", type=float, default=150.0)
+    parser.add_argument("--gen-dist", choices=GEN_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--gen-sigma", type=float, default=0.5, help="lognormal shape")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--stall-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockOllama(
+        host=args.host,
+        port=args.port,
+        load_ms=args.load_ms,
+        prompt_ms_per_char=args.prompt_ms_per_char,
+        gen_ms=args.gen_ms,
+        gen_dist=args.gen_dist,
+        gen_sigma=args.gen_sigma,
+        error_rate=args.error_rate,
+        stall_rate=args.stall_rate,
+        stall_ms=args.stall_ms,
+        seed=args.seed,
+    )
+    print(f"Mock Ollama listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
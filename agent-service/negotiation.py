@@ -4,13 +4,10 @@ Handles reserve price enforcement, counter-offer generation,
 and decision logic (accept / counter / reject).
 """
 
-from schemas import (
-    NegotiateRequest,
-    NegotiateResponse,
-    NegotiateCounterOffer,
-)
-from delivery_config import DELIVERY_AGENTS, PRICE_PER_KM
-from distance import haversine
+from schemas import NegotiateRequest, NegotiateResponse
+from distance import hub_distance
+from records import NegotiationDecision, NegotiationQuery
+from tracing import traced
 
 
 # ─── Constants ────────────────────────────────────────────────────────────────
@@ -18,12 +15,29 @@ COUNTER_THRESHOLD = 0.15       # offer within 15% of reserve → counter instead
 
 
 def negotiate(request: NegotiateRequest) -> NegotiateResponse:
+    """API entry point: a validated request in, the response model out."""
+    return decide(to_query(request)).to_response()
+
+
+def to_query(request: NegotiateRequest) -> NegotiationQuery:
+    return NegotiationQuery(
+        crop=request.crop,
+        quantity=request.quantity,
+        farmerDistrict=request.farmer.district,
+        buyerDistrict=request.buyer.district,
+        offerPricePerKg=request.offerPricePerKg,
+        reservePrice=request.reservePrice,
+    )
+
+
+@traced("negotiation.negotiate")
+def decide(request: NegotiationQuery) -> NegotiationDecision:
     """
     Run the negotiation decision engine.
 
     Logic:
         1. Look up farmer and buyer district hubs
-        2. Compute delivery cost via haversine distance
+        2. Compute delivery cost via the hub-to-hub distance
         3. Compute net profit
         4. If offer >= reserve AND profitable → ACCEPT
         5. If offer within 15% of reserve AND profitable → COUNTER-OFFER
@@ -31,17 +45,8 @@ def negotiate(request: NegotiateRequest) -> NegotiateResponse:
     """
     reserve = request.reservePrice
 
-    # Look up hubs — fallback to Ernakulam (central Kerala) for unknown districts
-    DEFAULT_HUB = DELIVERY_AGENTS["Ernakulam"]
-
-    farmer_hub = DELIVERY_AGENTS.get(request.farmer.district) or DEFAULT_HUB
-    buyer_hub = DELIVERY_AGENTS.get(request.buyer.district) or DEFAULT_HUB
-
-    # Compute distance and costs
-    dist_km = haversine(
-        farmer_hub["lat"], farmer_hub["lon"],
-        buyer_hub["lat"], buyer_hub["lon"],
-    )
+    # Hub-to-hub distance — unknown districts use Ernakulam (central Kerala)
+    dist_km = hub_distance(request.farmerDistrict, request.buyerDistrict)
     gross_revenue = round(request.offerPricePerKg * request.quantity, 2)
     # Delivery cost scales with quantity: ₹0.5 per kg per km (min ₹50 base)
     delivery_cost = round(max(50.0, dist_km * request.quantity * 0.5 / 100), 2)
@@ -53,12 +58,12 @@ def negotiate(request: NegotiateRequest) -> NegotiateResponse:
 
     if offer >= reserve and net_profit > 0:
         # ACCEPT
-        return NegotiateResponse(
+        return NegotiationDecision(
             status="accepted",
             ReservePrice=reserve,
             finalPrice=offer,
             reasoning=(
-                f"Accepted offer of ₹{offer}/kg from {request.buyer.district}. "
+                f"Accepted offer of ₹{offer}/kg from {request.buyerDistrict}. "
                 f"Meets reserve price of ₹{reserve}/kg. "
                 f"Net profit: ₹{net_profit:,.2f} after ₹{delivery_cost:,.2f} delivery "
                 f"({dist_km:.1f} km)."
@@ -71,10 +76,10 @@ def negotiate(request: NegotiateRequest) -> NegotiateResponse:
     if price_gap <= COUNTER_THRESHOLD and net_profit > 0:
         # COUNTER-OFFER — midpoint between offer and reserve
         counter_price = round((offer + reserve) / 2, 2)
-        return NegotiateResponse(
+        return NegotiationDecision(
             status="counter_offer",
             ReservePrice=reserve,
-            counterOffer=NegotiateCounterOffer(counterPrice=counter_price),
+            counterPrice=counter_price,
             reasoning=(
                 f"Offer of ₹{offer}/kg is {price_gap:.0%} below reserve ₹{reserve}/kg. "
                 f"Counter-offer at ₹{counter_price}/kg (midpoint). "
@@ -84,11 +89,11 @@ def negotiate(request: NegotiateRequest) -> NegotiateResponse:
         )
 
     # REJECT
-    return NegotiateResponse(
+    return NegotiationDecision(
         status="rejected",
         ReservePrice=reserve,
         reasoning=(
-            f"Rejected offer of ₹{offer}/kg from {request.buyer.district}. "
+            f"Rejected offer of ₹{offer}/kg from {request.buyerDistrict}. "
             f"Reserve: ₹{reserve}/kg (gap: {price_gap:.0%}). "
             f"Net profit: ₹{net_profit:,.2f} after ₹{delivery_cost:,.2f} delivery."
         ),
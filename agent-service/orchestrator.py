@@ -2,228 +2,244 @@
 Orchestrator — the agentic brain.
 Chains Listener → Market Analyst → Negotiator agents into a
 goal-driven pipeline based on the requested action.
+
+The pipeline is a DAG (dag.py): stages start as soon as their inputs are
+ready, so the delivery comparison of offers runs alongside the Market
+Analyst. Every stage has a timeout; the whole pipeline has a deadline.
 """
 
-import time
+import os
+
 from schemas import (
     OrchestrateRequest,
     OrchestrateResponse,
     PipelineStep,
     ListenRequest,
-    MarketAnalysisRequest,
+    ListenResponse,
     EvaluateRequest,
-    NegotiationRequest,
+    BuyerComparison,
     Farmer,
     MarketContext,
-    Offer,
 )
+from dag import Stage, StageSkipped, run_dag, SUCCESS, SKIPPED
+from delivery_config import DELIVERY_AGENTS
 from listener import extract_intent
-from market_analyst import analyze_market
-from evaluator import evaluate_offers
-from negotiation import negotiate
+from market_analyst import analyze_market_full
+from evaluator import compare_offers, apply_reserve, select_best
+from negotiation import decide
+from records import MarketAnalysis, MarketQuery, NegotiationQuery
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+ORCHESTRATE_STAGE_TIMEOUT_MS = float(os.environ.get("ORCHESTRATE_STAGE_TIMEOUT_MS", "5000"))
+ORCHESTRATE_DEADLINE_MS = float(os.environ.get("ORCHESTRATE_DEADLINE_MS", "15000"))
+
+
+# ─── Input resolution ────────────────────────────────────────────────────────
+
+class _Inputs:
+    """Listing fields — from structured input, filled in by the Listener."""
+
+    def __init__(self, request: OrchestrateRequest, listener_result: ListenResponse | None):
+        self.crop = request.crop
+        self.quantity = request.quantity
+        self.farmer = request.farmer
+        if listener_result is None:
+            return
+
+        # Use extracted slots to fill missing fields
+        slots = listener_result.extractedSlots
+        if slots.crop and self.crop is None:
+            self.crop = slots.crop
+        if slots.quantity and self.quantity is None:
+            self.quantity = slots.quantity
+        if slots.district and self.farmer is None:
+            # Use the district's delivery hub as the farmer location
+            hub = DELIVERY_AGENTS.get(slots.district, {})
+            self.farmer = Farmer(
+                district=slots.district,
+                lat=hub.get("lat", 0),
+                lon=hub.get("lon", 0),
+            )
 
+    def require_offer_inputs(self) -> None:
+        missing = [
+            name for name, value in
+            (("crop", self.crop), ("quantity", self.quantity), ("farmer", self.farmer))
+            if not value
+        ]
+        if missing:
+            raise StageSkipped(f"Missing {', '.join(missing)}")
 
-def run_pipeline(request: OrchestrateRequest) -> OrchestrateResponse:
+
+# ─── Stages ──────────────────────────────────────────────────────────────────
+
+def _build_stages(request: OrchestrateRequest) -> list[Stage]:
     """
-    Run the appropriate agent pipeline based on the action.
+    Stage graph for the action:
 
-    Actions:
-        full_evaluation  → Listener → Market Analyst → Negotiator
-        evaluate_offers  → Market Analyst → Negotiator (structured input)
-        analyze_only     → Market Analyst only
-        negotiate        → Market Analyst → Negotiator (with reserve enforcement)
+        listener ──┬──> market_analyst ──┐
+                   └──> delivery ────────┴──> negotiator
+
+    The listener only runs for full_evaluation with rawText; delivery and
+    negotiator only when there are offers to decide on.
     """
     action = request.action
-    trace: list[PipelineStep] = []
-    pipeline: list[str] = []
-
-    listener_result = None
-    market_result = None
-    eval_result = None
-    negotiation_result = None
-    final_decision = ""
-    reasoning_parts = []
-
-    # Resolve fields — either from structured input or from listener extraction
-    crop = request.crop
-    quantity = request.quantity
-    farmer = request.farmer
-    offers = request.offers
-    listing_id = request.listingId
+    stages: list[Stage] = []
+    upstream: tuple[str, ...] = ()
 
-    # ══════════════════════════════════════════════════════════════════════
-    #  STEP 1: LISTENER (only for full_evaluation with rawText)
-    # ══════════════════════════════════════════════════════════════════════
     if action == "full_evaluation" and request.rawText:
-        pipeline.append("listener")
-        t0 = time.time()
-
-        try:
-            listen_req = ListenRequest(rawText=request.rawText)
-            listener_result = extract_intent(listen_req)
-
-            # Use extracted slots to fill missing fields
-            slots = listener_result.extractedSlots
-            if slots.crop and crop is None:
-                crop = slots.crop
-            if slots.quantity and quantity is None:
-                quantity = slots.quantity
-            if slots.district and farmer is None:
-                # Use a default lat/lon for the district (from delivery_config)
-                from delivery_config import DELIVERY_AGENTS
-                hub = DELIVERY_AGENTS.get(slots.district, {})
-                farmer = Farmer(
-                    district=slots.district,
-                    lat=hub.get("lat", 0),
-                    lon=hub.get("lon", 0),
-                )
-
-            elapsed = round((time.time() - t0) * 1000, 1)
-            trace.append(PipelineStep(
-                agent="listener",
-                status="success",
-                durationMs=elapsed,
-                message=f"Intent: {listener_result.intent}, confidence: {listener_result.confidence}",
+        stages.append(Stage(
+            "listener",
+            lambda _: extract_intent(ListenRequest(rawText=request.rawText)),
+        ))
+        upstream = ("listener",)
+
+    def inputs(results: dict) -> _Inputs:
+        return _Inputs(request, results.get("listener"))
+
+    def market(results: dict) -> MarketAnalysis:
+        fields = inputs(results)
+        if not fields.crop:
+            raise StageSkipped("Missing crop")
+        return analyze_market_full(MarketQuery(
+            crop=fields.crop,
+            quantity=fields.quantity or 100,
+            farmerDistrict=fields.farmer.district if fields.farmer else "Unknown",
+        ))
+
+    stages.append(Stage("market_analyst", market, deps=upstream))
+
+    if action == "analyze_only" or not request.offers:
+        return stages
+
+    def delivery(results: dict) -> list[BuyerComparison]:
+        fields = inputs(results)
+        fields.require_offer_inputs()
+        return compare_offers(EvaluateRequest(
+            listingId=request.listingId,
+            crop=fields.crop,
+            quantity=fields.quantity,
+            farmer=fields.farmer,
+            offers=request.offers,
+        ))
+
+    stages.append(Stage("delivery", delivery, deps=upstream))
+
+    def negotiator(results: dict):
+        fields = inputs(results)
+        market_result: MarketAnalysis = results["market_analyst"]
+        reserve = market_result.recommendedReservePrice
+        comparisons: list[BuyerComparison] = results["delivery"]
+
+        if action == "negotiate":
+            if reserve <= 0:
+                raise ValueError(f"No reserve price for crop '{fields.crop}'")
+            # Negotiate the offer that nets the farmer the most
+            best = max(comparisons, key=lambda c: (c.netProfit, -c.distanceKm, c.offerPricePerKg))
+            return decide(NegotiationQuery(
+                crop=fields.crop,
+                quantity=fields.quantity,
+                farmerDistrict=fields.farmer.district,
+                buyerDistrict=best.buyerDistrict,
+                offerPricePerKg=best.offerPricePerKg,
+                reservePrice=reserve,
             ))
-            reasoning_parts.append(f"Listener: {listener_result.reasoning}")
 
-        except Exception as e:
-            elapsed = round((time.time() - t0) * 1000, 1)
-            trace.append(PipelineStep(
-                agent="listener", status="error", durationMs=elapsed, message=str(e)
-            ))
-            final_decision = "error"
-
-    # ══════════════════════════════════════════════════════════════════════
-    #  STEP 2: MARKET ANALYST
-    # ══════════════════════════════════════════════════════════════════════
-    if action in ("full_evaluation", "evaluate_offers", "analyze_only", "negotiate") and crop:
-        pipeline.append("market_analyst")
-        t0 = time.time()
-
-        try:
-            market_req = MarketAnalysisRequest(
-                crop=crop,
-                quantity=quantity or 100,
-                farmerDistrict=farmer.district if farmer else "Unknown",
-            )
-            market_result = analyze_market(market_req)
-
-            elapsed = round((time.time() - t0) * 1000, 1)
-            trace.append(PipelineStep(
-                agent="market_analyst",
-                status="success",
-                durationMs=elapsed,
-                message=f"Reserve: ₹{market_result.recommendedReservePrice}/kg from {market_result.totalMarkets} markets",
-            ))
-            reasoning_parts.append(f"Market Analyst: {market_result.reasoning}")
+        eval_req = EvaluateRequest(
+            listingId=request.listingId,
+            crop=fields.crop,
+            quantity=fields.quantity,
+            farmer=fields.farmer,
+            marketContext=MarketContext(averageMandiPrice=market_result.avgPricePerKg),
+            offers=request.offers,
+            reservePrice=reserve or None,
+        )
+        return select_best(eval_req, apply_reserve(comparisons, eval_req.reservePrice))
 
-        except Exception as e:
-            elapsed = round((time.time() - t0) * 1000, 1)
-            trace.append(PipelineStep(
-                agent="market_analyst", status="error", durationMs=elapsed, message=str(e)
-            ))
+    stages.append(Stage("negotiator", negotiator, deps=upstream + ("market_analyst", "delivery")))
+    return stages
 
-    if action == "analyze_only":
-        final_decision = "analyzed"
-        return OrchestrateResponse(
-            listingId=listing_id,
-            action=action,
-            pipeline=pipeline,
-            pipelineTrace=trace,
-            listenerResult=listener_result,
-            marketAnalysis=market_result,
-            finalDecision=final_decision,
-            reasoning=" | ".join(reasoning_parts),
-        )
 
-    # ══════════════════════════════════════════════════════════════════════
-    #  STEP 3: NEGOTIATOR / EVALUATOR
-    # ══════════════════════════════════════════════════════════════════════
-    if action in ("full_evaluation", "evaluate_offers") and offers and farmer and crop and quantity:
-        pipeline.append("negotiator")
-        t0 = time.time()
-
-        try:
-            reserve = market_result.recommendedReservePrice if market_result else None
-            avg_price = market_result.avgPricePerKg if market_result else 0
-
-            eval_req = EvaluateRequest(
-                listingId=listing_id,
-                crop=crop,
-                quantity=quantity,
-                farmer=farmer,
-                marketContext=MarketContext(averageMandiPrice=avg_price),
-                offers=offers,
-                reservePrice=reserve,
-            )
-            eval_result = evaluate_offers(eval_req)
-            final_decision = eval_result.status
-
-            elapsed = round((time.time() - t0) * 1000, 1)
-            trace.append(PipelineStep(
-                agent="negotiator",
-                status="success",
-                durationMs=elapsed,
-                message=f"Decision: {eval_result.status}",
-            ))
-            reasoning_parts.append(f"Negotiator: {eval_result.reasoning}")
+def _step_message(name: str, value) -> str:
+    if name == "listener":
+        return f"Intent: {value.intent}, confidence: {value.confidence}"
+    if name == "market_analyst":
+        return f"Reserve: ₹{value.recommendedReservePrice}/kg from {value.totalMarkets} markets"
+    if name == "delivery":
+        return f"Compared {len(value)} offer(s) after delivery costs"
+    return f"Decision: {value.status}"
 
-        except Exception as e:
-            elapsed = round((time.time() - t0) * 1000, 1)
-            trace.append(PipelineStep(
-                agent="negotiator", status="error", durationMs=elapsed, message=str(e)
-            ))
-            final_decision = "error"
-
-    elif action == "negotiate" and offers and farmer and crop and quantity:
-        pipeline.append("negotiator")
-        t0 = time.time()
-
-        try:
-            reserve = market_result.recommendedReservePrice if market_result else 0
-            avg_price = market_result.avgPricePerKg if market_result else 0
-
-            neg_req = NegotiationRequest(
-                listingId=listing_id,
-                crop=crop,
-                quantity=quantity,
-                farmer=farmer,
-                marketContext=MarketContext(averageMandiPrice=avg_price),
-                offers=offers,
-                reservePrice=reserve,
-                roundNumber=request.roundNumber,
-            )
-            negotiation_result = negotiate(neg_req)
-            final_decision = negotiation_result.status
-
-            elapsed = round((time.time() - t0) * 1000, 1)
-            trace.append(PipelineStep(
-                agent="negotiator",
-                status="success",
-                durationMs=elapsed,
-                message=f"Decision: {negotiation_result.status}",
-            ))
-            reasoning_parts.append(f"Negotiator: {negotiation_result.reasoning}")
 
-        except Exception as e:
-            elapsed = round((time.time() - t0) * 1000, 1)
-            trace.append(PipelineStep(
-                agent="negotiator", status="error", durationMs=elapsed, message=str(e)
-            ))
-            final_decision = "error"
+# ─── Pipeline ────────────────────────────────────────────────────────────────
 
-    if not final_decision:
+async def run_pipeline(request: OrchestrateRequest) -> OrchestrateResponse:
+    """
+    Run the appropriate agent pipeline based on the action.
+
+    Actions:
+        full_evaluation  → Listener → Market Analyst ∥ Delivery → Negotiator
+        evaluate_offers  → Market Analyst ∥ Delivery → Negotiator (structured input)
+        analyze_only     → Market Analyst only
+        negotiate        → Market Analyst ∥ Delivery → Negotiator (best offer, with reserve enforcement)
+    """
+    action = request.action
+    outcomes = await run_dag(
+        _build_stages(request),
+        default_timeout_s=ORCHESTRATE_STAGE_TIMEOUT_MS / 1000,
+        deadline_s=ORCHESTRATE_DEADLINE_MS / 1000,
+    )
+
+    trace = [
+        PipelineStep(
+            agent=o.name,
+            status=o.status,
+            durationMs=o.duration_ms,
+            startMs=o.start_ms,
+            endMs=o.end_ms,
+            dependsOn=list(o.deps),
+            message=_step_message(o.name, o.value) if o.status == SUCCESS else o.error,
+        )
+        for o in outcomes.values()
+    ]
+    ran = sorted((o for o in outcomes.values() if o.start_ms is not None), key=lambda o: o.start_ms)
+
+    def value(name: str):
+        outcome = outcomes.get(name)
+        return outcome.value if outcome is not None and outcome.status == SUCCESS else None
+
+    listener_result = value("listener")
+    market_result = value("market_analyst")
+    decision = value("negotiator")
+    eval_result = decision if action in ("full_evaluation", "evaluate_offers") else None
+    negotiation_result = decision.to_response() if decision and action == "negotiate" else None
+
+    reasoning_parts = []
+    if listener_result:
+        reasoning_parts.append(f"Listener: {listener_result.reasoning}")
+    if market_result:
+        reasoning_parts.append(f"Market Analyst: {market_result.reasoning}")
+    if decision:
+        reasoning_parts.append(f"Negotiator: {decision.reasoning}")
+
+    failed = [o for o in outcomes.values() if o.status not in (SUCCESS, SKIPPED)]
+    if action == "analyze_only" and market_result:
+        final_decision = "analyzed"
+    elif decision:
+        final_decision = decision.status
+    elif failed:
+        final_decision = "error"
+    else:
         final_decision = "incomplete"
         reasoning_parts.append("Pipeline incomplete — missing required fields (crop, quantity, farmer, or offers).")
 
     return OrchestrateResponse(
-        listingId=listing_id,
+        listingId=request.listingId,
         action=action,
-        pipeline=pipeline,
+        pipeline=[o.name for o in ran],
         pipelineTrace=trace,
+        totalMs=max((o.end_ms for o in ran if o.end_ms is not None), default=0.0),
         listenerResult=listener_result,
-        marketAnalysis=market_result,
+        marketAnalysis=market_result.to_detail() if market_result else None,
         evaluation=eval_result,
         negotiation=negotiation_result,
         finalDecision=final_decision,
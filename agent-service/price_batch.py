@@ -0,0 +1,123 @@
+"""
+Compact in-memory mandi price rows.
+
+A crop's price snapshot is held as a column batch rather than a list of
+dicts: each price column is a float64 array, and district / market / date
+are dictionary-encoded (each distinct string stored once, one uint32 code
+per row). A row costs ~47 bytes, against ~570 for a 7-key dict with its
+own strings and ~1.4 KB as a MandiPrice model; see bench_price_memory.py.
+
+Aggregations read the columns directly; `MandiRow`s are only materialized
+when individual rows are needed (e.g. for the API's mandiPrices list).
+"""
+
+from array import array
+from typing import Iterator
+
+
+class MandiRow:
+    __slots__ = (
+        "district", "market", "minPricePerKg", "maxPricePerKg",
+        "modalPricePerKg", "arrivalTonnes", "date",
+    )
+
+    def __init__(
+        self,
+        district: str,
+        market: str,
+        minPricePerKg: float,
+        maxPricePerKg: float,
+        modalPricePerKg: float,
+        arrivalTonnes: float,
+        date: str,
+    ):
+        self.district = district
+        self.market = market
+        self.minPricePerKg = minPricePerKg
+        self.maxPricePerKg = maxPricePerKg
+        self.modalPricePerKg = modalPricePerKg
+        self.arrivalTonnes = arrivalTonnes
+        self.date = date
+
+
+class Labels:
+    """A dictionary-encoded string column: distinct `values` and a code per row."""
+
+    __slots__ = ("values", "codes", "_index")
+
+    def __init__(self):
+        self.values: list[str] = []
+        self.codes = array("I")
+        self._index: dict[str, int] = {}
+
+    def append(self, value: str) -> None:
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, i: int) -> str:
+        return self.values[self.codes[i]]
+
+
+class PriceBatch:
+    """
+    Mandi rows for one crop, column by column. Append while parsing, then
+    treat as read-only — load_mandi_prices shares one batch between callers.
+    """
+
+    __slots__ = (
+        "district", "market", "date",
+        "minPricePerKg", "maxPricePerKg", "modalPricePerKg", "arrivalTonnes",
+    )
+
+    def __init__(self):
+        self.district = Labels()
+        self.market = Labels()
+        self.date = Labels()
+        self.minPricePerKg = array("d")
+        self.maxPricePerKg = array("d")
+        self.modalPricePerKg = array("d")
+        self.arrivalTonnes = array("d")
+
+    def append(
+        self,
+        district: str,
+        market: str,
+        minPricePerKg: float,
+        maxPricePerKg: float,
+        modalPricePerKg: float,
+        arrivalTonnes: float,
+        date: str,
+    ) -> None:
+        self.district.append(district)
+        self.market.append(market)
+        self.minPricePerKg.append(minPricePerKg)
+        self.maxPricePerKg.append(maxPricePerKg)
+        self.modalPricePerKg.append(modalPricePerKg)
+        self.arrivalTonnes.append(arrivalTonnes)
+        self.date.append(date)
+
+    def __len__(self) -> int:
+        return len(self.modalPricePerKg)
+
+    def __getitem__(self, i: int) -> MandiRow:
+        return MandiRow(
+            self.district[i],
+            self.market[i],
+            self.minPricePerKg[i],
+            self.maxPricePerKg[i],
+            self.modalPricePerKg[i],
+            self.arrivalTonnes[i],
+            self.date[i],
+        )
+
+    def __iter__(self) -> Iterator[MandiRow]:
+        districts, markets, dates = self.district.values, self.market.values, self.date.values
+        for d, m, lo, hi, modal, arrival, dt in zip(
+            self.district.codes, self.market.codes,
+            self.minPricePerKg, self.maxPricePerKg, self.modalPricePerKg, self.arrivalTonnes,
+            self.date.codes,
+        ):
+            yield MandiRow(districts[d], markets[m], lo, hi, modal, arrival, dates[dt])
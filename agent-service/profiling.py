@@ -0,0 +1,179 @@
+"""
+Opt-in per-request profiling: a sampling CPU profile plus a tracemalloc
+allocation snapshot, written to PROFILE_DIR as flamegraph-ready files.
+
+A request is profiled when it carries `X-Profile: 1` (unless
+PROFILE_ALLOW_HEADER=0) or is picked by PROFILE_SAMPLE_RATE. Otherwise the
+cost is one header lookup and, with a non-zero rate, one random() call.
+
+Files per profiled request (<stamp>-<requestId>.*):
+    cpu.folded    stack samples, one "thread;outer;...;inner count" per line
+    alloc.folded  bytes still allocated at the end, by allocating stack
+    alloc.txt     peak traced memory and the top allocating lines
+
+The .folded files load into speedscope or flamegraph.pl as they are.
+
+The sampler reads every thread's stack (the event loop, the to_thread pool
+and the chat stage pool all do request work), skipping threads parked in an
+idle wait. tracemalloc is process-wide, so only one request is profiled at
+a time; others arriving meanwhile run unprofiled. Stacks from concurrent
+unprofiled requests can still show up in the CPU samples.
+"""
+
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_ALLOW_HEADER = os.environ.get("PROFILE_ALLOW_HEADER", "1") == "1"
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "1"))
+PROFILE_TRACEMALLOC_FRAMES = int(os.environ.get("PROFILE_TRACEMALLOC_FRAMES", "25"))
+
+PROFILE_HEADER = "X-Profile"
+
+# Leaf frames of threads waiting for work rather than doing it
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),  # concurrent.futures worker blocked on its queue
+}
+
+_active = threading.Lock()
+_SAFE_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def should_profile(header_value: str | None) -> bool:
+    if header_value is not None and PROFILE_ALLOW_HEADER:
+        return header_value.strip().lower() in ("1", "true", "yes", "on")
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+# ─── CPU sampler ──────────────────────────────────────────────────────────────
+
+class _Sampler(threading.Thread):
+    """Folds every other thread's Python stack every `interval_s` seconds."""
+
+    def __init__(self, interval_s: float):
+        super().__init__(name="profiler", daemon=True)
+        self.interval_s = interval_s
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._done = threading.Event()
+        self._labels: dict = {}
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = (
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            )
+        return label
+
+    def _fold(self, frame) -> str | None:
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+            return None
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def run(self) -> None:
+        me = threading.get_ident()
+        while not self._done.wait(self.interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = self._fold(frame)
+                if stack is not None:
+                    self.stacks[f"{names.get(ident, ident)};{stack}"] += 1
+            self.samples += 1
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+
+# ─── Request profile ──────────────────────────────────────────────────────────
+
+class RequestProfile:
+    """
+    Started by `start()`; `stop()` must be called on the request's way out,
+    then `write()` (which can run off the event loop).
+    """
+
+    def __init__(self):
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        self._sampler = _Sampler(PROFILE_INTERVAL_MS / 1000)
+        self._t0 = time.perf_counter()
+        self._sampler.start()
+        self.elapsed_s = 0.0
+        self._snapshot: tracemalloc.Snapshot | None = None
+        self._peak = 0
+
+    def stop(self) -> None:
+        self._sampler.stop()
+        self.elapsed_s = time.perf_counter() - self._t0
+        self._snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        self._peak = tracemalloc.get_traced_memory()[1]
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+        _active.release()
+
+    def write(self, request_id: str, label: str = "") -> str:
+        """Write the three files; returns their common path prefix."""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        safe_id = _SAFE_NAME_RE.sub("_", request_id)[:64]
+        prefix = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_id}")
+
+        with open(f"{prefix}.cpu.folded", "w", encoding="utf-8") as f:
+            for stack, count in self._sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        stats = self._snapshot.statistics("traceback")
+        with open(f"{prefix}.alloc.folded", "w", encoding="utf-8") as f:
+            for stat in stats:
+                frames = ";".join(
+                    f"{os.path.basename(fr.filename)}:{fr.lineno}" for fr in stat.traceback
+                )
+                f.write(f"{frames} {stat.size}\n")
+
+        with open(f"{prefix}.alloc.txt", "w", encoding="utf-8") as f:
+            f.write(f"{label}\n")
+            f.write(f"wall {self.elapsed_s * 1000:.1f} ms, {self._sampler.samples} CPU samples "
+                    f"every {PROFILE_INTERVAL_MS:g} ms\n")
+            f.write(f"peak traced memory {self._peak / 1024:.1f} KiB, "
+                    f"still allocated {sum(s.size for s in stats) / 1024:.1f} KiB\n\n")
+            for stat in self._snapshot.statistics("lineno")[:30]:
+                f.write(f"{stat}\n")
+        return prefix
+
+
+def start(header_value: str | None) -> RequestProfile | None:
+    """A running profile if this request should be profiled and no other is."""
+    if not should_profile(header_value):
+        return None
+    if not _active.acquire(blocking=False):
+        return None
+    try:
+        return RequestProfile()
+    except Exception:
+        _active.release()
+        raise
@@ -0,0 +1,155 @@
+"""
+Slotted internal records passed between agents.
+
+Pydantic validates data at the HTTP boundary (schemas.py, main.py); once a
+request is in, the agents hand each other these plain records instead of
+re-validating trusted values through new models. Field names match the
+schema they mirror, and `to_*` methods build the pydantic response only
+when a record leaves the service.
+"""
+
+from price_batch import PriceBatch
+from schemas import (
+    MandiPrice,
+    MarketAnalysisDetail,
+    NegotiateCounterOffer,
+    NegotiateResponse,
+)
+
+
+class MarketQuery:
+    __slots__ = ("crop", "quantity", "farmerDistrict")
+
+    def __init__(self, crop: str, quantity: float, farmerDistrict: str):
+        self.crop = crop
+        self.quantity = quantity
+        self.farmerDistrict = farmerDistrict
+
+
+class MarketAnalysis:
+    """
+    analyze_market_full's result. `mandiPrices` is the crop's shared price
+    snapshot and must not be modified.
+    """
+
+    __slots__ = (
+        "crop", "totalMarkets", "mandiPrices", "avgPricePerKg", "minPricePerKg",
+        "maxPricePerKg", "recommendedReservePrice", "perishability", "shelfLifeDays",
+        "reasoning",
+    )
+
+    def __init__(
+        self,
+        crop: str,
+        totalMarkets: int,
+        mandiPrices: PriceBatch,
+        avgPricePerKg: float,
+        minPricePerKg: float,
+        maxPricePerKg: float,
+        recommendedReservePrice: float,
+        perishability: str,
+        shelfLifeDays: int,
+        reasoning: str,
+    ):
+        self.crop = crop
+        self.totalMarkets = totalMarkets
+        self.mandiPrices = mandiPrices
+        self.avgPricePerKg = avgPricePerKg
+        self.minPricePerKg = minPricePerKg
+        self.maxPricePerKg = maxPricePerKg
+        self.recommendedReservePrice = recommendedReservePrice
+        self.perishability = perishability
+        self.shelfLifeDays = shelfLifeDays
+        self.reasoning = reasoning
+
+    def to_detail(self) -> MarketAnalysisDetail:
+        return MarketAnalysisDetail(
+            crop=self.crop,
+            totalMarkets=self.totalMarkets,
+            mandiPrices=[
+                MandiPrice(
+                    district=p.district,
+                    market=p.market,
+                    minPricePerKg=p.minPricePerKg,
+                    maxPricePerKg=p.maxPricePerKg,
+                    modalPricePerKg=p.modalPricePerKg,
+                    arrivalTonnes=p.arrivalTonnes,
+                    date=p.date,
+                )
+                for p in self.mandiPrices
+            ],
+            avgPricePerKg=self.avgPricePerKg,
+            minPricePerKg=self.minPricePerKg,
+            maxPricePerKg=self.maxPricePerKg,
+            recommendedReservePrice=self.recommendedReservePrice,
+            perishability=self.perishability,
+            shelfLifeDays=self.shelfLifeDays,
+            reasoning=self.reasoning,
+        )
+
+    def to_wire(self) -> dict:
+        """The MarketAnalysisResponse body as a JSON-ready dict (see wire.py)."""
+        return {"recommendedReservePrice": float(self.recommendedReservePrice)}
+
+
+class NegotiationQuery:
+    __slots__ = ("crop", "quantity", "farmerDistrict", "buyerDistrict", "offerPricePerKg", "reservePrice")
+
+    def __init__(
+        self,
+        crop: str,
+        quantity: float,
+        farmerDistrict: str,
+        buyerDistrict: str,
+        offerPricePerKg: float,
+        reservePrice: float,
+    ):
+        self.crop = crop
+        self.quantity = quantity
+        self.farmerDistrict = farmerDistrict
+        self.buyerDistrict = buyerDistrict
+        self.offerPricePerKg = offerPricePerKg
+        self.reservePrice = reservePrice
+
+
+class NegotiationDecision:
+    __slots__ = ("status", "ReservePrice", "finalPrice", "counterPrice", "reasoning")
+
+    def __init__(
+        self,
+        status: str,
+        ReservePrice: float,
+        finalPrice: float | None = None,
+        counterPrice: float | None = None,
+        reasoning: str = "",
+    ):
+        self.status = status
+        self.ReservePrice = ReservePrice
+        self.finalPrice = finalPrice
+        self.counterPrice = counterPrice
+        self.reasoning = reasoning
+
+    def to_response(self) -> NegotiateResponse:
+        return NegotiateResponse(
+            status=self.status,
+            ReservePrice=self.ReservePrice,
+            finalPrice=self.finalPrice,
+            counterOffer=(
+                NegotiateCounterOffer(counterPrice=self.counterPrice)
+                if self.counterPrice is not None else None
+            ),
+            reasoning=self.reasoning,
+        )
+
+    def to_wire(self) -> dict:
+        """to_response() as a JSON-ready dict with the same fields and types (see wire.py)."""
+        return {
+            "status": self.status,
+            "ReservePrice": float(self.ReservePrice),
+            "finalPrice": float(self.finalPrice) if self.finalPrice is not None else None,
+            "counterOffer": (
+                {"counterPrice": float(self.counterPrice)}
+                if self.counterPrice is not None else None
+            ),
+            "reasoning": self.reasoning,
+        }
@@ -0,0 +1,163 @@
+"""
+Response cache, ETags and Idempotency-Key for the deterministic endpoints
+(/agent/negotiate, /agent/analyze-market).
+
+Both return the same body for the same request while the data they read is
+unchanged, and the backend retries on timeouts while the frontend polls.
+Responses are cached under a hash of the canonical request (its validated
+fields, so key order or `500` vs `500.0` make no difference) plus the
+version of the data behind it: the crop's price snapshot hash for
+analyze-market. Negotiate reads only the request and the static hub table.
+
+    ETag: "<hash>"            on every 200 (a different tag for msgpack bodies)
+    If-None-Match: "<hash>"   304 with no body while the response is unchanged
+    Idempotency-Key: <key>    a retry with the same key gets the first response
+                              back (Idempotent-Replayed: true), even if the data
+                              changed since; the same key with a different body
+                              is a 422
+
+Error responses are neither cached nor kept for idempotency. With
+SHARED_CACHE_URL set, both caches are shared by all workers, so a retry may
+land on any of them.
+"""
+
+import hashlib
+import json
+import os
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+
+from shared_cache import TieredCache
+from wire import MSGPACK, WireResponse, dumps, response_format
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class CachedBody:
+    """A JSON-ready response body (see wire.py) and the tag its ETags derive from."""
+
+    __slots__ = ("tag", "body")
+
+    def __init__(self, tag: str, body: dict):
+        self.tag = tag
+        self.body = body
+
+
+def _encode_body(entry: CachedBody) -> bytes:
+    return dumps([entry.tag, entry.body])
+
+
+def _decode_body(data: bytes) -> CachedBody:
+    return CachedBody(*json.loads(data))
+
+
+def _encode_keyed(item: tuple[str, CachedBody]) -> bytes:
+    key, entry = item
+    return dumps([key, entry.tag, entry.body])
+
+
+def _decode_keyed(data: bytes) -> tuple[str, CachedBody]:
+    key, tag, body = json.loads(data)
+    return key, CachedBody(tag, body)
+
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+# Both are shared by all workers when SHARED_CACHE_URL is set (see shared_cache.py).
+
+# (request hash, data version) → CachedBody
+RESPONSE_CACHE = TieredCache(
+    "agent_response",
+    maxsize=int(os.environ.get("RESPONSE_CACHE_SIZE", "4096")),
+    ttl_s=float(os.environ.get("RESPONSE_CACHE_TTL", "300")),
+    encode=_encode_body,
+    decode=_decode_body,
+)
+
+# (route, Idempotency-Key) → (request hash, CachedBody)
+IDEMPOTENCY_KEYS = TieredCache(
+    "idempotency_key",
+    maxsize=int(os.environ.get("IDEMPOTENCY_KEYS_SIZE", "10000")),
+    ttl_s=float(os.environ.get("IDEMPOTENCY_KEY_TTL", "86400")),
+    encode=_encode_keyed,
+    decode=_decode_keyed,
+)
+
+
+def request_hash(route: str, request: BaseModel) -> str:
+    # A validated model serializes its fields in schema order with normalized
+    # values, so the JSON is canonical whatever the order and form of the input.
+    canonical = request.__pydantic_serializer__.to_json(request)
+    return hashlib.sha256(route.encode() + b"\n" + canonical).hexdigest()[:32]
+
+
+def etag_for(tag: str) -> str:
+    """The ETag of a body in the format negotiated for the current request."""
+    return f'"{tag}.msgpack"' if response_format() == MSGPACK else f'"{tag}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match comparison: weak, over a comma-separated list, or `*`."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def _respond(entry: CachedBody, if_none_match: str | None, replayed: bool = False) -> Response:
+    headers = {"ETag": etag_for(entry.tag), "Vary": "Accept"}
+    if replayed:
+        headers[REPLAYED_HEADER] = "true"
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return WireResponse(entry.body, headers=headers)
+
+
+async def serve_cached(
+    route: str,
+    request: BaseModel,
+    compute: Callable[[], Awaitable[dict]],
+    version: Callable[[], str | None],
+    if_none_match: str | None = None,
+    idempotency_key: str | None = None,
+    on_body: Callable[[dict], None] | None = None,
+) -> Response:
+    """
+    Answer `request` from the caches, or with `compute()` (which raises
+    HTTPException on errors) and cache the result.
+
+    `version()` is the version of the data the body depends on, or None
+    while it cannot be known without computing (e.g. the snapshot is stale);
+    bodies computed under a None version are not cached. `on_body` sees every
+    body served, cached or not (e.g. to tag the request's decision).
+    """
+    key = request_hash(route, request)
+    if idempotency_key:
+        stored = IDEMPOTENCY_KEYS.get((route, idempotency_key))
+        if stored is not None:
+            stored_key, entry = stored
+            if stored_key != key:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used with a different request body.",
+                )
+            if on_body is not None:
+                on_body(entry.body)
+            return _respond(entry, if_none_match, replayed=True)
+
+    data_version = version()
+    entry = RESPONSE_CACHE.get((key, data_version)) if data_version is not None else None
+    if entry is None:
+        body = await compute()
+        data_version = version()
+        tag = hashlib.sha256(f"{key}\n{data_version}".encode()).hexdigest()[:32]
+        entry = CachedBody(tag, body)
+        if data_version is not None:
+            RESPONSE_CACHE.put((key, data_version), entry)
+    if idempotency_key:
+        IDEMPOTENCY_KEYS.put((route, idempotency_key), (key, entry))
+    if on_body is not None:
+        on_body(entry.body)
+    return _respond(entry, if_none_match)
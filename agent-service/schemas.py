@@ -4,7 +4,7 @@ Matches the exact backend integration contract.
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Literal, Optional
 
 
 # ═════════════════════════════════════════════════════════════════════════════
@@ -95,6 +95,8 @@ class ChatRequest(BaseModel):
     roundNumber: int = Field(default=1, ge=1)
     currentOfferPrice: Optional[float] = None
     lastCounterPrice: Optional[float] = None
+    # End-to-end budget; when set, slow LLM paths give way to cached/template replies
+    latencyBudgetMs: Optional[float] = Field(default=None, gt=0)
 
 
 class ChatDecision(BaseModel):
@@ -131,3 +133,107 @@ class ListenResponse(BaseModel):
     missingSlots: list[str] = []
     confidence: float = 0.0
     reasoning: str = ""
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+#  EVALUATOR (internal — multi-offer comparison)
+# ═════════════════════════════════════════════════════════════════════════════
+
+class Farmer(BaseModel):
+    district: str
+    lat: float
+    lon: float
+
+
+class Offer(BaseModel):
+    buyerId: str
+    buyerDistrict: str
+    offerPricePerKg: float = Field(..., gt=0)
+
+
+class MarketContext(BaseModel):
+    averageMandiPrice: float = 0
+
+
+class EvaluateRequest(BaseModel):
+    listingId: str = Field(default="L1")
+    crop: str
+    quantity: float = Field(..., gt=0)
+    farmer: Farmer
+    marketContext: Optional[MarketContext] = None
+    offers: list[Offer] = Field(..., min_length=1)
+    reservePrice: Optional[float] = None
+
+
+class BuyerComparison(BaseModel):
+    buyerId: str
+    buyerDistrict: str
+    offerPricePerKg: float
+    grossRevenue: float
+    distanceKm: float
+    deliveryCost: float
+    netProfit: float
+    belowReserve: bool = False
+
+
+class BestBuyer(BaseModel):
+    buyerId: str
+    buyerDistrict: str
+    offerPricePerKg: float
+
+
+class EvaluationSummary(BaseModel):
+    quantity: float
+    grossRevenue: float
+    distanceKm: float
+    deliveryCost: float
+    netProfit: float
+
+
+class EvaluateResponse(BaseModel):
+    listingId: str
+    status: str  # "evaluated" | "below_reserve" | "no_viable_offer"
+    bestBuyer: Optional[BestBuyer] = None
+    evaluation: Optional[EvaluationSummary] = None
+    allComparisons: list[BuyerComparison] = []
+    reasoning: str = ""
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+#  ORCHESTRATOR (Listener → Market Analyst → Negotiator pipeline)
+# ═════════════════════════════════════════════════════════════════════════════
+
+class OrchestrateRequest(BaseModel):
+    listingId: str = Field(default="L1")
+    action: Literal["full_evaluation", "evaluate_offers", "analyze_only", "negotiate"] = "full_evaluation"
+    rawText: Optional[str] = None
+    crop: Optional[str] = None
+    quantity: Optional[float] = Field(default=None, gt=0)
+    farmer: Optional[Farmer] = None
+    offers: list[Offer] = []
+    roundNumber: int = Field(default=1, ge=1)
+
+
+class PipelineStep(BaseModel):
+    agent: str
+    status: str  # "success" | "error" | "timeout" | "cancelled" | "skipped"
+    durationMs: float = 0.0
+    # Offsets from pipeline start; overlapping spans ran concurrently
+    startMs: Optional[float] = None
+    endMs: Optional[float] = None
+    dependsOn: list[str] = []
+    message: str = ""
+
+
+class OrchestrateResponse(BaseModel):
+    listingId: str
+    action: str
+    pipeline: list[str] = []
+    pipelineTrace: list[PipelineStep] = []
+    totalMs: float = 0.0
+    listenerResult: Optional[ListenResponse] = None
+    marketAnalysis: Optional[MarketAnalysisDetail] = None
+    evaluation: Optional[EvaluateResponse] = None
+    negotiation: Optional[NegotiateResponse] = None
+    finalDecision: str = ""
+    reasoning: str = ""
@@ -0,0 +1,136 @@
+"""
+Production launcher: pre-fork workers that share one warm copy of the data.
+
+`uvicorn main:app --workers N` starts every worker from scratch: each one
+imports FastAPI, pydantic and the agents, then parses the price CSVs and
+builds its matchers. Instead, this launcher does all of that once in a master
+process (see startup.py), freezes the heap out of the garbage collector's
+reach and forks N workers on a shared listening socket. The workers start in
+milliseconds and share the preloaded data copy-on-write. A worker that dies
+is replaced. SIGTERM / SIGINT stop all of them gracefully.
+
+Connections to Ollama are not shared: each worker warms up its own in its
+lifespan, as under uvicorn.
+
+    python serve.py --workers 4 --port 8000
+
+GET /ready on any worker reports the data version and the startup breakdown
+(import / preload / freeze phases, in ms) with that worker's index.
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+import startup
+from startup import STARTUP, phase
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+AGENT_WORKERS = int(os.environ.get("AGENT_WORKERS", str(os.cpu_count() or 1)))
+
+# A worker that dies sooner than this after its fork is restarted after a pause
+RESTART_BACKOFF_S = 1.0
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _spawn(index: int, sock: socket.socket, config_kwargs: dict) -> int:
+    """Fork worker `index`; in the child, serve until shut down and exit."""
+    pid = os.fork()
+    if pid:
+        return pid
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    STARTUP.update(worker=index, pid=os.getpid())
+    code = 0
+    try:
+        import uvicorn
+        from main import app
+
+        uvicorn.Server(uvicorn.Config(app, **config_kwargs)).run(sockets=[sock])
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        os._exit(code)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=AGENT_WORKERS)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    with phase("import.framework"):
+        import fastapi  # noqa: F401
+        import pydantic  # noqa: F401
+        import uvicorn  # noqa: F401
+    with phase("import.app"):
+        import main as service  # noqa: F401
+    startup.preload()
+
+    sock = _bind(args.host, args.port)
+    STARTUP.update(mode="prefork", workers=args.workers)
+    # Objects that exist now are never collected; freezing them keeps the
+    # workers' collections from writing to (and so copying) the shared pages.
+    with phase("freeze"):
+        gc.collect()
+        gc.freeze()
+    config_kwargs = {"log_level": args.log_level}
+
+    phases = ", ".join(f"{name} {ms:.0f} ms" for name, ms in STARTUP["phasesMs"].items())
+    print(f"[Serve] {args.workers} workers on {args.host}:{args.port} — startup {startup.total_ms():.0f} ms ({phases})")
+
+    workers: dict[int, tuple[int, float]] = {}  # pid → (index, forked at)
+    for index in range(args.workers):
+        workers[_spawn(index, sock, config_kwargs)] = (index, time.monotonic())
+
+    stopping = False
+
+    def stop(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index, forked_at = workers.pop(pid, (None, 0.0))
+        if index is None or stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        print(f"[Serve] Worker {index} (pid {pid}) exited with code {code}; restarting")
+        if time.monotonic() - forked_at < RESTART_BACKOFF_S:
+            time.sleep(RESTART_BACKOFF_S)
+        if not stopping:
+            workers[_spawn(index, sock, config_kwargs)] = (index, time.monotonic())
+    sock.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
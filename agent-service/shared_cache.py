@@ -0,0 +1,350 @@
+"""
+Two-level cache for multi-worker deployments: the in-process TTLCache (L1)
+in front of a Redis-protocol store that every worker shares (L2).
+
+    SHARED_CACHE_URL unset        L1 only: per-process caches, as before
+    SHARED_CACHE_URL=memory://    in-process stand-in (MemoryRedis), no network;
+                                  for tests and single-process runs
+    SHARED_CACHE_URL=redis://...  a Redis server, e.g. the backend's (needs the
+                                  optional `redis` package)
+
+A TieredCache has TTLCache's interface (get / put / pop / clear / stats), so
+it replaces one without touching the call sites. It adds get_or_compute
+with stampede protection: one caller per key computes and the others wait
+for its value. Within a process a single-flight latch elects that caller;
+across workers a short-lived SET NX lock in L2 does.
+
+L2 values are JSON (each cache's `encode` / `decode`), never pickles, so
+whatever can write to the shared store cannot make a worker run code. L2
+errors count against a circuit breaker (SHARED_CACHE_BREAKER_*); while it
+is open the caches are L1-only.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+import weakref
+from typing import Any, Callable, Hashable
+
+from cache import TTLCache
+from circuit_breaker import BreakerProber, breaker_from_env
+from wire import dumps
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+SHARED_CACHE_URL = os.environ.get("SHARED_CACHE_URL", "")
+SHARED_CACHE_PREFIX = os.environ.get("SHARED_CACHE_PREFIX", "agent:")
+# Socket timeout per L2 call; a slow store must not cost more than a miss
+SHARED_CACHE_TIMEOUT_MS = float(os.environ.get("SHARED_CACHE_TIMEOUT_MS", "50"))
+# How long a key's computation may hold the cross-worker lock (and others wait for it)
+SHARED_CACHE_LOCK_MS = int(os.environ.get("SHARED_CACHE_LOCK_MS", "10000"))
+
+SHARED_CACHE_BREAKER = breaker_from_env("shared_cache", "SHARED_CACHE")
+
+_MISSING = object()
+
+# Every live tiered cache, for /metrics
+_TIERED: "weakref.WeakSet[TieredCache]" = weakref.WeakSet()
+
+
+def all_tiered() -> list["TieredCache"]:
+    return sorted(_TIERED, key=lambda c: c.name)
+
+
+# ─── Stores ───────────────────────────────────────────────────────────────────
+
+class MemoryRedis:
+    """
+    In-memory stand-in for the subset of the redis-py client TieredCache
+    uses: bytes values, per-key expiry, SET NX / PX and DEL.
+    """
+
+    def __init__(self):
+        self._data: dict[str, tuple[float | None, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, name: str) -> bytes | None:
+        # Caller holds the lock
+        item = self._data.get(name)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[name]
+            return None
+        return value
+
+    def ping(self) -> bool:
+        return True
+
+    def get(self, name: str) -> bytes | None:
+        with self._lock:
+            return self._live(name)
+
+    def set(self, name: str, value: bytes | str, ex: float | None = None, px: int | None = None, nx: bool = False) -> bool | None:
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        ttl_s = px / 1000 if px is not None else ex
+        with self._lock:
+            if nx and self._live(name) is not None:
+                return None
+            self._data[name] = (time.monotonic() + ttl_s if ttl_s is not None else None, value)
+            return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+
+_store: Any = _MISSING
+_store_lock = threading.Lock()
+
+
+def shared_store():
+    """
+    The process's L2 client for SHARED_CACHE_URL, or None. Created on first
+    use, so serve.py workers each open their own connections after the fork.
+    """
+    global _store
+    if _store is not _MISSING:
+        return _store
+    with _store_lock:
+        if _store is _MISSING:
+            _store = _connect(SHARED_CACHE_URL)
+            if _store is not None:
+                BreakerProber(SHARED_CACHE_BREAKER, _store.ping).start()
+    return _store
+
+
+def _connect(url: str):
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryRedis()
+    try:
+        import redis
+    except ImportError:
+        print("[SharedCache] SHARED_CACHE_URL is set but `redis` is not installed; caches are per-process")
+        return None
+    timeout_s = SHARED_CACHE_TIMEOUT_MS / 1000
+    return redis.Redis.from_url(url, socket_timeout=timeout_s, socket_connect_timeout=timeout_s)
+
+
+def shared_cache_info() -> dict:
+    """Backend and breaker state, for /health."""
+    backend = SHARED_CACHE_URL.split("://", 1)[0] if SHARED_CACHE_URL else "none"
+    return {"backend": backend, **SHARED_CACHE_BREAKER.snapshot()}
+
+
+# ─── Tiered cache ─────────────────────────────────────────────────────────────
+
+def _encode_json(value: Any) -> bytes:
+    return dumps(value)
+
+
+def _decode_json(data: bytes) -> Any:
+    return json.loads(data)
+
+
+class _StoreUnavailable(Exception):
+    pass
+
+
+class _Flight:
+    """One in-process computation of a key, awaited by concurrent callers."""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = _MISSING
+        self.error: BaseException | None = None
+
+
+class TieredCache:
+    """
+    TTLCache (L1) in front of the shared store (L2). Both tiers hold an entry
+    for `ttl_s`. `clear()` only empties L1: the shared tier belongs to every
+    worker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 1024,
+        ttl_s: float = 300.0,
+        encode: Callable[[Any], bytes] = _encode_json,
+        decode: Callable[[bytes], Any] = _decode_json,
+        store: Any = _MISSING,
+    ):
+        self.name = name
+        self.ttl_s = ttl_s
+        self.local = TTLCache(name, maxsize=maxsize, ttl_s=ttl_s)
+        self.encode = encode
+        self.decode = decode
+        self._store = store  # _MISSING: shared_store(); None: L1 only
+        self._lock = threading.Lock()
+        self._inflight: dict[Hashable, _Flight] = {}
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        _TIERED.add(self)
+
+    @property
+    def store(self):
+        return shared_store() if self._store is _MISSING else self._store
+
+    def _l2_key(self, key: Hashable) -> str:
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32]
+        return f"{SHARED_CACHE_PREFIX}{self.name}:{digest}"
+
+    def _call(self, op: str, *args, **kwargs) -> Any:
+        store = self.store
+        if store is None or not SHARED_CACHE_BREAKER.allow():
+            raise _StoreUnavailable
+        t0 = time.perf_counter()
+        try:
+            result = getattr(store, op)(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self.l2_errors += 1
+            SHARED_CACHE_BREAKER.record_failure(f"{op}: {e}")
+            raise _StoreUnavailable from e
+        SHARED_CACHE_BREAKER.record_success(time.perf_counter() - t0)
+        return result
+
+    def _l2_get(self, key: Hashable) -> Any:
+        try:
+            data = self._call("get", self._l2_key(key))
+        except _StoreUnavailable:
+            return _MISSING
+        if data is not None:
+            try:
+                value = self.decode(data)
+            except ValueError:
+                data = None  # written by an incompatible version; recompute
+        with self._lock:
+            if data is None:
+                self.l2_misses += 1
+                return _MISSING
+            self.l2_hits += 1
+        return value
+
+    def _l2_put(self, key: Hashable, value: Any, ttl_s: float) -> None:
+        try:
+            self._call("set", self._l2_key(key), self.encode(value), px=max(1, int(ttl_s * 1000)))
+        except _StoreUnavailable:
+            pass
+
+    # ── TTLCache interface ────────────────────────────────────────────────
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self.local.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._l2_get(key)
+            if value is _MISSING:
+                return default
+            self.local.put(key, value)
+        return value
+
+    def put(self, key: Hashable, value: Any, ttl_s: float | None = None) -> None:
+        ttl_s = self.ttl_s if ttl_s is None else ttl_s
+        self.local.put(key, value, ttl_s)
+        self._l2_put(key, value, ttl_s)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            self._call("delete", self._l2_key(key))
+        except _StoreUnavailable:
+            pass
+        return self.local.pop(key, default)
+
+    def clear(self) -> None:
+        self.local.clear()
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    def stats(self) -> dict:
+        return {
+            **self.local.stats(),
+            "l2Hits": self.l2_hits,
+            "l2Misses": self.l2_misses,
+            "l2Errors": self.l2_errors,
+        }
+
+    # ── Stampede protection ───────────────────────────────────────────────
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], ttl_s: float | None = None) -> Any:
+        """
+        The cached value, or compute() run once for all concurrent callers of
+        `key`, in this process and (through an L2 lock) across workers. If
+        the computation raises, its concurrent waiters get the same error.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        if not leader:
+            flight.done.wait(SHARED_CACHE_LOCK_MS / 1000)
+            if flight.error is not None:
+                raise flight.error
+            return flight.value if flight.value is not _MISSING else compute()
+
+        try:
+            flight.value = self._compute_shared(key, compute, ttl_s)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _compute_shared(self, key: Hashable, compute: Callable[[], Any], ttl_s: float | None) -> Any:
+        lock_key = self._l2_key(key) + ":lock"
+        token = uuid.uuid4().hex
+        try:
+            locked = bool(self._call("set", lock_key, token, px=SHARED_CACHE_LOCK_MS, nx=True))
+        except _StoreUnavailable:
+            locked = None  # no L2: compute locally
+
+        if locked is False:
+            # Another worker is computing it: wait for its value, or for its
+            # lock to go away (it failed or died) and compute here.
+            deadline = time.monotonic() + SHARED_CACHE_LOCK_MS / 1000
+            delay = 0.005
+            while time.monotonic() < deadline:
+                time.sleep(delay)
+                delay = min(delay * 2, 0.1)
+                value = self._l2_get(key)
+                if value is not _MISSING:
+                    self.local.put(key, value)
+                    return value
+                try:
+                    if self._call("get", lock_key) is None:
+                        break
+                except _StoreUnavailable:
+                    break
+
+        try:
+            value = compute()
+            self.put(key, value, ttl_s)
+            return value
+        finally:
+            if locked:
+                try:
+                    # Not atomic: a lock that expired and was retaken in between
+                    # can be released early, which costs a duplicate computation.
+                    if self._call("get", lock_key) == token.encode():
+                        self._call("delete", lock_key)
+                except _StoreUnavailable:
+                    pass
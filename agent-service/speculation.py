@@ -0,0 +1,111 @@
+"""
+Speculative pre-generation for conversations waiting on the buyer.
+
+After a counter-offer, the buyer's next message usually lands on a round
+price between their offer and our counter. When the LLM is idle, a single
+background worker pre-computes replies for the most likely prices and keeps
+them in a short-lived cache, so a matching next round is served instantly.
+Unused entries simply expire.
+"""
+
+import itertools
+import os
+import queue
+import threading
+from typing import Callable
+
+from cache import TTLCache
+from llm_message_generator import llm_is_idle
+
+SPECULATIVE_MODE = os.environ.get("SPECULATIVE_MODE", "0") == "1"
+SPECULATIVE_BUCKETS = int(os.environ.get("SPECULATIVE_BUCKETS", "3"))
+SPECULATIVE_STEP = float(os.environ.get("SPECULATIVE_STEP", "0.5"))   # ₹/kg
+
+# (session, context fingerprint, offer price) → precomputed reply
+SPECULATIVE_CACHE = TTLCache(
+    "speculative",
+    maxsize=int(os.environ.get("SPECULATIVE_CACHE_SIZE", "4096")),
+    ttl_s=float(os.environ.get("SPECULATIVE_TTL", "120")),
+)
+
+STATS = {"scheduled": 0, "dropped": 0, "superseded": 0, "generated": 0, "aborted": 0}
+
+_jobs: queue.Queue = queue.Queue(maxsize=int(os.environ.get("SPECULATIVE_QUEUE_SIZE", "64")))
+_job_ids = itertools.count(1)
+_latest: dict[str, int] = {}
+_lock = threading.Lock()
+_worker: threading.Thread | None = None
+
+
+def likely_offers(
+    offer: float,
+    counter: float,
+    buckets: int = SPECULATIVE_BUCKETS,
+    step: float = SPECULATIVE_STEP,
+) -> list[float]:
+    """
+    Round prices strictly above `offer` and up to `counter`, most likely first.
+
+    Buyers tend to meet near the middle, so buckets are ranked by distance
+    from the midpoint, with whole rupees ahead of fractional ones.
+    """
+    if step <= 0 or counter <= offer:
+        return []
+    first = int(offer // step) + 1
+    last = int(counter // step)
+    midpoint = (offer + counter) / 2
+    prices = [round(i * step, 2) for i in range(first, last + 1)]
+    prices.sort(key=lambda p: (abs(p - midpoint), p != int(p), p))
+    return prices[:buckets]
+
+
+def schedule(session: str, job: Callable[[Callable[[], bool]], None]) -> bool:
+    """
+    Queue a speculative job for a session. A newer job for the same session
+    supersedes any older one still waiting.
+
+    The job receives a `should_continue()` callable and must check it before
+    each expensive step; it turns False when the session has moved on or
+    the LLM is busy with live traffic.
+    """
+    global _worker
+    with _lock:
+        job_id = next(_job_ids)
+        _latest[session] = job_id
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="speculative", daemon=True)
+            _worker.start()
+    try:
+        _jobs.put_nowait((session, job_id, job))
+    except queue.Full:
+        STATS["dropped"] += 1
+        return False
+    STATS["scheduled"] += 1
+    return True
+
+
+def _run() -> None:
+    while True:
+        session, job_id, job = _jobs.get()
+
+        def should_continue() -> bool:
+            if _latest.get(session) != job_id:
+                STATS["superseded"] += 1
+                return False
+            if not llm_is_idle():
+                STATS["aborted"] += 1
+                return False
+            return True
+
+        try:
+            job(should_continue)
+        except Exception as e:
+            print(f"[Speculative] Job for {session} failed: {e}")
+        finally:
+            with _lock:
+                if _latest.get(session) == job_id:
+                    del _latest[session]
+
+
+def stats() -> dict:
+    return {"enabled": SPECULATIVE_MODE, **STATS, "cache": SPECULATIVE_CACHE.stats()}
@@ -0,0 +1,69 @@
+"""
+Startup phases and warm state, reported by /ready.
+
+`preload()` builds everything a first request would otherwise build lazily:
+the price snapshots, the hub distance table and the Listener's gazetteers
+for every language. `serve.py` runs it once in the pre-fork master, so the
+workers share that data copy-on-write; under plain `uvicorn main:app` the
+lifespan runs it before the first request is accepted.
+
+Phase timings are in milliseconds:
+    import.framework   fastapi, pydantic, uvicorn          (serve.py only)
+    import.app         main and the agents it imports      (serve.py only)
+    preload.prices     parse every crop's Agmarknet CSV
+    preload.distances  district hub × hub distance table
+    preload.matchers   compiled gazetteer per language
+    freeze             gc.collect + gc.freeze before fork  (serve.py only)
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+STARTUP: dict = {
+    "mode": "uvicorn",       # "prefork" under serve.py
+    "pid": os.getpid(),
+    "worker": None,          # index of this worker under serve.py
+    "workers": 1,
+    "preloaded": False,
+    "phasesMs": {},
+}
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP["phasesMs"][name] = round((time.perf_counter() - t0) * 1000, 1)
+
+
+def preload() -> None:
+    """Warm the shared read-only data; a no-op once done (e.g. in forked workers)."""
+    if STARTUP["preloaded"]:
+        return
+    from distance import build_hub_distances
+    from listener import CROP_ALIASES, DISTRICT_ALIASES_BY_LANGUAGE, gazetteer_for
+    from market_data import CSV_FILES, load_mandi_prices
+
+    with phase("preload.prices"):
+        for crop in CSV_FILES:
+            load_mandi_prices(crop)
+    with phase("preload.distances"):
+        build_hub_distances()
+    with phase("preload.matchers"):
+        for language in {*CROP_ALIASES, *DISTRICT_ALIASES_BY_LANGUAGE}:
+            gazetteer_for(language)
+    STARTUP["preloaded"] = True
+    print(f"[Startup] Preloaded in {total_ms('preload.'):.1f} ms")
+
+
+def startup_info() -> dict:
+    return {**STARTUP, "phasesMs": dict(STARTUP["phasesMs"])}
+
+
+def total_ms(prefix: str = "") -> float:
+    """Summed time of the phases whose name starts with `prefix`."""
+    return sum(ms for name, ms in STARTUP["phasesMs"].items() if name.startswith(prefix))
@@ -1,6 +1,11 @@
 """End-to-end tests matching the exact backend API contract."""
+import io
+import os
+
+import msgpack
 import requests
 import json
+from websockets.sync.client import connect
 
 BASE = "http://localhost:8001"
 
@@ -13,6 +18,7 @@ def test_health():
     assert r.status_code == 200
     assert d["status"] == "ok"
     assert d["version"] == "3.0.0"
+    assert "maxInflight" in d["admission"]["chat"]
     print("PASS\n")
 
 
@@ -114,6 +120,338 @@ def test_chat():
     print("PASS\n")
 
 
+def test_chat_latency_budget():
+    print("=== 5. Buyer Chat — Latency Budget ===")
+    r = requests.post(f"{BASE}/agent/chat", headers={"X-Latency-Budget-Ms": "50"}, json={
+        "listingId": "L1",
+        "buyerMessage": "I can offer 22 per kg",
+        "buyerId": "B1",
+        "buyerDistrict": "Malappuram",
+        "crop": "Tomato",
+        "quantity": 500,
+        "farmerDistrict": "Palakkad",
+    })
+    d = r.json()
+    print(json.dumps(d, indent=2, ensure_ascii=False))
+    assert r.status_code == 200
+    assert d["decision"]["status"] == "counter_offer"
+    assert len(d["chatMessage"]) > 0
+    assert "total;dur=" in r.headers["Server-Timing"]
+    print("PASS\n")
+
+
+def test_listen():
+    print("=== 6. Listener ===")
+    r = requests.post(f"{BASE}/agent/listen", json={
+        "rawText": "I want to sell 5 quintals of tomato in Palakkad",
+    })
+    d = r.json()
+    print(json.dumps(d, indent=2))
+    assert r.status_code == 200
+    assert d["intent"] == "create_listing"
+    assert d["extractedSlots"] == {
+        "crop": "Tomato", "quantity": 500.0, "unit": "quintal", "district": "Palakkad",
+    }
+    assert d["missingSlots"] == []
+    print("PASS\n")
+
+
+def test_listen_multilingual():
+    print("=== 7. Listener (Malayalam names, typos) ===")
+    r = requests.post(f"{BASE}/agent/listen", json={
+        "rawText": "തൃശ്ശൂരിൽ 500 kg തക്കാളി",
+        "language": "ml",
+    })
+    d = r.json()
+    print(json.dumps(d, indent=2, ensure_ascii=False))
+    assert r.status_code == 200
+    assert d["extractedSlots"]["crop"] == "Tomato"
+    assert d["extractedSlots"]["district"] == "Thrissur"
+
+    r = requests.post(f"{BASE}/agent/listen", json={"rawText": "sell 200 kg tomatos in Kozhikkode"})
+    d = r.json()
+    assert d["extractedSlots"]["crop"] == "Tomato"
+    assert d["extractedSlots"]["district"] == "Kozhikode"
+    print("PASS\n")
+
+
+def test_listen_batch():
+    print("=== 8. Listener batch (JSON list and NDJSON stream) ===")
+    texts = [f"I want to sell {q} kg of tomato in Palakkad" for q in range(1, 601)]
+    r = requests.post(f"{BASE}/agent/listen/batch", json=[{"rawText": t} for t in texts] + [{"rawText": ""}])
+    assert r.status_code == 200
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert len(lines) == 601
+    assert [d["extractedSlots"]["quantity"] for d in lines[:600]] == [float(q) for q in range(1, 601)]
+    assert "error" in lines[600]
+
+    body = "".join(json.dumps({"rawText": t}) + "\n" for t in texts).encode()
+    r = requests.post(
+        f"{BASE}/agent/listen/batch",
+        data=(body[i:i + 4096] for i in range(0, len(body), 4096)),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert r.status_code == 200
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [d["extractedSlots"]["quantity"] for d in lines] == [float(q) for q in range(1, 601)]
+    print(f"{len(lines)} results in order")
+    print("PASS\n")
+
+
+def test_orchestrate():
+    print("=== 9. Orchestrator (DAG pipeline) ===")
+    r = requests.post(f"{BASE}/agent/orchestrate", json={
+        "rawText": "I want to sell 500 kg of tomato in Palakkad",
+        "offers": [
+            {"buyerId": "B1", "buyerDistrict": "Thrissur", "offerPricePerKg": 20},
+            {"buyerId": "B2", "buyerDistrict": "Kannur", "offerPricePerKg": 26},
+        ],
+    })
+    d = r.json()
+    print(json.dumps(d["pipelineTrace"], indent=2, ensure_ascii=False))
+    assert r.status_code == 200
+    assert d["pipeline"][0] == "listener" and d["pipeline"][-1] == "negotiator"
+    assert d["finalDecision"] == "evaluated"
+    assert d["evaluation"]["bestBuyer"]["buyerId"] == "B2"
+    steps = {s["agent"]: s for s in d["pipelineTrace"]}
+    assert all(s["status"] == "success" for s in steps.values())
+    # Market Analyst and delivery both wait only on the Listener
+    assert steps["market_analyst"]["dependsOn"] == steps["delivery"]["dependsOn"] == ["listener"]
+    assert steps["negotiator"]["startMs"] >= max(steps["market_analyst"]["endMs"], steps["delivery"]["endMs"])
+
+    r = requests.post(f"{BASE}/agent/orchestrate", json={"action": "analyze_only"})
+    d = r.json()
+    assert d["finalDecision"] == "incomplete"
+    assert d["pipelineTrace"][0]["status"] == "skipped"
+    print("PASS\n")
+
+
+def test_tracing():
+    print("=== 10. Tracing (X-Request-Id) ===")
+    request_id = "test-trace-orchestrate"
+    r = requests.post(f"{BASE}/agent/orchestrate", json={
+        "rawText": "I want to sell 500 kg of tomato in Palakkad",
+        "offers": [{"buyerId": "B1", "buyerDistrict": "Thrissur", "offerPricePerKg": 20}],
+    }, headers={"X-Request-Id": request_id})
+    assert r.status_code == 200
+    assert r.headers["X-Request-Id"] == request_id
+
+    r = requests.get(f"{BASE}/agent/traces/{request_id}")
+    assert r.status_code == 200
+    spans = r.json()["spans"]
+    names = [s["name"] for s in spans]
+    print(names)
+    assert names[0] == "HTTP POST /agent/orchestrate"
+    assert {"listener.extract_intent", "market_analyst.analyze_market_full"} <= set(names)
+    root = spans[0]
+    assert root["parentSpanId"] is None
+    assert all(s["traceId"] == root["traceId"] for s in spans)
+    assert all(s["durationNs"] <= root["durationNs"] for s in spans)
+    print("PASS\n")
+
+
+def test_metrics():
+    print("=== 11. Prometheus /metrics ===")
+    r = requests.post(f"{BASE}/agent/negotiate", json={
+        "crop": "Tomato",
+        "quantity": 500,
+        "farmer": {"district": "Palakkad"},
+        "buyer": {"district": "Malappuram"},
+        "offerPricePerKg": 30,
+        "reservePrice": 25,
+    })
+    assert r.status_code == 200
+
+    r = requests.get(f"{BASE}/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    body = r.text
+    assert "agent_http_request_duration_seconds_bucket" in body
+    assert 'route="/agent/negotiate",code="200",decision="accepted"' in body
+    assert 'agent_price_snapshot_rows{crop="Tomato"}' in body
+    assert "agent_cache_hit_ratio" in body
+    print("PASS\n")
+
+
+def test_profiling():
+    print("=== 12. Per-request profiling (X-Profile) ===")
+    r = requests.post(f"{BASE}/agent/chat", headers={"X-Profile": "1"}, json={
+        "listingId": "L1",
+        "buyerMessage": "I can offer 22 per kg",
+        "buyerId": "B1",
+        "buyerDistrict": "Malappuram",
+        "crop": "Tomato",
+        "quantity": 500,
+        "farmerDistrict": "Palakkad",
+    })
+    assert r.status_code == 200
+    prefix = r.headers["X-Profile"]
+    print(prefix)
+    # Written relative to the server's working directory (this one, locally)
+    prefix = os.path.join(os.path.dirname(os.path.abspath(__file__)), prefix)
+    for suffix in (".cpu.folded", ".alloc.folded", ".alloc.txt"):
+        assert os.path.exists(prefix + suffix)
+    with open(prefix + ".alloc.txt", encoding="utf-8") as f:
+        assert "peak traced memory" in f.read()
+
+    r = requests.post(f"{BASE}/agent/listen", json={"rawText": "sell 5 kg tomato"})
+    assert "X-Profile" not in r.headers
+    print("PASS\n")
+
+
+def test_executors():
+    print("=== 13. Chat runs on the I/O executor ===")
+    request_id = "test-executor-chat"
+    r = requests.post(f"{BASE}/agent/chat", headers={"X-Request-Id": request_id}, json={
+        "listingId": "L1",
+        "buyerMessage": "I can offer 22 per kg",
+        "buyerId": "B1",
+        "buyerDistrict": "Malappuram",
+        "crop": "Tomato",
+        "quantity": 500,
+        "farmerDistrict": "Palakkad",
+    })
+    assert r.status_code == 200
+
+    # Spans recorded on the worker thread stay in the request's trace
+    names = [s["name"] for s in requests.get(f"{BASE}/agent/traces/{request_id}").json()["spans"]]
+    assert "chat.extract" in names
+
+    samples = {}
+    for line in requests.get(f"{BASE}/metrics").text.splitlines():
+        if line.startswith("agent_executor_tasks_total{"):
+            labels, value = line.rsplit(" ", 1)
+            samples[labels] = float(value)
+    print(samples)
+    assert samples['agent_executor_tasks_total{executor="agent-io"}'] >= 1
+    print("PASS\n")
+
+
+def test_msgpack():
+    print("=== 14. MessagePack content negotiation ===")
+    body = {
+        "crop": "Tomato",
+        "quantity": 500,
+        "farmer": {"district": "Palakkad"},
+        "buyer": {"district": "Malappuram"},
+        "offerPricePerKg": 22,
+        "reservePrice": 25,
+    }
+    expected = requests.post(f"{BASE}/agent/negotiate", json=body).json()
+    r = requests.post(f"{BASE}/agent/negotiate", data=msgpack.packb(body), headers={
+        "Content-Type": "application/msgpack",
+        "Accept": "application/msgpack",
+    })
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(r.content) == expected
+
+    # msgpack in, JSON out by default
+    r = requests.post(f"{BASE}/agent/negotiate", data=msgpack.packb(body),
+                      headers={"Content-Type": "application/msgpack"})
+    assert r.json() == expected
+
+    texts = [{"rawText": f"I want to sell {q} kg of tomato in Palakkad"} for q in range(1, 301)]
+    r = requests.post(f"{BASE}/agent/listen/batch", data=b"".join(msgpack.packb(t) for t in texts), headers={
+        "Content-Type": "application/msgpack",
+        "Accept": "application/msgpack",
+    })
+    assert r.status_code == 200
+    results = list(msgpack.Unpacker(io.BytesIO(r.content)))
+    assert [d["extractedSlots"]["quantity"] for d in results] == [float(q) for q in range(1, 301)]
+    print(f"{len(results)} msgpack results in order")
+
+    # Undecodable msgpack ends the stream with an error object, as NDJSON does
+    for data in (b"\xc1\xc1\xc1", msgpack.packb(texts[0]) + b"\x82\xa1"):
+        r = requests.post(f"{BASE}/agent/listen/batch", data=data, headers={
+            "Content-Type": "application/msgpack",
+            "Accept": "application/msgpack",
+        })
+        results = list(msgpack.Unpacker(io.BytesIO(r.content)))
+        assert r.status_code == 200 and "error" in results[-1], results
+    assert len(results) == 2 and results[0]["extractedSlots"]["quantity"] == 1.0
+    print("PASS\n")
+
+
+def test_ws_channel():
+    print("=== 15. Multiplexed WebSocket channel ===")
+    chat = {
+        "listingId": "L1",
+        "buyerMessage": "I can offer 22 per kg",
+        "buyerId": "B1",
+        "buyerDistrict": "Malappuram",
+        "crop": "Tomato",
+        "quantity": 500,
+        "farmerDistrict": "Palakkad",
+    }
+    with connect(BASE.replace("http", "ws") + "/agent/ws") as ws:
+        ws.send(json.dumps({"id": "ws-counter", "type": "chat", "payload": chat}))
+        ws.send(json.dumps({"id": "ws-accept", "type": "chat", "payload": {**chat, "buyerMessage": "I offer 30"}}))
+        ws.send(json.dumps({"id": "ws-bad", "type": "chat", "payload": {"crop": "Tomato"}}))
+        events: dict[str, list] = {}
+        while sum(e[-1]["type"] in ("done", "error") for e in events.values()) < 3:
+            event = json.loads(ws.recv(timeout=30))
+            events.setdefault(event["id"], []).append(event)
+
+    counter = events["ws-counter"]
+    print([e["type"] for e in counter])
+    assert counter[0]["type"] == "decision" and counter[0]["status"] == "counter_offer"
+    assert counter[-1]["type"] == "done"
+    assert counter[-1]["response"]["decision"]["counterPrice"] == counter[0]["counterPrice"]
+    assert "".join(e["text"] for e in counter if e["type"] == "delta") == counter[-1]["response"]["chatMessage"]
+    assert events["ws-accept"][-1]["response"]["decision"]["status"] == "accepted"
+    assert events["ws-bad"][-1]["type"] == "error" and events["ws-bad"][-1]["status"] == 422
+
+    # The request id is the trace id
+    names = [s["name"] for s in requests.get(f"{BASE}/agent/traces/ws-counter").json()["spans"]]
+    assert "WS chat" in names
+    print("PASS\n")
+
+
+def test_ready():
+    print("=== 16. Readiness: warm state and data version ===")
+    r = requests.get(f"{BASE}/ready")
+    d = r.json()
+    print(json.dumps({k: d[k] for k in ("ready", "data", "startup")}, indent=2))
+    assert r.status_code == (200 if d["ready"] else 503)
+    assert d["startup"]["preloaded"] is True
+    assert {"preload.prices", "preload.distances", "preload.matchers"} <= set(d["startup"]["phasesMs"])
+    assert d["data"]["snapshots"]["Tomato"]["rows"] > 0
+    assert len(d["data"]["version"]) == 12
+    print("PASS\n")
+
+
+def test_etag_idempotency():
+    print("=== 17. ETag / If-None-Match and Idempotency-Key ===")
+    body = {
+        "crop": "Tomato",
+        "quantity": 500,
+        "farmer": {"district": "Palakkad"},
+        "buyer": {"district": "Malappuram"},
+        "offerPricePerKg": 22,
+        "reservePrice": 25,
+    }
+    r = requests.post(f"{BASE}/agent/negotiate", json=body)
+    etag = r.headers["ETag"]
+    print(f"ETag: {etag}")
+    assert r.status_code == 200
+
+    # Same request in another form → same ETag → 304 without a body
+    reordered = {**dict(reversed(list(body.items()))), "quantity": 500.0}
+    r = requests.post(f"{BASE}/agent/negotiate", json=reordered, headers={"If-None-Match": etag})
+    assert r.status_code == 304 and r.content == b"" and r.headers["ETag"] == etag
+    r = requests.post(f"{BASE}/agent/negotiate", json={**body, "offerPricePerKg": 23}, headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+
+    key = {"Idempotency-Key": f"test-{os.getpid()}"}
+    first = requests.post(f"{BASE}/agent/analyze-market", json={"crop": "Tomato", "quantity": 500, "farmerDistrict": "Palakkad"}, headers=key)
+    retry = requests.post(f"{BASE}/agent/analyze-market", json={"crop": "Tomato", "quantity": 500, "farmerDistrict": "Palakkad"}, headers=key)
+    assert retry.headers.get("Idempotent-Replayed") == "true" and retry.json() == first.json()
+    r = requests.post(f"{BASE}/agent/analyze-market", json={"crop": "Tomato", "quantity": 900, "farmerDistrict": "Palakkad"}, headers=key)
+    assert r.status_code == 422
+    print("PASS\n")
+
+
 if __name__ == "__main__":
     test_health()
     test_analyze_market()
@@ -121,6 +459,19 @@ if __name__ == "__main__":
     test_negotiate_counter()
     test_negotiate_reject()
     test_chat()
+    test_chat_latency_budget()
+    test_listen()
+    test_listen_multilingual()
+    test_listen_batch()
+    test_orchestrate()
+    test_tracing()
+    test_metrics()
+    test_profiling()
+    test_executors()
+    test_msgpack()
+    test_ws_channel()
+    test_ready()
+    test_etag_idempotency()
     print("=" * 40)
-    print("ALL 6 TESTS PASSED")
+    print("ALL 19 TESTS PASSED")
     print("=" * 40)
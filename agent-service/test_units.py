@@ -0,0 +1,420 @@
+"""
+In-process unit tests: components exercised directly, without the live
+server that test_agent.py runs against.
+"""
+import asyncio
+import json
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import buyer_chat
+import llm_message_generator as llm
+import speculation
+from admission import CHAT, COMMIT, AdmissionController, AdmissionRejected
+from buyer_chat import chat_lane, conversation_key, explicit_ids
+from circuit_breaker import CLOSED, OPEN, BreakerProber, CircuitBreaker
+from latency import LatencyWindow
+from listener import extract_intent, gazetteer_for
+from market_analyst import analyze_market_full
+from records import MarketQuery
+from schemas import ChatDecision, ChatRequest, ChatResponse, ListenRequest
+from shared_cache import MemoryRedis, TieredCache
+
+
+def _wait_for(condition, timeout_s: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_shared_cache():
+    print("=== 1. Two-level cache over an in-memory Redis stand-in ===")
+    store = MemoryRedis()
+    worker_a = TieredCache("test_shared", ttl_s=60, store=store)
+    worker_b = TieredCache("test_shared", ttl_s=60, store=store)
+
+    # A value put by one worker is an L2 hit for the other, then an L1 hit
+    worker_a.put(("Tomato", 22.0), {"offerPricePerKg": 22.0, "intent": "new_offer"})
+    assert worker_b.get(("Tomato", 22.0)) == {"offerPricePerKg": 22.0, "intent": "new_offer"}
+    assert worker_b.get(("Tomato", 22.0)) is not None
+    assert worker_b.stats()["l2Hits"] == 1 and worker_b.stats()["hits"] == 1
+    worker_a.put("short", "gone soon", ttl_s=0.05)
+    time.sleep(0.1)
+    assert worker_b.get("short") is None
+
+    # Stampede: 16 concurrent callers over two workers compute the value once
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return "generated"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda w=w: results.append(w.get_or_compute("hot", compute)))
+        for w in [worker_a, worker_b] * 8
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"{len(results)} callers, {len(calls)} computation(s)")
+    assert results == ["generated"] * 16 and len(calls) == 1
+    print("PASS\n")
+
+
+def test_admission():
+    print("=== 2. Chat admission: per-buyer rate limit and commit lane ===")
+    accept = ChatRequest(buyerMessage="ok deal", buyerDistrict="Thrissur", lastCounterPrice=24)
+    assert chat_lane(accept) == COMMIT
+    assert chat_lane(ChatRequest(buyerMessage="ok deal", buyerDistrict="Thrissur")) == CHAT
+    assert chat_lane(ChatRequest(buyerMessage="I offer 22", buyerDistrict="Thrissur", lastCounterPrice=24)) == CHAT
+
+    async def scenario():
+        gate = AdmissionController(rate_per_buyer=1, burst_per_buyer=3, max_inflight=1, max_queue=1, queue_timeout_ms=50)
+        statuses = []
+        for _ in range(5):
+            try:
+                async with gate.admit(CHAT, "spammer", "L9"):
+                    statuses.append(200)
+            except AdmissionRejected as e:
+                statuses.append((e.status, e.headers["Retry-After"]))
+        # Another buyer is unaffected; a commit round is admitted past a full chat lane
+        release = asyncio.Event()
+
+        async def hold(buyer):
+            async with gate.admit(CHAT, buyer, "L1"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold("B7"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold("B8"))
+        await asyncio.sleep(0)
+        async with gate.admit(COMMIT, "B9", "L1"):
+            statuses.append("commit")
+        try:
+            async with gate.admit(CHAT, "B10", "L1"):
+                pass
+        except AdmissionRejected as e:
+            statuses.append(e.status)  # queue of 1 is full
+        release.set()
+        await asyncio.gather(holder, waiter)
+        return statuses, gate.snapshot()
+
+    statuses, snapshot = asyncio.run(scenario())
+    print(statuses)
+    print(json.dumps(snapshot["outcomes"]))
+    assert statuses == [200, 200, 200, (429, "1"), (429, "1"), "commit", 503]
+    assert snapshot["outcomes"]["chat"]["queued"] == 1 and snapshot["chat"]["inflight"] == 0
+
+    # Callers that send no ids are not pooled into one shared bucket
+    async def anonymous():
+        gate = AdmissionController(rate_per_buyer=1, burst_per_buyer=3, rate_per_listing=1, burst_per_listing=3)
+        for _ in range(40):
+            request = ChatRequest(buyerMessage="22?", buyerDistrict="Thrissur")
+            async with gate.admit(CHAT, *explicit_ids(request)):
+                pass
+        return gate.snapshot()
+
+    snapshot = asyncio.run(anonymous())
+    assert snapshot["outcomes"]["chat"] == {"admitted": 40} and snapshot["trackedBuyers"] == 0
+    print("PASS\n")
+
+
+def test_circuit_breaker():
+    print("=== 3. Circuit breaker: trip, half-open probe, close ===")
+    breaker = CircuitBreaker("test", failure_threshold=3, slow_call_ms=100, open_seconds=0.05)
+
+    # Failures and slow calls count toward the threshold; a success resets it
+    breaker.record_failure("refused")
+    breaker.record_success(0.01)
+    breaker.record_failure("refused")
+    breaker.record_success(0.2)
+    assert breaker.state == CLOSED and breaker.consecutive_failures == 2
+    breaker.record_failure("refused")
+    assert breaker.state == OPEN and breaker.trips == 1
+    assert not breaker.allow() and breaker.snapshot()["shortCircuited"] == 1
+    assert breaker.snapshot()["slowCalls"] == 1
+
+    # A failed probe reopens it with a doubled wait; a passing one closes it
+    assert not breaker.probe_due()
+    time.sleep(0.06)
+    assert breaker.probe_due()
+
+    def down():
+        raise ConnectionError("still down")
+
+    assert breaker.run_probe(down) is False
+    assert breaker.state == OPEN and breaker.open_seconds == 0.1 and breaker.probe_failures == 1
+    assert breaker.run_probe(lambda: None) is True
+    assert breaker.state == CLOSED and breaker.allow() and breaker.open_seconds == 0.05
+
+    # The prober closes an open breaker in the background once the probe passes
+    for _ in range(3):
+        breaker.record_failure("refused")
+    assert breaker.state == OPEN
+    healthy = threading.Event()
+
+    def probe():
+        if not healthy.is_set():
+            raise ConnectionError("still down")
+
+    prober = BreakerProber(breaker, probe, interval_s=0.01)
+    prober.start()
+    try:
+        time.sleep(0.1)
+        assert breaker.state == OPEN
+        healthy.set()
+        _wait_for(lambda: breaker.state == CLOSED)
+    finally:
+        prober.stop()
+    print(json.dumps(breaker.snapshot()))
+    assert breaker.state == CLOSED and breaker.probes >= 2
+    print("PASS\n")
+
+
+def test_latency_routing_recovers():
+    print("=== 4. Budget routing retries Ollama once a latency spike ages out ===")
+    window = LatencyWindow(min_samples=5, max_age_s=0.1)
+    saved = llm.LLM_LATENCY["negotiation"]
+    llm.LLM_LATENCY["negotiation"] = window
+    try:
+        for _ in range(5):
+            window.record(5000)  # the spike: every sample over the budget
+        assert not llm._fits_budget("negotiation", 500)
+        # Nothing reaches Ollama to record a fast sample; the spike must expire
+        time.sleep(0.15)
+        assert len(window) == 0 and window.percentile(0.99) is None
+        assert llm._fits_budget("negotiation", 500)
+        for _ in range(5):
+            window.record(5)
+        assert llm._fits_budget("negotiation", 500)
+    finally:
+        llm.LLM_LATENCY["negotiation"] = saved
+    print("PASS\n")
+
+
+def test_speculation():
+    print("=== 5. Speculative next round: buckets, idle gating, cache hits ===")
+    # Round prices above the offer, up to the counter, nearest the midpoint first
+    assert speculation.likely_offers(20, 24, buckets=3, step=0.5) == [22.0, 21.5, 22.5]
+    assert speculation.likely_offers(20, 24, buckets=2, step=1) == [22.0, 21.0]
+    assert speculation.likely_offers(24, 20) == [] and speculation.likely_offers(20, 24, step=0) == []
+
+    # Jobs stop when the LLM is busy, or when a newer job replaced theirs
+    ran = []
+    gate = threading.Event()
+
+    def blocker(should_continue):
+        gate.wait(2)
+
+    def job(name):
+        def run(should_continue):
+            ran.append((name, should_continue()))
+        return run
+
+    idle = [True]
+    saved_idle = speculation.llm_is_idle
+    speculation.llm_is_idle = lambda: idle[0]
+    try:
+        assert speculation.schedule("test:block", blocker)
+        speculation.schedule("test:s", job("old"))
+        speculation.schedule("test:s", job("new"))
+        gate.set()
+        _wait_for(lambda: len(ran) == 2)
+        idle[0] = False
+        speculation.schedule("test:busy", job("busy"))
+        _wait_for(lambda: len(ran) == 3)
+    finally:
+        speculation.llm_is_idle = saved_idle
+    print(ran)
+    assert ran == [("old", False), ("new", True), ("busy", False)]
+
+    # A pre-computed reply is served for the same round and counter only
+    request = ChatRequest(
+        buyerMessage="I can do 22 per kg", buyerDistrict="Thrissur",
+        listingId="L-spec", buyerId="B-spec", roundNumber=2, lastCounterPrice=24,
+    )
+    anonymous = ChatRequest(**request.model_dump(exclude={"listingId", "buyerId"}))
+    reserve = analyze_market_full(MarketQuery(request.crop, request.quantity, request.farmerDistrict)).recommendedReservePrice
+    precomputed = ChatResponse(
+        decision=ChatDecision(status="accepted", finalPrice=22.0),
+        chatMessage="pre-computed", ReservePrice=reserve,
+    )
+    key = buyer_chat._speculation_key(request, 22.0)
+    assert key != buyer_chat._speculation_key(request.model_copy(update={"roundNumber": 3}), 22.0)
+    assert key != buyer_chat._speculation_key(request.model_copy(update={"lastCounterPrice": 23}), 22.0)
+    anonymous_key = buyer_chat._speculation_key(anonymous, 22.0)
+    speculation.SPECULATIVE_CACHE.put(key, precomputed)
+    speculation.SPECULATIVE_CACHE.put(anonymous_key, precomputed)
+    buyer_chat.SPECULATIVE_MODE = True
+    try:
+        timings = {}
+        result = buyer_chat.handle_buyer_chat(request, timings)
+        later = buyer_chat.handle_buyer_chat(request.model_copy(update={"roundNumber": 3}), {})
+        # Rounds without both ids are never served a shared reply
+        unknown = buyer_chat.handle_buyer_chat(anonymous, {})
+    finally:
+        buyer_chat.SPECULATIVE_MODE = False
+        speculation.SPECULATIVE_CACHE.pop(key)
+        speculation.SPECULATIVE_CACHE.pop(anonymous_key)
+    assert timings.get("speculative") == 0.0 and result.chatMessage == "pre-computed"
+    assert later.chatMessage != "pre-computed" and unknown.chatMessage != "pre-computed"
+    print("PASS\n")
+
+
+def test_listener_numbers():
+    print("=== 6. Listener numbers: decimals with an attached unit ===")
+    # As with the original \b\d+\b patterns, the "3" of "3.5kg" is a bare number
+    for text, intent, quantity in [
+        ("can you do 3.5kg", "counter_offer", 3.5),
+        ("can you do 3.5 kg", "counter_offer", 3.5),
+        ("can you do 500kg", "unknown", 500.0),
+        ("at least 12.5", "counter_offer", None),
+    ]:
+        d = extract_intent(ListenRequest(rawText=text))
+        print(f"{text!r}: {d.intent} {d.extractedSlots.quantity}")
+        assert d.intent == intent and d.extractedSlots.quantity == quantity
+    print("PASS\n")
+
+
+def test_fuzzy_names():
+    print("=== 7. Listener typo correction without false positives ===")
+    gazetteer = gazetteer_for("en")
+    # Typos within the budget of the shorter word are corrected
+    for typo, district in [("palakad", "Palakkad"), ("thrisur", "Thrissur"), ("eranakulam", "Ernakulam"), ("kanur", "Kannur")]:
+        assert gazetteer.match(typo) == {"district": district}, typo
+    # Common English words are not names: "coaching" is 2 edits from "cochin",
+    # more than a 6-letter name allows
+    common = (
+        "coaching about because before bringing calling children company country delivery "
+        "farmer getting harvest kindly listing looking market morning offering people please "
+        "quality quintals rupees school selling something thanks tomorrow transport village weather"
+    )
+    for word in common.split():
+        assert gazetteer.match(word) == {}, word
+    d = extract_intent(ListenRequest(rawText="I am coaching my son, want to sell 200 kg tomato"))
+    assert d.extractedSlots.district is None and d.extractedSlots.crop == "Tomato"
+    print("PASS\n")
+
+
+def test_ws_speculative_hit():
+    print("=== 8. WebSocket events for a pre-generated reply ===")
+    import main
+
+    payload = {
+        "listingId": "L-ws-spec", "buyerId": "B-ws-spec", "buyerMessage": "I can do 22 per kg",
+        "buyerDistrict": "Thrissur", "roundNumber": 2, "lastCounterPrice": 24,
+    }
+    request = ChatRequest(**payload)
+    reserve = analyze_market_full(MarketQuery(request.crop, request.quantity, request.farmerDistrict)).recommendedReservePrice
+    key = buyer_chat._speculation_key(request, 22.0)
+    speculation.SPECULATIVE_CACHE.put(key, ChatResponse(
+        decision=ChatDecision(status="counter_offer", counterPrice=23.5),
+        chatMessage="How about ₹23.5/kg?", ReservePrice=reserve,
+    ))
+    buyer_chat.SPECULATIVE_MODE = True
+    try:
+        with TestClient(main.app).websocket_connect("/agent/ws") as ws:
+            ws.send_json({"id": "spec", "type": "chat", "payload": payload})
+            events = [ws.receive_json()]
+            while events[-1]["type"] not in ("done", "error"):
+                events.append(ws.receive_json())
+    finally:
+        buyer_chat.SPECULATIVE_MODE = False
+        speculation.SPECULATIVE_CACHE.pop(key)
+    print([e["type"] for e in events])
+    assert [e["type"] for e in events] == ["decision", "delta", "done"]
+    assert events[0]["status"] == "counter_offer" and events[0]["counterPrice"] == 23.5
+    assert events[1]["text"] == events[2]["response"]["chatMessage"] == "How about ₹23.5/kg?"
+    assert events[2]["timings"]["speculative"] == 0.0
+    print("PASS\n")
+
+
+def test_commit_lane_skips_stage_pool():
+    print("=== 9. A commit round completes while chat rounds fill the stage pool ===")
+    release = threading.Event()
+    blockers = [buyer_chat._STAGE_POOL.submit(release.wait) for _ in range(buyer_chat._STAGE_POOL.max_workers)]
+    accept = ChatRequest(buyerMessage="ok deal", buyerDistrict="Thrissur", lastCounterPrice=24)
+    results = []
+    try:
+        worker = threading.Thread(target=lambda: results.append(buyer_chat.handle_buyer_chat(accept, lane=COMMIT)))
+        worker.start()
+        worker.join(timeout=5)
+        assert not worker.is_alive(), "commit round waited for the stage pool"
+    finally:
+        release.set()
+        for blocker in blockers:
+            blocker.result()
+    print(results[0].decision.status)
+    assert results[0].decision.status == "accepted"
+    print("PASS\n")
+
+
+def test_admission_holds_slot_until_thread_ends():
+    print("=== 10. Chat slot outlives a cancelled round; a full queue charges no tokens ===")
+
+    async def scenario():
+        gate = AdmissionController(rate_per_buyer=1, burst_per_buyer=2, max_inflight=1, max_queue=0)
+        release = threading.Event()
+        round_ = asyncio.create_task(gate.run(CHAT, "B1", "L1", release.wait))
+        await asyncio.sleep(0.05)
+        round_.cancel()
+        await asyncio.gather(round_, return_exceptions=True)
+        held = gate.inflight[CHAT]
+        statuses = []
+        for _ in range(3):
+            try:
+                await gate.run(CHAT, "B2", "L2", lambda: None)
+            except AdmissionRejected as e:
+                statuses.append(e.status)
+        release.set()
+        for _ in range(100):
+            if not gate.inflight[CHAT]:
+                break
+            await asyncio.sleep(0.01)
+        freed = gate.inflight[CHAT]
+        # B2's two tokens were never charged by the 503s
+        await gate.run(CHAT, "B2", "L2", lambda: None)
+        await gate.run(CHAT, "B2", "L2", lambda: None)
+        return held, statuses, freed
+
+    held, statuses, freed = asyncio.run(scenario())
+    print(held, statuses, freed)
+    assert held == 1 and statuses == [503, 503, 503] and freed == 0
+    print("PASS\n")
+
+
+def test_conversation_needs_both_ids():
+    print("=== 11. Ollama context is keyed only on ids the caller sent ===")
+    explicit = ChatRequest(listingId="O-17", buyerId="U-4", buyerMessage="22?", buyerDistrict="Thrissur")
+    backend_shaped = ChatRequest(buyerMessage="22?", buyerDistrict="Thrissur")
+    keys = [
+        conversation_key(explicit),
+        conversation_key(backend_shaped),
+        conversation_key(ChatRequest(listingId="O-17", buyerMessage="22?", buyerDistrict="Thrissur")),
+        conversation_key(explicit.model_copy(update={"roundNumber": 2})),
+    ]
+    print(keys)
+    assert keys == ["O-17:U-4", None, None, "O-17:U-4"]
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_shared_cache()
+    test_admission()
+    test_circuit_breaker()
+    test_latency_routing_recovers()
+    test_speculation()
+    test_listener_numbers()
+    test_fuzzy_names()
+    test_ws_speculative_hit()
+    test_commit_lane_skips_stage_pool()
+    test_admission_holds_slot_until_thread_ends()
+    test_conversation_needs_both_ids()
+    print("=" * 40)
+    print("ALL 11 TESTS PASSED")
+    print("=" * 40)
@@ -0,0 +1,235 @@
+"""
+Request tracing — nanosecond spans linked by the caller's request id.
+
+Spans follow the OpenTelemetry data model (traceId / spanId / parentSpanId,
+start and end as unix nanoseconds, attributes, status), so exported lines
+can be loaded into OTLP tooling. Durations come from perf_counter_ns; the
+unix timestamps are that monotonic clock anchored once at import.
+
+The current span lives in a contextvar. asyncio tasks and asyncio.to_thread
+inherit it; work handed to a ThreadPoolExecutor must be submitted through
+`in_context` to stay in the same trace.
+
+Exporters (TRACE_EXPORTER):
+    memory — keep the last TRACE_BUFFER spans; GET /agent/traces/{requestId}
+    file   — append one JSON span per line to TRACE_FILE
+    none   — spans are still timed but not kept
+"""
+
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "memory").lower()
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+TRACE_BUFFER = int(os.environ.get("TRACE_BUFFER", "5000"))
+
+REQUEST_ID_HEADER = "X-Request-Id"
+
+# Monotonic clock → unix nanoseconds
+_EPOCH_NS = time.time_ns()
+_PERF_NS = time.perf_counter_ns()
+
+_TRACE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+_current: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("current_span", default=None)
+
+
+def _unix_ns(perf_ns: int) -> int:
+    return _EPOCH_NS + (perf_ns - _PERF_NS)
+
+
+def trace_id_for(request_id: str) -> str:
+    """A request id that is already a 32-hex trace id is used as is; others are hashed."""
+    rid = request_id.replace("-", "").lower()
+    if _TRACE_ID_RE.match(rid):
+        return rid
+    return hashlib.md5(request_id.encode()).hexdigest()
+
+
+# ─── Span ─────────────────────────────────────────────────────────────────────
+
+class Span:
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "request_id",
+        "attributes", "status", "error", "start_ns", "end_ns",
+    )
+
+    def __init__(self, name: str, request_id: str, parent: "Span | None", attributes: dict):
+        self.name = name
+        self.request_id = request_id
+        self.trace_id = parent.trace_id if parent else trace_id_for(request_id)
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.status = "OK"
+        self.error = ""
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: int | None = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": _unix_ns(self.start_ns),
+            "endTimeUnixNano": _unix_ns(self.end_ns) if self.end_ns is not None else None,
+            "durationNs": (self.end_ns - self.start_ns) if self.end_ns is not None else None,
+            "attributes": {"request.id": self.request_id, **self.attributes},
+            "status": {"code": self.status, "message": self.error},
+        }
+
+
+# ─── Exporters ────────────────────────────────────────────────────────────────
+
+class InMemoryExporter:
+    """Ring buffer of finished spans."""
+
+    def __init__(self, maxlen: int = TRACE_BUFFER):
+        self._spans: deque[Span] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, request_id: str | None = None) -> list[dict]:
+        with self._lock:
+            spans = list(self._spans)
+        if request_id is not None:
+            trace_id = trace_id_for(request_id)
+            spans = [s for s in spans if s.trace_id == trace_id]
+        return [s.to_dict() for s in spans]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class FileExporter:
+    """Appends finished spans to a JSON-lines file."""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def spans(self, request_id: str | None = None) -> list[dict]:
+        trace_id = trace_id_for(request_id) if request_id is not None else None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                spans = [json.loads(line) for line in f if line.strip()]
+        except OSError:
+            return []
+        return [s for s in spans if trace_id is None or s["traceId"] == trace_id]
+
+
+class _NullExporter:
+    def export(self, span: Span) -> None:
+        pass
+
+    def spans(self, request_id: str | None = None) -> list[dict]:
+        return []
+
+
+def _exporter_from_env():
+    if TRACE_EXPORTER == "file":
+        return FileExporter(TRACE_FILE)
+    if TRACE_EXPORTER == "none":
+        return _NullExporter()
+    return InMemoryExporter(TRACE_BUFFER)
+
+
+EXPORTER = _exporter_from_env()
+
+
+# ─── API ──────────────────────────────────────────────────────────────────────
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+def current_request_id() -> str | None:
+    span = _current.get()
+    return span.request_id if span else None
+
+
+@contextmanager
+def span(name: str, request_id: str | None = None, **attributes) -> Iterator[Span]:
+    """
+    Time a block as a child of the current span. Outside any trace a new one
+    is started under `request_id` (or a random id).
+    """
+    parent = _current.get()
+    rid = request_id or (parent.request_id if parent else f"{random.getrandbits(128):032x}")
+    s = Span(name, rid, parent, attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status, s.error = "ERROR", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.perf_counter_ns()
+        _current.reset(token)
+        EXPORTER.export(s)
+
+
+def record_span(name: str, start_ns: int, end_ns: int, **attributes) -> None:
+    """
+    Export a span with known perf_counter_ns bounds as a child of the current
+    span — for phases measured elsewhere (e.g. Ollama's own timings).
+    """
+    parent = _current.get()
+    if parent is None:
+        return
+    s = Span(name, parent.request_id, parent, attributes)
+    s.start_ns, s.end_ns = start_ns, end_ns
+    EXPORTER.export(s)
+
+
+def traced(name: str | None = None) -> Callable:
+    """
+    Decorator: run the function inside a span named after it. Calls made
+    outside any trace (benchmarks, batch workers) are not recorded.
+    """
+    def decorate(fn: Callable) -> Callable:
+        span_name = name or f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def in_context(fn: Callable) -> Callable:
+    """Bind fn to the caller's context (current span) for another thread."""
+    ctx = contextvars.copy_context()
+    return functools.partial(ctx.run, fn)
@@ -0,0 +1,206 @@
+"""
+Offline training for the local offer extractor (intent_model.py).
+
+The labelled corpus is seeded from the examples in EXTRACTION_SYSTEM_PROMPT
+and expanded with synthetic buyer messages (prices, quantities, units,
+districts, fillers). Extra hand-labelled JSONL files can be mixed in.
+
+    python train_intent_model.py                      # writes intent_model.json
+    python train_intent_model.py --extra labelled.jsonl --corpus-out corpus.jsonl
+"""
+
+import argparse
+import json
+import random
+import re
+
+from delivery_config import DELIVERY_AGENTS
+from intent_model import MODEL_PATH, INTENT_LABELS, train
+from llm_message_generator import EXTRACTION_SYSTEM_PROMPT
+
+DISTRICTS = list(DELIVERY_AGENTS.keys())
+
+# ─── Templates ────────────────────────────────────────────────────────────────
+# {p} price/kg, {pq} price/quintal, {q} quantity with unit, {d} district,
+# {n} an unrelated number (days, hours)
+TEMPLATES = {
+    "new_offer": [
+        "I can do {p} per kg for {q}",
+        "I can offer ₹{p} per kg",
+        "I can offer {p} per kg for {q}",
+        "how about {p}/kg",
+        "how about ₹{p}?",
+        "{p} rupees per kilo is my best price",
+        "my offer is {p} per kg for {q} of tomatoes",
+        "I would say {p}",
+        "let's settle at {p}",
+        "can you do {p}?",
+        "{q} at {p} per kg",
+        "I'll pay {pq} per quintal",
+        "I can pay ₹{pq} per quintal for {q}",
+        "Rs {p}/kg, delivered to {d}",
+        "I need {q} in {d}, offering {p} per kg",
+        "{p} is the max I can go",
+        "final offer {p} rs",
+        "what about {p} then",
+        "ok how about {p} per kg",
+        "I can only pay {p} per kg",
+        "make it {p} and I'll take {q}",
+        "I will pick up in {n} days, offering {p} per kg",
+        "{p} per kg, delivery to {d} within {n} days",
+        "best I can do is ₹{p}/kg",
+        "lower it to {p} please",
+        "{p}?",
+        "give it for {p}",
+        "buying {q} at {p}",
+    ],
+    "accept_counter": [
+        "Ok deal, I accept",
+        "deal",
+        "ok fine, let's do it",
+        "agreed",
+        "yes that works",
+        "sounds good, go ahead",
+        "I accept your price",
+        "done",
+        "confirm the order",
+        "okay I'll take it",
+        "alright, deal at your price",
+        "yes, I agree",
+        "fine, accepted",
+        "ok, book it",
+        "that works for me",
+        "let's go with your counter",
+        "deal, send the invoice",
+        "ok proceed",
+    ],
+    "reject": [
+        "That's too high, I'll pass",
+        "no thanks",
+        "too expensive for me",
+        "I'm not interested",
+        "forget it",
+        "I'll buy elsewhere",
+        "not at that price, sorry",
+        "no deal",
+        "that's too much",
+        "I'll pass on this one",
+        "no, I reject",
+        "sorry, can't afford that",
+        "I'll find another farmer",
+        "nope",
+        "cancel, not buying",
+        "too costly, leave it",
+    ],
+    "question": [
+        "hello",
+        "hi, is this available?",
+        "what is the quality of the tomatoes?",
+        "how fresh are they?",
+        "when can you deliver to {d}?",
+        "where is the farm located?",
+        "what's your price?",
+        "can you share more details?",
+        "good morning",
+        "is delivery included?",
+        "how many kg do you have?",
+        "are these organic?",
+        "hey there",
+        "what variety is it?",
+        "can I see photos first?",
+        "is the stock still there?",
+        "how long will delivery to {d} take?",
+    ],
+}
+
+PREFIXES = ["", "", "", "hey ", "sir, ", "hi, ", "bro ", "listen, ", "hmm "]
+SUFFIXES = ["", "", "", ".", "!", " thanks", " please", " 🙂", " ok?"]
+QUANTITY_UNITS = [("kg", 1), ("kgs", 1), ("kilos", 1), ("quintal", 100), ("quintals", 100), ("tonnes", 1000)]
+
+
+def _seed_examples() -> list[dict]:
+    """Input/Output pairs embedded in EXTRACTION_SYSTEM_PROMPT."""
+    pairs = re.findall(r'Input: "(.*?)"\nOutput: (\{.*?\})', EXTRACTION_SYSTEM_PROMPT)
+    return [{"text": text, **json.loads(output)} for text, output in pairs]
+
+
+def _fmt_price(rng: random.Random) -> float:
+    price = rng.choice([rng.randint(8, 60), rng.randint(8, 60) + rng.choice([0.5, 0.25, 0.75])])
+    return float(price)
+
+
+def synthesize(n_per_intent: int, seed: int) -> list[dict]:
+    """Synthetic labelled messages, balanced across intents."""
+    rng = random.Random(seed)
+    examples = []
+    for intent, templates in TEMPLATES.items():
+        for _ in range(n_per_intent):
+            template = rng.choice(templates)
+            price = _fmt_price(rng)
+            unit, mult = rng.choice(QUANTITY_UNITS)
+            shown_qty = rng.choice([1, 2, 3, 5, 10]) if mult > 1 else rng.choice([50, 100, 200, 250, 300, 500, 750, 1000])
+            quantity = float(shown_qty * mult)
+            district = rng.choice(DISTRICTS)
+            other = rng.choice([2, 3, 4, 7])
+            # Keep every number unambiguous so span labels can be derived
+            while price in (quantity, float(shown_qty), float(other)):
+                price += 1.0
+
+            text = template.format(
+                p=f"{price:g}",
+                pq=f"{price * 100:g}",
+                q=f"{shown_qty} {unit}" if rng.random() < 0.7 else f"{shown_qty}{unit}",
+                d=district,
+                n=other,
+            )
+            text = rng.choice(PREFIXES) + text + rng.choice(SUFFIXES)
+            if rng.random() < 0.2:
+                text = text.upper() if rng.random() < 0.3 else text.capitalize()
+
+            examples.append({
+                "text": text,
+                "offerPricePerKg": price if "{p}" in template or "{pq}" in template else None,
+                "quantity": quantity if "{q}" in template else None,
+                "buyerDistrict": district if "{d}" in template else None,
+                "intent": intent,
+            })
+    return examples
+
+
+def build_corpus(n_per_intent: int = 600, seed: int = 13, extra: list[str] | None = None) -> list[dict]:
+    corpus = _seed_examples() * 20 + synthesize(n_per_intent, seed)
+    for path in extra or []:
+        with open(path, encoding="utf-8") as f:
+            corpus.extend(json.loads(line) for line in f if line.strip())
+    for ex in corpus:
+        if ex["intent"] not in INTENT_LABELS:
+            raise ValueError(f"Unknown intent {ex['intent']!r} in example {ex['text']!r}")
+    return corpus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the local offer extractor.")
+    parser.add_argument("--per-intent", type=int, default=600)
+    parser.add_argument("--epochs", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--extra", action="append", default=[], help="extra labelled JSONL")
+    parser.add_argument("--corpus-out", help="also write the training corpus as JSONL")
+    parser.add_argument("--out", default=str(MODEL_PATH))
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.per_intent, args.seed, args.extra)
+    if args.corpus_out:
+        with open(args.corpus_out, "w", encoding="utf-8") as f:
+            for ex in corpus:
+                f.write(json.dumps(ex, ensure_ascii=False) + "\n")
+
+    model = train(corpus, epochs=args.epochs, seed=args.seed)
+    model.save(args.out)
+    print(
+        f"Trained on {len(corpus)} examples → {args.out} "
+        f"({len(model.intent_weights)} intent / {len(model.span_weights)} span features)"
+    )
+
+
+if __name__ == "__main__":
+    main()
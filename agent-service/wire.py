@@ -0,0 +1,179 @@
+"""
+Wire formats: fast JSON for the high-volume endpoints, and MessagePack
+content negotiation for every route.
+
+When an endpoint returns a pydantic model, FastAPI validates it against
+`response_model` a second time before encoding it. Endpoints whose
+responses come from already-validated records return a WireResponse
+instead: a plain dict shaped exactly like the response model (built by the
+record's `to_wire()`), encoded once. `response_model` stays on the route,
+so the OpenAPI schema is unchanged. JSON is encoded with orjson when
+installed, otherwise the stdlib encoder with Starlette's settings.
+
+MessagePack (optional `msgpack` package):
+    Content-Type: application/msgpack   the body is a msgpack-encoded request
+    Accept: application/msgpack         the response is msgpack-encoded
+JSON stays the default. Error responses (4xx/5xx) are always JSON. Streaming
+endpoints (/agent/listen/batch) negotiate for themselves via
+`is_msgpack` / `accepts_msgpack`.
+"""
+
+import json
+from contextvars import ContextVar
+from typing import Any, Callable
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# The response format negotiated for the current request
+_response_format: ContextVar[str] = ContextVar("response_format", default=JSON)
+
+
+def response_format() -> str:
+    """JSON or MSGPACK: the response format negotiated for the current request."""
+    return _response_format.get()
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def packb(content: Any) -> bytes:
+    return msgpack.packb(content)
+
+
+def unpackb(data: bytes) -> Any:
+    return msgpack.unpackb(data)
+
+
+def unpacker() -> "msgpack.Unpacker":
+    """A streaming decoder: feed() bytes as they arrive, iterate for whole objects."""
+    return msgpack.Unpacker()
+
+
+# ─── Negotiation ──────────────────────────────────────────────────────────────
+
+def _media_type(content_type: str | None) -> str:
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def is_msgpack(content_type: str | None) -> bool:
+    return _media_type(content_type) in MSGPACK_TYPES
+
+
+def accepts_msgpack(accept: str | None) -> bool:
+    """
+    True when the Accept header prefers a msgpack type over JSON (a missing
+    q counts as 1; application/json, application/* and */* count as JSON).
+    Always False when msgpack is not installed.
+    """
+    if msgpack is None or not accept:
+        return False
+    msgpack_q = json_q = 0.0
+    for part in accept.split(","):
+        media_type, *params = part.split(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in MSGPACK_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type in (JSON, "application/*", "*/*"):
+            json_q = max(json_q, q)
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+
+# ─── Responses ────────────────────────────────────────────────────────────────
+
+class WireResponse(JSONResponse):
+    """
+    Pre-validated, JSON-ready content (dicts, lists, str, numbers, None),
+    encoded in the format negotiated for the request.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if _response_format.get() == MSGPACK:
+            self.media_type = MSGPACK
+            return packb(content)
+        return dumps(content)
+
+
+# ─── Requests ─────────────────────────────────────────────────────────────────
+
+class MsgpackRequest(Request):
+    """
+    A msgpack-bodied request, presented to FastAPI's body parsing as JSON:
+    FastAPI only calls `json()` for JSON content types, so the content type
+    is reported as JSON and `json()` decodes msgpack.
+    """
+
+    @property
+    def headers(self) -> Headers:
+        if not hasattr(self, "_json_headers"):
+            headers = MutableHeaders(raw=list(self.scope["headers"]))
+            headers["content-type"] = JSON
+            self._json_headers = headers
+        return self._json_headers
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = unpackb(await self.body())
+        return self._json
+
+
+class WireRoute(APIRoute):
+    """
+    APIRoute with msgpack negotiation. Each route gets a second request
+    handler that renders through WireResponse, so a msgpack response is
+    packed from the serialized content without a JSON round trip; JSON
+    requests keep FastAPI's default handler and its fast path.
+    """
+
+    def get_route_handler(self) -> Callable:
+        json_handler = super().get_route_handler()
+        response_class = self.response_class
+        self.response_class = WireResponse
+        try:
+            msgpack_handler = super().get_route_handler()
+        finally:
+            self.response_class = response_class
+
+        async def handler(request: Request) -> Response:
+            wants_msgpack = accepts_msgpack(request.headers.get("accept"))
+            if is_msgpack(request.headers.get("content-type")):
+                if msgpack is None:
+                    raise HTTPException(status_code=415, detail="msgpack is not installed on this server.")
+                if self.body_field is not None:  # endpoints taking a raw Request decode for themselves
+                    request = MsgpackRequest(request.scope, request.receive)
+            if not wants_msgpack:
+                return await json_handler(request)
+            token = _response_format.set(MSGPACK)
+            try:
+                return await msgpack_handler(request)
+            finally:
+                _response_format.reset(token)
+
+        return handler
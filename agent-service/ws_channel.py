@@ -0,0 +1,223 @@
+"""
+Multiplexed WebSocket channel (/agent/ws) for backend → agent traffic.
+
+One long-lived connection carries many negotiation sessions at once, so a
+chat round costs a frame instead of an HTTP request. Every request frame
+has a client-chosen `id`; each event sent back for it repeats that id, and
+events for different ids interleave.
+
+Client → agent:
+    {"id": "r1", "type": "chat", "payload": {...ChatRequest...}}
+    {"id": "r2", "type": "negotiate", "payload": {...NegotiateRequest...}}
+    {"id": "r1", "type": "cancel"}
+
+Agent → client, per id:
+    {"id", "type": "decision", "status", "finalPrice", "counterPrice", "ReservePrice"}
+        chat: as soon as the engine has decided, before the reply is worded
+        (pre-generated replies too). Rounds that never reach the engine —
+        accepting the last counter, walking away, questions — go straight
+        to done.
+    {"id", "type": "delta", "text"}
+        chat: fragments of an LLM-worded reply as they are generated
+    {"id", "type": "done", "response", "timings"}
+        the full ChatResponse / NegotiateResponse. Its chatMessage is the one
+        to keep: if the LLM failed part-way, the deltas include a fallback.
+    {"id", "type": "error", "status", "detail"}
+        400 bad frame / 409 id in flight / 422 invalid payload /
+        429 WS_MAX_INFLIGHT reached / 429 chat rate limit / 500 /
+        503 as on the HTTP routes (incl. chat queue full, see admission.py)
+    {"id", "type": "cancelled"}
+
+Text frames are JSON; binary frames are msgpack, and a request's events
+come back in the format it was sent in. The id doubles as the request id
+of the trace (GET /agent/traces/{id}).
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Awaitable, Callable
+
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from admission import ADMISSION, AdmissionRejected
+from buyer_chat import chat_lane, explicit_ids, handle_buyer_chat
+from metrics import HTTP_LATENCY
+from negotiation import decide, to_query
+from schemas import ChatRequest, NegotiateRequest
+from tracing import span
+import wire
+from wire import dumps, packb, unpackb
+
+WS_ROUTE = "/agent/ws"
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+# Requests in flight per connection; more are answered with a 429 error event
+WS_MAX_INFLIGHT = int(os.environ.get("WS_MAX_INFLIGHT", "64"))
+
+
+class RequestError(Exception):
+    """Fails one request on the channel with an HTTP-style status."""
+
+    def __init__(self, status: int, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+class Channel:
+    """
+    One connection. A single writer task drains `outbox`, so events pushed
+    from request tasks and worker threads never interleave mid-frame.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.loop = asyncio.get_running_loop()
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        self.tasks: dict[str, asyncio.Task] = {}
+
+    def send(self, event: dict, binary: bool) -> None:
+        self.outbox.put_nowait((event, binary))
+
+    def send_threadsafe(self, task: asyncio.Task, rid: str, event: dict, binary: bool) -> None:
+        """Queue an event from a worker thread, dropped if its request was cancelled meanwhile."""
+        def put() -> None:
+            if self.tasks.get(rid) is task:
+                self.send(event, binary)
+
+        try:
+            self.loop.call_soon_threadsafe(put)
+        except RuntimeError:
+            pass  # loop closed: the connection and its requests are gone
+
+    async def write_loop(self) -> None:
+        while True:
+            event, binary = await self.outbox.get()
+            try:
+                if binary:
+                    await self.websocket.send_bytes(packb(event))
+                else:
+                    await self.websocket.send_text(dumps(event).decode("utf-8"))
+            except (WebSocketDisconnect, RuntimeError):
+                return
+
+    def dispatch(self, frame, binary: bool) -> None:
+        rid = frame.get("id") if isinstance(frame, dict) else None
+        if not isinstance(rid, str) or not rid:
+            self.send({"id": rid, "type": "error", "status": 400, "detail": "Each frame needs a string id."}, binary)
+            return
+        kind = frame.get("type")
+        if kind == "cancel":
+            task = self.tasks.get(rid)
+            if task is not None:
+                task.cancel()
+            return
+        handler = _HANDLERS.get(kind)
+        if handler is None:
+            detail = f"Unknown type {kind!r}; expected one of: {', '.join(_HANDLERS)}, cancel."
+            self.send({"id": rid, "type": "error", "status": 400, "detail": detail}, binary)
+        elif rid in self.tasks:
+            self.send({"id": rid, "type": "error", "status": 409, "detail": "A request with this id is in flight."}, binary)
+        elif len(self.tasks) >= WS_MAX_INFLIGHT:
+            self.send({"id": rid, "type": "error", "status": 429, "detail": "Too many requests in flight."}, binary)
+        else:
+            self.tasks[rid] = asyncio.create_task(self._run(rid, kind, handler, frame.get("payload"), binary))
+
+    async def _run(self, rid: str, kind: str, handler, payload, binary: bool) -> None:
+        t0 = time.perf_counter()
+        status, decision = 200, ""
+        try:
+            with span(f"WS {kind}", request_id=rid, **{"ws.route": WS_ROUTE}) as root:
+                try:
+                    decision, done = await handler(self, rid, payload, binary)
+                    root.set(**{"agent.decision": decision})
+                    self.send({"id": rid, "type": "done", **done}, binary)
+                except asyncio.CancelledError:
+                    status = 499
+                    self.send({"id": rid, "type": "cancelled"}, binary)
+                except RequestError as e:
+                    status = e.status
+                    self.send({"id": rid, "type": "error", "status": e.status, "detail": e.detail}, binary)
+                root.set(**{"http.status_code": status})
+        finally:
+            self.tasks.pop(rid, None)
+            HTTP_LATENCY.observe(time.perf_counter() - t0, ("WS", f"{WS_ROUTE}:{kind}", str(status), decision))
+
+    def close(self) -> None:
+        for task in self.tasks.values():
+            task.cancel()
+
+
+# ─── Request types ────────────────────────────────────────────────────────────
+
+def _validate(model, payload):
+    try:
+        return model.model_validate(payload if payload is not None else {})
+    except ValidationError as e:
+        raise RequestError(422, e.errors(include_url=False, include_context=False)) from None
+
+
+async def _chat(channel: Channel, rid: str, payload, binary: bool) -> tuple[str, dict]:
+    request = _validate(ChatRequest, payload)
+    task = asyncio.current_task()
+    timings: dict = {}
+
+    def events(kind: str, data: dict) -> None:
+        channel.send_threadsafe(task, rid, {"id": rid, "type": kind, **data}, binary)
+
+    try:
+        lane = chat_lane(request)
+        result = await ADMISSION.run(
+            lane, *explicit_ids(request),
+            handle_buyer_chat, request, timings, events, lane=lane,
+        )
+    except AdmissionRejected as e:
+        raise RequestError(e.status, e.detail) from None
+    except RuntimeError as e:
+        raise RequestError(503, str(e)) from None
+    except Exception as e:
+        raise RequestError(500, f"Chat error: {str(e)}") from None
+    return result.decision.status, {"response": result.model_dump(mode="json"), "timings": timings}
+
+
+async def _negotiate(channel: Channel, rid: str, payload, binary: bool) -> tuple[str, dict]:
+    request = _validate(NegotiateRequest, payload)
+    try:
+        decision = decide(to_query(request))
+    except ValueError as e:
+        raise RequestError(400, str(e)) from None
+    return decision.status, {"response": decision.to_wire()}
+
+
+_HANDLERS: dict[str, Callable[..., Awaitable[tuple[str, dict]]]] = {
+    "chat": _chat,
+    "negotiate": _negotiate,
+}
+
+
+async def serve_channel(websocket: WebSocket) -> None:
+    await websocket.accept()
+    channel = Channel(websocket)
+    writer = asyncio.create_task(channel.write_loop())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            binary = message.get("bytes") is not None
+            if binary and wire.msgpack is None:
+                detail = "msgpack is not installed on this server; send JSON text frames."
+                channel.send({"id": None, "type": "error", "status": 415, "detail": detail}, False)
+                continue
+            try:
+                frame = unpackb(message["bytes"]) if binary else json.loads(message["text"])
+            except ValueError:
+                channel.send({"id": None, "type": "error", "status": 400, "detail": "Malformed frame."}, binary)
+                continue
+            channel.dispatch(frame, binary)
+    finally:
+        channel.close()
+        writer.cancel()
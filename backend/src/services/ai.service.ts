@@ -1,7 +1,11 @@
 import axios from "axios";
 import { injectable } from "inversify";
+import { v4 as uuidv4 } from "uuid";
 
 export interface AiNegotiationRequest {
+    // Negotiation (offer) id and buyer id; the agent keys per-negotiation state on them
+    listingId?: string;
+    buyerId?: string;
     buyerMessage: string;
     buyerDistrict?: string;
     crop?: string;
@@ -9,6 +13,8 @@ export interface AiNegotiationRequest {
     farmerLocation?: string;
     reservePrice?: number;
     lastCounterPrice?: number;
+    // Buyer messages so far in this negotiation, this one included
+    roundNumber?: number;
 }
 
 export interface AiNegotiationResponse {
@@ -28,27 +34,32 @@ export class AiService {
     public async generateResponse(
         negotiationData: AiNegotiationRequest,
         history: any[],
+        requestId: string = uuidv4(),
     ): Promise<AiNegotiationResponse> {
         try {
             const response = await axios.post(
                 this.fastApiUrl,
                 {
+                    listingId: negotiationData.listingId,
+                    buyerId: negotiationData.buyerId,
                     buyerMessage: negotiationData.buyerMessage,
                     buyerDistrict: negotiationData.buyerDistrict || "Unknown",
                     crop: negotiationData.crop || "Tomato",
                     quantity: negotiationData.quantity || 500,
                     farmerDistrict: negotiationData.farmerLocation || "Palakkad",
-                    roundNumber: 1,
+                    roundNumber: negotiationData.roundNumber || 1,
                     currentOfferPrice: negotiationData.lastCounterPrice || null,
                     lastCounterPrice: negotiationData.lastCounterPrice || null,
                 },
+                // Links agent-service trace spans to this call (GET /agent/traces/:id)
+                { headers: { "X-Request-Id": requestId } },
             );
 
             // The external AI service should return the structured response
             return response.data;
         } catch (error: any) {
             console.error(
-                "Error communicating with External AI service:",
+                `Error communicating with External AI service (request ${requestId}):`,
                 error.message,
             );
             return {
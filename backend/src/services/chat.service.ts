@@ -24,6 +24,7 @@ export interface ChatSession {
     quantity?: number;
     farmer_location?: string;
     buyer_district?: string;
+    buyer_id?: string;
 }
 
 @injectable()
@@ -56,6 +57,7 @@ export class ChatService {
                     cropId = offer.cropId;
                     sessionData.offer_price = offer.price;
                     sessionData.buyer_district = offer.buyer_location;
+                    sessionData.buyer_id = offer.buyerId;
                 }
 
                 const crop = await Crop.findById(cropId);
@@ -97,6 +99,8 @@ export class ChatService {
         ) || "Palakkad";
 
         const aiRequest = {
+            listingId: sessionId,
+            buyerId: sessionData.buyer_id,
             buyerMessage: dto.message,
             buyerDistrict: sessionData.buyer_district || "Ernakulam",
             crop: sessionData.crop || "Tomato",
@@ -105,6 +109,7 @@ export class ChatService {
             reservePrice: sessionData.reserve_price || 0,
             lastCounterPrice:
                 sessionData.counter_price || sessionData.offer_price || 0,
+            roundNumber: sessionData.messages.filter(m => m.role === "user").length,
         };
 
         await redisClient.setex(